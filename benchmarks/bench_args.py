@@ -0,0 +1,68 @@
+"""
+Benchmark converting command arguments from strings to their annotated types.
+
+Run with:  uv run benchmarks/bench_args.py
+
+Each argument gets its converter when the command is registered, so a call
+converts each argument with one function call.  Times convert, the prebuilt
+converter, against to_type, which looks the converter up for every argument,
+and the whole of parse_args, which also splits the command line with shlex.
+"""
+
+from typing import List
+
+from ctui.commands import Command
+from ctui.types import GreedyBin, Hex, to_type
+from synthetic import best_of
+
+
+def do_read(name: str, count: int, ratio: float):
+    """Read"""
+
+
+def do_write(address: int, data: Hex):
+    """Write"""
+
+
+def do_sum(values: List[int]):
+    """Sum"""
+
+
+def do_bits(start: int, bits: GreedyBin):
+    """Bits"""
+
+
+# command function and the string of each of its arguments
+CASES = [
+    (do_read, ["bob", "10", "0.5"]),
+    (do_write, ["1024", "0xdeadbeef"]),
+    (do_sum, ["1 2 3 4"]),
+    (do_bits, ["5", "1 0 1 1 0 0 1 0"]),
+]
+
+
+def main():
+    print(f"{'command':<10} {'to_type us':>11} {'convert us':>11} {'parse us':>9}")
+    for func, values in CASES:
+        command = Command(func)
+        pairs = list(zip(command.kwargs, values))
+        line = " ".join(f'"{value}"' for value in values)
+
+        def lookup():
+            for kwarg, value in pairs:
+                to_type(value, kwarg)
+
+        def prebuilt():
+            for kwarg, value in pairs:
+                kwarg.convert(value)
+
+        print(
+            f"{command.string:<10}"
+            f" {best_of(lookup, number=20000) * 1e6:>11.2f}"
+            f" {best_of(prebuilt, number=20000) * 1e6:>11.2f}"
+            f" {best_of(lambda: command.parse_args(line), number=20000) * 1e6:>9.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Benchmark the array-backed Greedy types against the list-backed ones.
+
+Run with:  uv run benchmarks/bench_arrays.py [count, default 1000000]
+
+Converts a pasted argument of count numbers or bits with each type, and
+reports the median time and the memory the converted value holds on to.
+"""
+
+import statistics
+import sys
+import time
+import tracemalloc
+
+from ctui.types import (
+    GreedyBin,
+    GreedyBitArray,
+    GreedyFloat,
+    GreedyFloatArray,
+    GreedyInt,
+    GreedyIntArray,
+    converter,
+)
+
+RUNS = 5
+
+
+def measure(convert, text):
+    times = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        convert(text)
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    value = convert(text)
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del value
+    return statistics.median(times), held
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    ints = " ".join(str(number * 7919) for number in range(count))
+    floats = " ".join(f"{number / 7:.6f}" for number in range(count))
+    bits = " ".join("1101001"[number % 7] for number in range(count))
+    print(f"{count} values")
+    print(f"{'type':<18} {'median ms':>10} {'held MB':>9}")
+    for argtype, text in [
+        (GreedyInt, ints),
+        (GreedyIntArray, ints),
+        (GreedyFloat, floats),
+        (GreedyFloatArray, floats),
+        (GreedyBin, bits),
+        (GreedyBitArray, bits),
+    ]:
+        elapsed, held = measure(converter(argtype, "values"), text)
+        name = argtype.__name__
+        print(f"{name:<18} {elapsed * 1e3:>10.1f} {held / 1024 / 1024:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
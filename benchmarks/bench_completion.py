@@ -0,0 +1,35 @@
+"""
+Benchmark CommandCompleter.get_completions against growing command registries.
+
+Run with:  uv run benchmarks/bench_completion.py
+
+With the command trie, the cost per keystroke should stay flat as the number
+of registered commands grows.  Short first-word prefixes like "r" still cost
+time proportional to the number of words they match, since every match is
+yielded to the completion menu.
+"""
+from prompt_toolkit.completion import CompleteEvent
+from prompt_toolkit.document import Document
+
+from ctui.completion import CommandCompleter
+from synthetic import best_of, make_commands
+
+SIZES = [10, 1000, 10000]
+INPUTS = ["r", "reg1", "reg1 ", "reg1 wr"]
+
+
+def main():
+    print(f"{'commands':>8}  {'input':<10} {'usec/call':>10}")
+    for size in SIZES:
+        completer = CommandCompleter(make_commands(size))
+        event = CompleteEvent()
+        for text in INPUTS:
+            document = Document(text)
+            seconds = best_of(
+                lambda: list(completer.get_completions(document, event)), number=200
+            )
+            print(f"{size:>8}  {text!r:<10} {seconds * 1e6:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Benchmark opening and updating large project files with each backend.
+
+Run with:  uv run benchmarks/bench_database.py
+
+Each row opens a project already holding that many history records, inserts
+one record, and closes it again.  TinyDB reads and rewrites the whole JSON
+file; SQLite only touches the pages it needs.
+"""
+import tempfile
+import time
+from pathlib import Path
+
+from ctui.database import convert_database, open_database
+
+SIZES = [1000, 10000, 100000, 300000]
+
+
+def record(number):
+    return {"Date": "2026-01-01", "Time": "12:00:00", "Command": f"reg {number} read"}
+
+
+def make_project(path, size):
+    db = open_database(path, "tinydb")
+    db.storage.write(
+        {"history": {str(n): record(n) for n in range(1, size + 1)}, "storage": {}}
+    )
+    db.close()
+
+
+def measure(path):
+    """Seconds to open the project, insert one record and close it"""
+    start = time.perf_counter()
+    db = open_database(path)
+    db.table("history").insert(record(0))
+    db.close()
+    return time.perf_counter() - start
+
+
+def main():
+    print(f"{'records':>8}  {'tinydb ms':>10} {'sqlite ms':>10}")
+    with tempfile.TemporaryDirectory() as folder:
+        for size in SIZES:
+            tinydb_path = Path(folder) / f"{size}.json"
+            sqlite_path = Path(folder) / f"{size}.sqlite"
+            make_project(tinydb_path, size)
+            convert_database(tinydb_path, sqlite_path, "sqlite")
+            tinydb_time = measure(tinydb_path)
+            sqlite_time = measure(sqlite_path)
+            print(f"{size:>8}  {tinydb_time * 1e3:>10.1f} {sqlite_time * 1e3:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
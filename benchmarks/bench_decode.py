@@ -0,0 +1,58 @@
+"""
+Benchmark decoding large GreedyHex and GreedyBin arguments.
+
+Run with:  uv run benchmarks/bench_decode.py
+
+Compares the regex decoders ctui used to have, which lowercase the text,
+match and substitute it with regular expressions and then decode it, with
+the converters in ctui.types, which drop prefixes and separators with
+bytes.replace and bytes.translate and decode with binascii.
+"""
+
+import re
+
+from ctui.types import GreedyBin, GreedyHex, converter
+from synthetic import best_of
+
+SIZES = [1024, 1024 * 1024]  # decoded bytes, or bits for GreedyBin
+
+
+def regex_hex(value):
+    data = value.lower().replace("0x", "")
+    if re.match("^[0123456789abcdef\\\\x ]+$", data):
+        return bytes.fromhex(re.sub("[\\\\x ]", "", data))
+
+
+def regex_bin(value):
+    data = value.lower().replace("0b", "")
+    if re.match("^[01\\\\b ]+$", data):
+        raw_bin = re.sub("[\\\\b ]", "", data)
+        return [False if bit == "0" else True for bit in raw_bin]
+
+
+def main():
+    to_hex = converter(GreedyHex, "data")
+    to_bin = converter(GreedyBin, "bits")
+    print(f"{'argument':<26} {'regex ms':>9} {'convert ms':>11}")
+    for size in SIZES:
+        cases = [
+            (
+                "hex 0xde 0xad",
+                " ".join(["0xde", "0xAD"] * (size // 2)),
+                regex_hex,
+                to_hex,
+            ),
+            ("hex \\xde\\xad", "\\xde\\xad" * (size // 2), regex_hex, to_hex),
+            ("bin 1 0", " ".join("10" * (size // 2)), regex_bin, to_bin),
+        ]
+        for label, text, regex, convert in cases:
+            assert regex(text) == convert(text)
+            print(
+                f"{label + f' x {size}':<26}"
+                f" {best_of(lambda: regex(text), number=5) * 1e3:>9.2f}"
+                f" {best_of(lambda: convert(text), number=5) * 1e3:>11.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Benchmark opening a message dialog on a very long text, such as history.
+
+Run with:  uv run benchmarks/bench_dialog.py
+
+Times building the dialog body and drawing its first screen, for the
+TextArea that MessageDialog used to hold, which measured every line to size
+itself, against the TextPager it holds now, which only looks at the lines it
+shows.
+"""
+
+import asyncio
+import time
+
+from prompt_toolkit.application import Application
+from prompt_toolkit.application.current import set_app
+from prompt_toolkit.layout import Layout
+from prompt_toolkit.layout.containers import to_container
+from prompt_toolkit.layout.dimension import D
+from prompt_toolkit.layout.mouse_handlers import MouseHandlers
+from prompt_toolkit.layout.screen import Screen, WritePosition
+from prompt_toolkit.output import DummyOutput
+from prompt_toolkit.utils import get_cwidth
+from prompt_toolkit.widgets import TextArea
+
+from ctui.base import TextPager
+
+SIZES = [1000, 10000, 100000]
+
+
+def text_area(text):
+    width = max(get_cwidth(line) for line in text.splitlines())
+    return TextArea(text=text, read_only=True, width=D(preferred=width), scrollbar=True)
+
+
+def text_pager(text):
+    return TextPager(text=text)
+
+
+def open_and_draw(make_body, text):
+    start = time.perf_counter()
+    body = to_container(make_body(text))
+    with set_app(Application(layout=Layout(body), output=DummyOutput())):
+        body.write_to_screen(
+            Screen(), MouseHandlers(), WritePosition(0, 0, 120, 40), "", True, None
+        )
+    return time.perf_counter() - start
+
+
+async def main():
+    print(f"{'lines':>7} {'TextArea ms':>12} {'TextPager ms':>13}")
+    for size in SIZES:
+        # rows like those of history, longer than the 64 characters that
+        # get_cwidth caches the width of
+        text = "\n".join(
+            f"{number:>6}  2024-01-01  12:00:00  reg read {number} --all --format=hex"
+            "  --timeout=5"
+            for number in range(size)
+        )
+        old = min(open_and_draw(text_area, text) for _ in range(3))
+        new = min(open_and_draw(text_pager, text) for _ in range(3))
+        print(f"{size:>7} {old * 1e3:>12.1f} {new * 1e3:>13.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,46 @@
+"""
+Benchmark headless command throughput with Ctui.run_headless.
+
+Run with:  uv run benchmarks/bench_headless.py
+
+Runs a script of simple commands without the user interface, recording
+each in the project history, and reports commands per second for each
+project backend.
+"""
+import os
+import tempfile
+import time
+
+from ctui.application import Ctui
+
+COMMANDS = 5000
+
+
+def make_app(backend):
+    app = Ctui()
+    app.project_backend = backend
+
+    @app.command
+    def do_reg_read(address: int):
+        """Read a register"""
+        app.append_output(f"{address:04x}: 0000\n")
+
+    return app
+
+
+def main():
+    with tempfile.TemporaryDirectory() as home:
+        os.environ["HOME"] = home
+        script = [f"reg read {number}" for number in range(COMMANDS)]
+        print(f"{'backend':<8} {'commands/s':>12}")
+        for backend in ["tinydb", "sqlite"]:
+            app = make_app(backend)
+            start = time.perf_counter()
+            results = app.run_headless(script)
+            elapsed = time.perf_counter() - start
+            assert all(result.ok for result in results)
+            print(f"{backend:<8} {COMMANDS / elapsed:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
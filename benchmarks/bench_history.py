@@ -0,0 +1,86 @@
+"""
+Benchmark the cost of recording one command in a project's history.
+
+Run with:  uv run benchmarks/bench_history.py
+
+Each row starts from a project file already holding that many history
+records.  With "immediate" durability every command rewrites the whole
+file, so its cost grows with the history.  With "batched" durability the
+Enter key only appends to memory, so the typical (median) cost stays flat;
+the amortized column spreads the occasional batched write over every command.
+
+The search section compares a regex Query over the TinyDB table with the
+history token index, for the first page of results of a selective search.
+"""
+import statistics
+import tempfile
+import time
+from itertools import islice
+from pathlib import Path
+
+from tinydb import Query, TinyDB
+
+from ctui.history import HistoryJournal
+
+SIZES = [1000, 10000, 50000]
+COMMANDS = 200
+
+
+def record(number):
+    return {"Date": "2026-01-01", "Time": "12:00:00", "Command": f"reg {number} read"}
+
+
+def measure(path, durability):
+    """Return (median seconds per insert, amortized seconds per command)"""
+    db = TinyDB(path)
+    history = HistoryJournal(db.table("history"), durability, batch_size=100)
+    timings = []
+    start = time.perf_counter()
+    for number in range(COMMANDS):
+        before = time.perf_counter()
+        history.insert(record(number))
+        timings.append(time.perf_counter() - before)
+    history.flush()
+    total = time.perf_counter() - start
+    db.close()
+    return statistics.median(timings), total / COMMANDS
+
+
+def measure_search(path):
+    """Return (seconds for a TinyDB regex search, seconds for an indexed search)"""
+    db = TinyDB(path)
+    history = HistoryJournal(db.table("history"))
+    start = time.perf_counter()
+    db.table("history").search(Query().Command.matches(".*reg 4242 "))
+    scanned = time.perf_counter() - start
+    history.index  # built once per project, then kept current on insert
+    start = time.perf_counter()
+    list(islice(history.find("reg 4242 "), 200))
+    indexed = time.perf_counter() - start
+    db.close()
+    return scanned, indexed
+
+
+def main():
+    header = f"{'records':>8}  {'durability':<10} {'usec/median':>12}"
+    print(f"{header} {'usec/amortized':>15}")
+    with tempfile.TemporaryDirectory() as folder:
+        for size in SIZES:
+            for durability in ["immediate", "batched"]:
+                path = Path(folder) / f"{size}_{durability}.json"
+                db = TinyDB(path)
+                db.table("history").insert_multiple(record(n) for n in range(size))
+                db.close()
+                median, amortized = measure(path, durability)
+                print(
+                    f"{size:>8}  {durability:<10} {median * 1e6:>12.1f}"
+                    f" {amortized * 1e6:>15.1f}"
+                )
+        print(f"\n{'records':>8}  {'query ms':>10} {'index ms':>10}")
+        for size in SIZES:
+            scanned, indexed = measure_search(Path(folder) / f"{size}_batched.json")
+            print(f"{size:>8}  {scanned * 1e3:>10.1f} {indexed * 1e3:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
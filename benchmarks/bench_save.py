@@ -0,0 +1,65 @@
+"""
+Benchmark copying a large project file, as project saveas and export do.
+
+Run with:  uv run benchmarks/bench_save.py [size in MB, default 500]
+
+Compares reading the whole file into memory and writing it back out with
+copy_project_file, which copies inside the kernel into a temporary file and
+renames it into place.  Reports the median time and the peak Python memory
+of each.
+"""
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from ctui.database import copy_project_file
+
+RUNS = 5
+
+
+def read_write(source, destination):
+    destination.write_bytes(source.read_bytes())
+
+
+def make_project(path, size):
+    chunk = b'{"history": {"1": {"Command": "reg read 1"}}}\n' * 20000
+    with open(path, "wb") as f:
+        for _ in range(size // len(chunk) + 1):
+            f.write(chunk)
+        f.truncate(size)
+
+
+def measure(copy, source, destination):
+    times = []
+    peaks = []
+    for _ in range(RUNS):
+        tracemalloc.start()
+        start = time.perf_counter()
+        copy(source, destination)
+        times.append(time.perf_counter() - start)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        assert destination.stat().st_size == source.stat().st_size
+    return statistics.median(times), max(peaks)
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    with tempfile.TemporaryDirectory() as folder:
+        source = Path(folder) / "source.MyApp"
+        make_project(source, size * 1024 * 1024)
+        print(f"{size} MB project file")
+        print(f"{'method':<18} {'median s':>9} {'peak MB':>9}")
+        for name, copy in [
+            ("read_write", read_write),
+            ("copy_project_file", copy_project_file),
+        ]:
+            elapsed, peak = measure(copy, source, Path(folder) / f"{name}.MyApp")
+            print(f"{name:<18} {elapsed:>9.3f} {peak / 1024 / 1024:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
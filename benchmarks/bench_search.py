@@ -0,0 +1,85 @@
+"""
+Benchmark stepping between search matches in a long output scrollback.
+
+Run with:  uv run benchmarks/bench_search.py [lines, default 1000000]
+
+Compares prompt_toolkit's buffer search, which scans the text from the
+cursor on each step, with OutputSearch, which finds the matches once and
+then only searches output appended since.  Reports the time to build the
+search, the median time of a step to the next and to the previous match,
+and the time to take in 100 new lines of polling output.
+"""
+import statistics
+import sys
+import time
+
+from prompt_toolkit.document import Document
+
+from ctui.output import OutputBuffer, OutputSearch
+
+STEPS = 50
+PATTERN = "value 0x2a$"
+
+
+def polling_output(start, count):
+    return "".join(
+        f"reg {index % 512:03} read value 0x{index % 4099:x}\n"
+        for index in range(start, start + count)
+    )
+
+
+def time_steps(step, position):
+    times = []
+    for _ in range(STEPS):
+        start = time.perf_counter()
+        position = step(position)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    output = OutputBuffer(scrollback=None)
+    output.append(polling_output(0, lines))
+    print(f"{lines} lines of output, searching {PATTERN!r}")
+    print(
+        f"{'method':<14} {'build ms':>9} {'next ms':>9} {'previous ms':>12} "
+        f"{'append ms':>10}"
+    )
+
+    # prompt_toolkit searches literally from the cursor, with no index to build
+    document = Document(output.text, 0)
+    literal = PATTERN.rstrip("$") + "\n"
+
+    def buffer_next(position):
+        found = Document(document.text, position).find(literal)
+        return position + found if found is not None else 0
+
+    def buffer_previous(position):
+        found = Document(document.text, position).find_backwards(literal)
+        return position + found if found is not None else len(document.text)
+
+    step = time_steps(buffer_next, 0)
+    back = time_steps(buffer_previous, len(document.text))
+    print(
+        f"{'buffer search':<14} {0:>9.1f} {step * 1000:>9.3f} {back * 1000:>12.3f} "
+        f"{'-':>10}"
+    )
+
+    start = time.perf_counter()
+    search = OutputSearch(output, PATTERN)
+    build = time.perf_counter() - start
+    step = time_steps(search.after, 0)
+    back = time_steps(search.before, len(output))
+    output.append(polling_output(lines, 100))
+    start = time.perf_counter()
+    search.update()
+    append = time.perf_counter() - start
+    print(
+        f"{'OutputSearch':<14} {build * 1000:>9.1f} {step * 1000:>9.3f} "
+        f"{back * 1000:>12.3f} {append * 1000:>10.3f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark how long ctui takes to start, from a fresh interpreter each time.
+
+Run with:  uv run benchmarks/bench_startup.py
+
+Reports the median wall time of each stage, each run in a new process:
+
+    import      import ctui
+    register    create a Ctui with one extra command
+    headless    run one command with Ctui.execute, without the user interface
+    prompt      open the user interface, draw the first prompt and quit
+
+Run with ``-X importtime`` to see which modules the import stage loads:
+
+    python -X importtime -c "import ctui" 2> importtime.log
+"""
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+RUNS = 15
+
+SETUP = """
+from ctui import Ctui
+
+app = Ctui()
+
+@app.command
+def do_reg_read(address: int):
+    '''Read a register'''
+    return f"{address:04x}: 0000"
+"""
+
+STAGES = {
+    "python": "pass",
+    "import": "import ctui",
+    "register": SETUP,
+    "headless": SETUP + "assert app.execute('reg read 1').ok",
+    # Ctrl-Q is already waiting on the input, so the UI quits after its first draw
+    "prompt": SETUP
+    + """
+from prompt_toolkit.application import create_app_session
+from prompt_toolkit.input import create_pipe_input
+from prompt_toolkit.output import DummyOutput
+
+with create_pipe_input() as pipe:
+    pipe.send_text("\\x11")
+    with create_app_session(input=pipe, output=DummyOutput()):
+        app.run()
+""",
+}
+
+
+def time_stage(code, env, runs=RUNS):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], env=env, check=True)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def time_stages(runs=RUNS):
+    """Return the median seconds of each stage, with an empty home folder"""
+    with tempfile.TemporaryDirectory() as home:
+        env = dict(os.environ, HOME=home)
+        return {stage: time_stage(code, env, runs) for stage, code in STAGES.items()}
+
+
+def main():
+    print(f"{'stage':<10} {'median ms':>10} {'over python':>12}")
+    times = time_stages()
+    for stage, elapsed in times.items():
+        print(
+            f"{stage:<10} {elapsed * 1000:>10.1f}"
+            f" {(elapsed - times['python']) * 1000:>12.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
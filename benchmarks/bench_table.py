@@ -0,0 +1,78 @@
+"""
+Benchmark formatting a long history listing as a table.
+
+Run with:  uv run benchmarks/bench_table.py [rows, default 100000]
+
+Compares tabulate, which reads every row before formatting any, with
+table_lines, which sizes the columns from the first rows and formats the rest
+as they are read.  Reports the time to the first page, the time for the whole
+table and the peak Python memory of each.  ctui no longer depends on tabulate,
+so it is only compared when installed:
+
+    uv run --with "tabulate<0.9" benchmarks/bench_table.py
+"""
+import sys
+import time
+import tracemalloc
+from itertools import islice
+
+from ctui.functions import table_lines
+
+try:
+    from tabulate import tabulate
+except ImportError:
+    tabulate = None
+
+PAGE = 200
+
+
+def history(count):
+    for index in range(count):
+        yield {
+            "Date": "2026-01-31",
+            "Time": f"{index // 3600 % 24:02}:{index // 60 % 60:02}:{index % 60:02}",
+            "Command": f"reg {index % 500} read",
+        }
+
+
+def with_tabulate(count):
+    lines = iter(tabulate(history(count), headers="keys").splitlines())
+    yield list(islice(lines, PAGE))
+    yield list(lines)
+
+
+def with_table_lines(count):
+    lines = table_lines(history(count), headers="keys")
+    yield list(islice(lines, PAGE))
+    for line in lines:
+        pass
+    yield []
+
+
+def measure(format_table, count):
+    tracemalloc.start()
+    start = time.perf_counter()
+    pages = format_table(count)
+    next(pages)
+    first = time.perf_counter() - start
+    next(pages)
+    total = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return first, total, peak
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    print(f"{count} history rows")
+    print(f"{'method':<12} {'first page s':>12} {'total s':>9} {'peak MB':>9}")
+    methods = [("table_lines", with_table_lines)]
+    if tabulate is not None:
+        methods.insert(0, ("tabulate", with_tabulate))
+    for name, format_table in methods:
+        first, total, peak = measure(format_table, count)
+        print(f"{name:<12} {first:>12.3f} {total:>9.3f} {peak / 1024 / 1024:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
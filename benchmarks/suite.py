@@ -0,0 +1,293 @@
+"""
+Benchmark suite for the hot paths of the command pipeline, with a baseline.
+
+Run with:  uv run benchmarks/suite.py [--save | --compare] [--match NAME]
+
+Times each path against synthetic registries and histories of 10, 1000 and
+50000 entries, and reports microseconds per operation:
+
+    register    registering one command, building a whole registry
+    extract     finding the command in a line and converting its arguments
+    complete    CommandCompleter.get_completions for one keystroke
+    convert     converting an argument string, for every argument type, with
+                the converter parse_args uses
+    history     finding the first page of a search, and recording one command
+                averaged over its batched write, with each project backend
+    append      appending one line to a full output scrollback of that size
+
+and the time ctui takes to start, from a fresh interpreter, for each stage of
+bench_startup.py up to drawing the first prompt:
+
+    startup     seconds from launching Python to the end of each stage
+
+--save writes the results to baseline.json next to this file.  --compare
+runs the suite again and prints each result next to its baseline, marking
+those slower than the tolerance and exiting with status 1 if any are.  The
+checked-in baseline is only comparable on the machine that saved it, so
+save one before changing a hot path and compare after.
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+from itertools import islice
+from pathlib import Path
+from typing import List
+
+from bench_startup import time_stages
+from prompt_toolkit.completion import CompleteEvent
+from prompt_toolkit.document import Document
+from synthetic import best_of, command_names, make_commands, make_function
+
+from ctui.commands import Commands, KwArgs
+from ctui.completion import CommandCompleter
+from ctui.database import BACKENDS, open_memory_database
+from ctui.history import HistoryJournal
+from ctui.output import OutputBuffer
+from ctui.types import (
+    CONVERTERS,
+    NAMED_CONVERTERS,
+    Bin,
+    GreedyBin,
+    GreedyBitArray,
+    GreedyBytes,
+    GreedyFloat,
+    GreedyFloatArray,
+    GreedyHex,
+    GreedyInt,
+    GreedyIntArray,
+    GreedyStr,
+    Hex,
+)
+
+SIZES = [10, 1000, 50000]
+BASELINE = Path(__file__).with_name("baseline.json")
+ROUNDS = 3
+TOLERANCE = 1.5  # slower than baseline by this factor counts as a regression
+
+# argument string converted for each argument type
+ARGUMENTS = {
+    str: "register",
+    int: "4096",
+    float: "3.14",
+    Hex: "de ad be ef 00 11 22 33",
+    GreedyStr: "set the register to its default value",
+    GreedyBytes: "set the register to its default value",
+    GreedyHex: "0xdeadbeef00112233 44 55 66 77",
+    GreedyBin: "0b1010 1100 0011 1111 0000 1111",
+    List[Bin]: "0b1010 1100 0011 1111 0000 1111",
+    GreedyInt: " ".join(str(number) for number in range(32)),
+    List[int]: " ".join(str(number) for number in range(32)),
+    GreedyFloat: " ".join(f"{number}.5" for number in range(32)),
+    List[float]: " ".join(f"{number}.5" for number in range(32)),
+    GreedyIntArray: " ".join(str(number) for number in range(32)),
+    GreedyFloatArray: " ".join(f"{number}.5" for number in range(32)),
+    GreedyBitArray: "0b1010 1100 0011 1111 0000 1111",
+}
+
+
+def type_name(argtype):
+    args = getattr(argtype, "__args__", None)
+    if args:  # List[int] and the like
+        return f"List[{type_name(args[0])}]"
+    return argtype.__name__
+
+
+def bench_register():
+    results = {}
+    for size in SIZES:
+        functions = [
+            make_function(name, f"{name} help\n\n:PARAM address: Register address")
+            for name in command_names(size)
+        ]
+
+        def register():
+            commands = Commands()
+            for func in functions:
+                commands.register(func)
+
+        number = max(1, 10000 // size)
+        results[f"register/{size}"] = best_of(register, number, repeat=3) / size
+    return results
+
+
+def bench_extract():
+    results = {}
+    for size in SIZES:
+        commands = make_commands(size)
+        last = command_names(size)[-1][3:].replace("_", " ")
+        lines = {"bare": last, "args": f"{last} 4096", "unknown": "nothing 1 2 3"}
+        for label, line in lines.items():
+            results[f"extract/{size}/{label}"] = best_of(
+                lambda: commands.extract(line), number=2000
+            )
+    return results
+
+
+def bench_complete():
+    results = {}
+    event = CompleteEvent()
+    for size in SIZES:
+        completer = CommandCompleter(make_commands(size))
+        for text in ["reg1", "reg1 ", "reg1 wr"]:
+            document = Document(text)
+            results[f"complete/{size}/{text.replace(' ', '_')}"] = best_of(
+                lambda: list(completer.get_completions(document, event)), number=200
+            )
+    return results
+
+
+def bench_convert():
+    missing = (set(CONVERTERS) | set(NAMED_CONVERTERS)) - set(ARGUMENTS)
+    assert not missing, f"No argument string for types: {missing}"
+    results = {}
+    for argtype, value in ARGUMENTS.items():
+        convert = KwArgs("value", argtype, "Value to convert").convert
+        results[f"convert/{type_name(argtype)}"] = best_of(
+            lambda: convert(value), number=2000
+        )
+    return results
+
+
+def record(number):
+    return {"Date": "2026-01-01", "Time": "12:00:00", "Command": f"reg {number} read"}
+
+
+def bench_history():
+    results = {}
+    for size in SIZES:
+        for backend in BACKENDS:
+            db = open_memory_database(backend)
+            db.table("history").insert_multiple(record(n) for n in range(size))
+            history = HistoryJournal(db.table("history"), "batched", batch_size=100)
+            if backend == "tinydb":  # the index is the same for both backends
+                history.index  # built once per project, then kept current
+                query = f"reg {size // 2} "
+                results[f"history/{size}/search"] = best_of(
+                    lambda: list(islice(history.find(query), 200)), number=20
+                )
+            # 1000 inserts hold 10 batched writes, and grow the history by 5000
+            numbers = iter(range(size, size + 10**7))
+            results[f"history/{size}/insert/{backend}"] = best_of(
+                lambda: history.insert(record(next(numbers))), number=1000
+            )
+            db.close()
+    return results
+
+
+def bench_append():
+    results = {}
+    line = "reg 042 read value 0x2a\n"
+    for size in SIZES:
+        output = OutputBuffer(scrollback=size)
+        output.append(line * size)
+        results[f"append/{size}"] = best_of(lambda: output.append(line), number=1000)
+    return results
+
+
+def bench_startup():
+    # a few runs each round, the rounds then keep the best median
+    return {f"startup/{stage}": seconds for stage, seconds in time_stages(5).items()}
+
+
+BENCHMARKS = [
+    bench_register,
+    bench_extract,
+    bench_complete,
+    bench_convert,
+    bench_history,
+    bench_append,
+    bench_startup,
+]
+
+
+def run(match="", rounds=ROUNDS):
+    """
+    Run the benchmarks, returning seconds per operation by result name
+
+    Each round runs every benchmark once, and the best of the rounds is kept,
+    so a slow spell of the machine only spoils one round of each result.
+    """
+    results = {}
+    benchmarks = [
+        benchmark
+        for benchmark in BENCHMARKS
+        if match in benchmark.__name__[len("bench_") :]
+    ]
+    for number in range(1, rounds + 1):
+        for benchmark in benchmarks:
+            start = time.perf_counter()
+            for name, seconds in benchmark().items():
+                results[name] = min(seconds, results.get(name, seconds))
+            print(
+                f"round {number} {benchmark.__name__}: "
+                f"{time.perf_counter() - start:.1f} s",
+                file=sys.stderr,
+            )
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Print results against baseline, returning the names that regressed"""
+    print(f"{'benchmark':<32} {'baseline us':>12} {'now us':>12} {'ratio':>7}")
+    regressions = []
+    for name, seconds in results.items():
+        before = baseline.get(name)
+        if before is None:
+            print(f"{name:<32} {'-':>12} {seconds * 1e6:>12.2f} {'new':>7}")
+            continue
+        ratio = seconds / before
+        mark = ""
+        if ratio > tolerance:
+            mark = "  SLOWER"
+            regressions.append(name)
+        elif ratio < 1 / tolerance:
+            mark = "  faster"
+        print(
+            f"{name:<32} {before * 1e6:>12.2f} {seconds * 1e6:>12.2f} "
+            f"{ratio:>7.2f}{mark}"
+        )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--save", action="store_true", help="save as the baseline")
+    mode.add_argument("--compare", action="store_true", help="compare to baseline")
+    parser.add_argument(
+        "--match", default="", help="only benchmarks whose name contains this"
+    )
+    parser.add_argument("--rounds", type=int, default=ROUNDS)
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    args = parser.parse_args()
+
+    results = run(args.match, args.rounds)
+    if args.compare:
+        baseline = json.loads(args.baseline.read_text())
+        print(f"Baseline: {baseline['machine']}, Python {baseline['python']}")
+        regressions = compare(results, baseline["results"], args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} slower than {args.tolerance}x baseline")
+            sys.exit(1)
+        return
+    print(f"{'benchmark':<32} {'us/op':>12}")
+    for name, seconds in results.items():
+        print(f"{name:<32} {seconds * 1e6:>12.2f}")
+    if args.save:
+        baseline = {
+            "machine": platform.machine(),
+            "python": platform.python_version(),
+            "results": results,
+        }
+        if args.match and args.baseline.exists():  # keep the other benchmarks
+            saved = json.loads(args.baseline.read_text())["results"]
+            baseline["results"] = dict(saved, **results)
+        args.baseline.write_text(json.dumps(baseline, indent=2) + "\n")
+        print(f"\nSaved baseline to {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+Synthetic command registries shared by the ctui benchmarks.
+
+Commands are named like ``reg 12 read``, mimicking the multi-word commands
+generated by register-map tools.
+"""
+import timeit
+
+from ctui.commands import Commands
+
+VERBS = ["read", "write", "dump", "watch", "reset"]
+
+
+def make_function(name, doc):
+    def func(address: int = 0):
+        return ""
+
+    func.__name__ = name
+    func.__doc__ = doc
+    return func
+
+
+def command_names(count):
+    """Return count unique three-word do_ function names"""
+    names = []
+    for index in range(count):
+        verb = VERBS[index % len(VERBS)]
+        names.append(f"do_reg{index // len(VERBS)}_{verb}")
+    return names
+
+
+def make_commands(count):
+    commands = Commands()
+    for name in command_names(count):
+        commands.register(
+            make_function(name, f"{name} help\n\n:PARAM address: Register address")
+        )
+    return commands
+
+
+def best_of(func, number=1000, repeat=5):
+    """Best average seconds per call of func"""
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
@@ -25,7 +25,17 @@ myapp.prompt = "fs> "
 myapp.help_message = "Type your Linux commands on top...\nresults appear on the bottom."
 # If you don't set a statusbar, the default will be "lambda: f"PROJECT: {myapp.project_name}"
 # Statusbar must be callable
-myapp.statusbar = lambda: f"PROJECT: {myapp.project_name} | CWD: {os.getcwd()}"
+myapp.statusbar = lambda: f"PROJECT: {myapp.project_name}"
+
+
+# More statusbar segments are shown after it, each refreshed after every command,
+# or every interval seconds with @myapp.segment(interval=5) for things that change
+# on their own, like the connection state of a device.  They run on a worker
+# thread, so a slow segment never holds up typing.
+@myapp.segment
+def cwd():
+    return f"CWD: {os.getcwd()}"
+
 
 # Each function representing a command must:
 #     - start with a do_
@@ -34,18 +44,18 @@ myapp.statusbar = lambda: f"PROJECT: {myapp.project_name} | CWD: {os.getcwd()}"
 #         output_text:  is the current text in the window
 #     - return a string to print, None, or False
 # Returning a False does nothing, forcing users to correct mistakes
+# Use myapp.append_output(text) to add to the output window without rebuilding it
 
 
 # Example of a command with no arguments
 @myapp.command
 def do_ls():
     """Help menu for ls."""  # <--- this will be used in help messages
-    output_text = myapp.output_text  # Grab existing output text
-    output_text += "Contents of " + os.getcwd() + ":\n"
-    # notice that we appended that text onto the existing output_text
+    output_text = "Contents of " + os.getcwd() + ":\n"
     for item in os.listdir():
         output_text += " " + item + "\n"
-    return output_text
+    # notice that we append only the new text onto the existing output
+    myapp.append_output(output_text)
 
 
 # Example of a command with 1 argument
@@ -60,9 +70,22 @@ def do_cd(directory: str):
     except FileNotFoundError:
         # Returning False on bad input forces users to edit their input
         return False
-    output_text = myapp.output_text  # Grab existing output text
-    output_text = output_text + "Directory changed to " + os.getcwd() + "\n"
-    return output_text
+    myapp.append_output("Directory changed to " + os.getcwd() + "\n")
+
+
+# Example of a slow command run on a worker thread, so the UI stays responsive.
+# Each yielded chunk of text shows up in the output window as soon as it is found.
+# Press Ctrl-C while it runs to cancel it, or define commands with async def.
+@myapp.command(thread=True, timeout=60)
+def do_find(name: str):
+    """Find files below the current directory.
+
+    :PARAM name: Part of the filename to search for
+    """
+    for root, dirs, files in os.walk(os.getcwd()):
+        for item in files:
+            if name in item:
+                yield os.path.join(root, item) + "\n"
 
 
 myapp.run()
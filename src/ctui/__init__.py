@@ -13,8 +13,17 @@ Control Things User Interface, aka ctui.py
 # details at <http://www.gnu.org/licenses/>.
 """
 import ctui.types
-from ctui.application import Ctui
 
 __all__ = [
     "Ctui",
 ]
+
+
+def __getattr__(name):
+    # Load the application, and prompt_toolkit with it, on first use of ctui.Ctui
+    if name == "Ctui":
+        from ctui.application import Ctui
+
+        globals()["Ctui"] = Ctui
+        return Ctui
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
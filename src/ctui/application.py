@@ -12,20 +12,59 @@ Control Things User Interface, aka ctui.py
 # FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
 # details at <http://www.gnu.org/licenses/>.
 """
+import time
+from collections import deque
 from datetime import datetime
+from functools import partial
 from pathlib import Path
+from threading import RLock
 
-from prompt_toolkit.application import Application
-from prompt_toolkit.application.current import get_app
-from prompt_toolkit.layout.layout import Layout
-from tinydb import TinyDB
-
+from ctui.catalog import ProjectCatalog
 from ctui.commands import Commands, register_default_commands
-from ctui.keybindings import get_key_bindings
-from ctui.layout import CtuiLayout
-from ctui.style import CtuiStyle
+from ctui.database import open_database, open_memory_database
+from ctui.history import HistoryJournal
+from ctui.output import OutputBuffer
+from ctui.profiling import LagMonitor
+from ctui.statusbar import Statusbar
+
+# prompt_toolkit and asyncio are imported by the methods that need them, so
+# headless runs and scripts that only register commands start quickly
+from .dialogs import DialogLog, headless_dialogs, yes_no_dialog
+
+
+class Result(object):
+    """
+    Outcome of a command run with Ctui.execute, without the user interface
+
+    :param text: The command line that was run
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self.value = None  # what the command function returned
+        self.output = ""  # text the command added to the output buffer
+        self.dialogs = DialogLog()  # dialogs the command would have shown
+        self.error = None  # error message if the command failed
+
+    @property
+    def ok(self):
+        return self.error is None
 
-from .dialogs import yes_no_dialog
+    def __repr__(self):
+        return str(
+            {"text": self.text, "output": self.output, "dialogs": self.dialogs}
+            if self.ok
+            else {"text": self.text, "error": self.error}
+        )
+
+    def __str__(self):
+        lines = [self.output.rstrip("\n")] if self.output else []
+        for dialog in self.dialogs:
+            title = f"[{dialog['title']}]\n" if dialog["title"] else ""
+            lines.append(f"{title}{dialog['text']}")
+        if self.error:
+            lines.append(f"[Error]\n{self.error}")
+        return "\n".join(lines)
 
 
 class Ctui(object):
@@ -46,14 +85,43 @@ class Ctui(object):
     prompt = "> "
     help_message = "Commands go on top, results appear on the bottom."
     wrap_lines = False  # Wrap lines in main output window or not
-    # statusbar = lambda: f"PROJECT: {self.project_name}"  # zero-argument callable evaluated when the UI renders
+    scrollback = 10000  # Max lines kept in main output window, None for unlimited
+    refresh_interval = 0.05  # Min seconds between output window redraws
+    page_size = 200  # Rows per page in long listings such as history search
+    history_durability = "batched"  # History writes: "immediate", "batched" or "exit"
+    history_batch_size = 100  # Commands held in memory before a batched history write
+    history_flush_interval = 5  # Max seconds before a batched history write
+    project_backend = "tinydb"  # Format of new project files: "tinydb" or "sqlite"
+    headless_assume_yes = False  # Answer Yes/No dialogs with Yes in headless mode
+    timings_window = 1000  # Latest command runs kept for the debug timings command
+    lag_threshold = None  # Seconds of UI freeze that debug lag records, None for off
+    statusbar_interval = 1  # Max seconds before the statusbar callable is called again
+    # statusbar = lambda: f"PROJECT: {self.project_name}"  # zero-argument callable, refreshed after each command
 
     # sets various defaults if not overriden with subclass
     def __init__(self, layout=None):
         self.commands = Commands()
         register_default_commands(ctui=self)
         self.project_name = "default"
+        self.output = OutputBuffer(self.scrollback)
+        self._output_lock = RLock()  # held to change or read it off the UI thread
+        self._queued_output = deque()  # (replace, text) from worker threads
+        self._mode = None
+        self._running_task = None  # non-blocking command currently running
+        self._running_command = None  # text of that command, shown in statusbar
+        self._refresh_pending = False
+        self._last_refresh = 0.0
+        self._shown_offset = 0  # output.offset of the text in the output window
+        self._shown_length = 0  # and its length
+        self._captured = None  # output added by the running headless command
+        self._scripted = False  # run_headless is running, and closes the project
+        self._memory_db = None  # unsaved default project, kept until reset
+        self._catalog = None
         self.statusbar = lambda: f"PROJECT: {self.project_name}"
+        self.segments = Statusbar()
+        self.segments.add("statusbar", self._statusbar_text)
+        self.lag_monitor = LagMonitor()
+        self._lag_task = None
 
     @property
     def welcome(self):
@@ -68,31 +136,364 @@ class Ctui(object):
         return f"{self.project_folder}{self.project_name}.{self.name}"
 
     @property
-    def _statusbar(self):
+    def catalog(self):
+        """Index of the saved projects, with their sizes and record counts"""
+        folder = Path(self.project_folder)
+        if self._catalog is None or self._catalog.folder != folder:
+            self._catalog = ProjectCatalog(folder, f".{self.name}")
+        return self._catalog
+
+    @property
+    def _in_memory(self):
+        """True while the unsaved default project is open"""
+        return self.project_name == "default"
+
+    def _statusbar_text(self):
         statusbar = self.statusbar if callable(self.statusbar) else lambda: 'ERROR: .statusbar must be callable such as "lambda: f"PROJECT: {self.project_name}""'
+        return statusbar()
+
+    @property
+    def _statusbar(self):
+        """Statusbar text of the cached segments, without calling any of them"""
+        statusbar = self.segments.text
+        if self._running_command is not None:
+            running = self._running_command
+            return lambda: f"{statusbar()} | RUNNING: {running} (Ctrl-C to cancel)"
         return statusbar
 
+    def segment(self, func=None, name=None, interval=None):
+        """
+        Decorator to add a function as a segment of the statusbar
+
+        Use as ``@ctui.segment``, or as ``@ctui.segment(interval=5)`` to call
+        it again every 5 seconds.  Segments are called on a worker thread, or
+        on the event loop if defined with ``async def``, and their text is
+        kept until they are refreshed.  Each segment is shown after the
+        statusbar callable, and all are refreshed after each command.
+
+        :param name: Name of the segment, the function name by default
+        :param interval: Seconds between refreshes, None to refresh only with
+            invalidate_statusbar or after a command
+        """
+        if func is None:
+            return partial(self.segment, name=name, interval=interval)
+        self.segments.add(name or func.__name__, func, interval)
+        return func
+
+    def invalidate_statusbar(self, *names):
+        """Refresh the named statusbar segments, or all of them, soon after"""
+        self.segments.invalidate(*names)
+
+    def watch_lag(self, threshold):
+        """
+        Record each time the event loop is blocked for more than threshold
+        seconds, with the stack of what blocked it, for the debug lag command
+        """
+        assert self._mode == "term_ui", "Only the user interface has a loop to watch"
+        self.lag_monitor.threshold = threshold
+        if self._lag_task is None:
+            self._lag_task = self.app.create_background_task(self.lag_monitor.run())
+
+    def stop_watching_lag(self):
+        if self._lag_task is not None:
+            self._lag_task.cancel()
+            self._lag_task = None
+
+    @property
+    def output_text(self):
+        """
+        Current text of the main output window
+
+        On a worker thread this includes the changes it has queued for the UI
+        thread, so ``ctui.output_text += text`` keeps the output before it.
+        """
+        if self._in_ui_thread():
+            return self.output.text
+        with self._output_lock:
+            return self._queued_text()
+
+    @output_text.setter
+    def output_text(self, text):
+        if self._in_ui_thread():
+            self._replace_output(text)
+            return
+        with self._output_lock:  # so no other thread queues in between
+            current = self._queued_text()
+            if text.startswith(current):
+                self._queue_output(text[len(current) :], replace=False)
+            else:
+                self._queue_output(text, replace=True)
+
+    def _replace_output(self, text):
+        with self._output_lock:
+            if self._captured is not None:
+                current = self.output.text
+                self._captured.append(
+                    text[len(current) :] if text.startswith(current) else text
+                )
+            self.output.replace(text)
+        self._refresh_output()
+
+    def append_output(self, text):
+        """
+        Append text to the main output window without rewriting earlier output
+
+        From a worker thread, such as a threaded command's, the text is appended
+        on the UI thread soon after, as only that thread changes the output.
+        """
+        if self._in_ui_thread():
+            self._append_output(text)
+        else:
+            self._queue_output(text, replace=False)
+
+    def _append_output(self, text):
+        with self._output_lock:
+            if self._captured is not None:
+                self._captured.append(text)
+            self.output.append(text)
+        self._refresh_output()
+
+    def _queue_output(self, text, replace):
+        """Change the output from a worker thread, in order, on the UI thread"""
+        with self._output_lock:
+            self._queued_output.append((replace, text))
+        self.app.loop.call_soon_threadsafe(self._apply_queued_output)
+
+    def _apply_queued_output(self):
+        with self._output_lock:
+            replace, text = self._queued_output.popleft()
+            if replace:
+                self._replace_output(text)
+            else:
+                self._append_output(text)
+
+    def _queued_text(self):
+        """Text of the output once the queued changes are applied"""
+        text = self.output.text
+        for replace, change in self._queued_output:
+            text = change if replace else text + change
+        return text
+
+    def _refresh_output(self):
+        """Show the output buffer in the output window, at most every refresh_interval"""
+        if self._mode == "term_ui" and not self._refresh_pending:
+            self._refresh_pending = True
+            self._call_in_ui(self._schedule_output)
+
+    def _schedule_output(self):
+        delay = self._last_refresh + self.refresh_interval - time.monotonic()
+        # coalesce output that streams in faster than the redraw rate
+        if delay > 0 and self.app.loop:
+            self.app.loop.call_later(delay, self._show_output)
+        else:
+            self._show_output()
+
+    def _show_output(self):
+        from prompt_toolkit.document import Document
+
+        self._refresh_pending = False  # reset first, so no appended text is missed
+        self._last_refresh = time.monotonic()
+        text = self.output.text
+        buffer = self.layout.output_field.buffer
+        cursor = len(text)
+        if self.app.layout.has_focus(buffer):
+            # keep the place of a user browsing the output, as old lines drop off
+            dropped = self.output.offset - self._shown_offset
+            cursor = min(max(buffer.cursor_position - dropped, 0), len(text))
+        self._shown_offset = self.output.offset
+        self._shown_length = len(text)
+        buffer.set_document(
+            Document(text=text, cursor_position=cursor), bypass_readonly=True
+        )
+
+    def _show_changed_output(self):
+        """Show the output buffer in the output window now, if it has changed"""
+        shown = (self._shown_offset, self._shown_length)
+        if (self.output.offset, len(self.output)) != shown:
+            self._show_output()
+
+    def _in_ui_thread(self):
+        """True unless called from a thread other than the UI event loop's"""
+        from asyncio import get_running_loop
+
+        if self._mode != "term_ui":
+            return True  # no user interface to keep in step with
+        loop = self.app.loop
+        try:
+            running_loop = get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        return loop is None or loop is running_loop
+
+    def _call_in_ui(self, func):
+        """Call func on the UI event loop, even from a threaded command"""
+        if self._in_ui_thread():
+            func()
+        else:
+            self.app.loop.call_soon_threadsafe(func)
+
     def _init_db(self):
         """setup database storage"""
-        self.db = TinyDB(self._project_path)
+        if not self._in_memory:
+            self.db = open_database(self._project_path, self.project_backend)
+        else:
+            if self._memory_db is None:
+                self._memory_db = open_memory_database(self.project_backend)
+            self.db = self._memory_db
         self.settings = self.db.table("settings")
         self.storage = self.db.table("storage")
-        self.history = self.db.table("history")
+        self.history = HistoryJournal(
+            self.db.table("history"),
+            durability=self.history_durability,
+            batch_size=self.history_batch_size,
+            interval=self.history_flush_interval,
+            schedule=self._call_later,
+        )
 
-    def command(self, func):
-        return self.commands.register(func)
+    def _close_db(self):
+        """
+        Write pending history and close the project database
+
+        The unsaved default project stays open, so it can be loaded again.
+        """
+        self.history.flush()
+        if self.db is not self._memory_db:
+            self.db.close()
+            self.catalog.touch(self.project_name)
+
+    def _call_later(self, delay, func):
+        """Schedule func on the UI event loop, returning a cancelable handle"""
+        if self._mode == "term_ui" and self.app.loop:
+            return self.app.loop.call_later(delay, func)
+
+    def command(self, func=None, thread=False, timeout=None, complete=None):
+        """
+        Decorator to register a function as a command
+
+        Use as ``@ctui.command``, or as ``@ctui.command(thread=True, timeout=5)``
+        to run a slow regular function on a worker thread.  Functions defined
+        with ``async def`` always run on the event loop without blocking it.
+        complete maps argument names to functions returning the values to
+        suggest for them, such as ``complete={"name": lambda: ["a", "b"]}``.
+        """
+        if func is None:
+            return partial(
+                self.command, thread=thread, timeout=timeout, complete=complete
+            )
+        return self.commands.register(
+            func, thread=thread, timeout=timeout, complete=complete
+        )
+
+    def _record_history(self, command_text):
+        date, time = str(datetime.today()).split()
+        self.history.insert(
+            {"Date": date, "Time": time.split(".")[0], "Command": command_text}
+        )
+
+    def _start(self, mode):
+        """Open a clean default project and apply settings for the given mode"""
+        # start with clean default project at each start, kept in memory until saved
+        self._memory_db = None
+        self._init_db()
+        self.output.scrollback = self.scrollback
+        self.commands.timings.window = self.timings_window
+        self._mode = mode
+
+    def execute(self, text):
+        """
+        Run one command line without the user interface and return a Result
+
+        Dialogs the command shows are logged in the Result instead, and output
+        it appends or returns is collected there as well as in ctui.output.
+        The first call opens the default project, like run() does.  History
+        is written as each command finishes, unless run_headless is running;
+        call close() when done, to close the project.
+        """
+        if self._mode is None:
+            self._start("headless")
+        result = Result(text)
+        result.dialogs.assume_yes = self.headless_assume_yes
+        self._captured = []
+        token = headless_dialogs.set(result.dialogs)
+        try:
+            command, kwargs = self.commands.extract(text)
+            if command is None:
+                result.error = f'Unknown command "{text}"'
+            elif command.blocking:
+                result.value = command.execute(**kwargs)
+            else:
+                from asyncio import run
+
+                if command.is_stream:
+                    run(command.stream(self.append_output, **kwargs))
+                else:
+                    result.value = run(command.execute_async(**kwargs))
+        except AssertionError as error:
+            result.error = str(error)
+        except Exception:
+            from traceback import format_exc
+
+            result.error = format_exc()
+        finally:
+            headless_dialogs.reset(token)
+
+        # For invalid commands, matching the Enter key in the user interface
+        if result.ok and result.value != False:
+            if self._mode == "headless":  # exit closes the project database
+                self._record_history(text)
+                if not self._scripted:  # nothing else would write it
+                    self.history.flush()
+            if isinstance(result.value, str):
+                self.output_text = result.value
+        result.output = "".join(self._captured)
+        self._captured = None
+        return result
+
+    def run_headless(self, stream, output=None):
+        """
+        Run each line of stream as a command, without the user interface
+
+        Blank lines and lines starting with # are skipped.  The project is
+        closed once the stream ends.
+
+        :param stream: Iterable of command lines, such as an open file
+        :param output: Optional file object that each Result is written to
+        :return: List of Result objects, one per command run
+        """
+        results = []
+        self._scripted = True
+        try:
+            for line in stream:
+                text = line.strip()
+                if not text or text.startswith("#"):
+                    continue
+                result = self.execute(text)
+                results.append(result)
+                if output is not None and str(result):
+                    output.write(f"{result}\n")
+        finally:
+            self._scripted = False
+            self.close()
+        return results
+
+    def close(self):
+        """Write pending history and close the project opened by execute"""
+        if self._mode == "headless":
+            self._close_db()
+            self._mode = None
 
     def run(self):
         """Start the python_prompt application with ctui's default settings"""
-        Path(self.project_folder).mkdir(parents=True, exist_ok=True)
-        if Path(
-            self._project_path
-        ).exists():  # start with clean default project at each start
-            Path.unlink(Path(self._project_path))
-        self._init_db()
+        from prompt_toolkit.application import Application
+        from prompt_toolkit.layout.layout import Layout
+
+        from ctui.keybindings import get_key_bindings
+        from ctui.layout import CtuiLayout
+        from ctui.style import CtuiStyle
+
+        self._start("term_ui")
         self.layout = CtuiLayout(self)
         self.style = CtuiStyle()
-        self._mode = "term_ui"  # For future headless mode
         layout = Layout(
             self.layout.root_container, focused_element=self.layout.input_field
         )
@@ -104,15 +505,25 @@ class Ctui(object):
             mouse_support=True,
             full_screen=True,
         )
-        self.app.run()
+        self._refresh_output()
+        self.segments.segments["statusbar"].interval = self.statusbar_interval
+        self.app.run(pre_run=self._pre_run)
+        self._close_db()  # also covers a forced quit with Ctrl-Q
+
+    def _pre_run(self):
+        """Start the background tasks of the user interface, once its loop runs"""
+        self.app.create_background_task(self.segments.run(self.app.invalidate))
+        self._lag_task = None
+        if self.lag_threshold:
+            self.watch_lag(self.lag_threshold)
 
     def _log_and_exit(self):
-        date, time = str(datetime.today()).split()
-        self.history.insert(
-            {"Date": date, "Time": time.split(".")[0], "Command": "exit"}
-        )
-        self.db.close()
-        get_app().exit()
+        self._record_history("exit")
+        self._close_db()
+        if self._mode == "term_ui":
+            self.app.exit()
+        else:
+            self._mode = None
 
     def exit(self):
         """Graceful shutdown of the prompt_toolkit application"""
@@ -14,43 +14,17 @@ Control Things User Interface, aka ctui.py
 """
 from __future__ import unicode_literals
 
-from functools import partial
-
-import six
 from prompt_toolkit.application.current import get_app
-from prompt_toolkit.auto_suggest import DynamicAutoSuggest
-from prompt_toolkit.buffer import Buffer
+from prompt_toolkit.data_structures import Point
 from prompt_toolkit.document import Document
-from prompt_toolkit.filters import Condition, has_focus, is_done, is_true, to_filter
-from prompt_toolkit.formatted_text import Template, is_formatted_text, to_formatted_text
-from prompt_toolkit.formatted_text.utils import fragment_list_to_text
+from prompt_toolkit.filters import Condition
 from prompt_toolkit.key_binding.key_bindings import KeyBindings
-from prompt_toolkit.keys import Keys
-from prompt_toolkit.layout.containers import (
-    ConditionalContainer,
-    DynamicContainer,
-    Float,
-    FloatContainer,
-    HSplit,
-    VSplit,
-    Window,
-    WindowAlign,
-    is_container,
-)
-from prompt_toolkit.layout.controls import BufferControl, FormattedTextControl
-from prompt_toolkit.layout.dimension import Dimension as D
-from prompt_toolkit.layout.dimension import is_dimension, to_dimension
-from prompt_toolkit.layout.margins import NumberedMargin, ScrollbarMargin
-from prompt_toolkit.layout.processors import (
-    AppendAutoSuggestion,
-    BeforeInput,
-    ConditionalProcessor,
-    PasswordProcessor,
-)
-from prompt_toolkit.lexers import DynamicLexer
+from prompt_toolkit.layout.containers import Window, WindowAlign
+from prompt_toolkit.layout.controls import FormattedTextControl, UIContent, UIControl
+from prompt_toolkit.layout.margins import ConditionalMargin, ScrollbarMargin
 from prompt_toolkit.mouse_events import MouseEventType
-from prompt_toolkit.utils import get_cwidth
-from prompt_toolkit.widgets.toolbars import SearchToolbar
+
+from ctui.output import LineIndex
 
 
 class Button(object):
@@ -63,7 +37,7 @@ class Button(object):
     """
 
     def __init__(self, text, handler=None, width=12):
-        assert isinstance(text, six.text_type)
+        assert isinstance(text, str)
         assert handler is None or callable(handler)
         assert isinstance(width, int)
 
@@ -120,3 +94,178 @@ class Button(object):
 
     def __pt_container__(self):
         return self.window
+
+
+class PagerControl(UIControl):
+    """
+    Read-only text control that only builds the lines the window shows.
+
+    The cursor stays on the top visible line, so the window scrolls along
+    with it, including when scrolled with the mouse wheel.
+
+    :param text: Text to show
+    :param lexer: Optional prompt_toolkit lexer for the text
+    :param accept_handler: Called when Enter is pressed
+    """
+
+    def __init__(self, text="", lexer=None, accept_handler=None):
+        self.index = LineIndex(text)
+        self.lexer = lexer
+        self.accept_handler = accept_handler
+        self.cursor = 0
+        self._lexed_line = None  # lexer's get_line for the current text
+
+    def append(self, text):
+        self.index.append(text)
+        self._lexed_line = None
+
+    def is_focusable(self):
+        return True
+
+    def preferred_width(self, max_available_width):
+        # measure the lines that can be on screen, the rest once scrolled to
+        self.index.find(self.cursor + get_app().output.get_size().rows)
+        return self.index.width
+
+    def preferred_height(
+        self, width, max_available_height, wrap_lines, get_line_prefix
+    ):
+        height = 0
+        for lineno in range(min(self.index.line_count, max_available_height)):
+            if wrap_lines and width > 0:
+                height += max(1, -(-len(self.index.line(lineno)) // width))
+            else:
+                height += 1
+            if height >= max_available_height:
+                return max_available_height
+        return height
+
+    def _get_line(self, lineno):
+        return [("", self.index.line(lineno))]
+
+    def create_content(self, width, height):
+        get_line = self._get_line
+        if self.lexer is not None:
+            if self._lexed_line is None:
+                document = Document(self.index.text, cursor_position=0)
+                self._lexed_line = self.lexer.lex_document(document)
+            get_line = self._lexed_line
+        return UIContent(
+            get_line=get_line,
+            line_count=self.index.line_count,
+            cursor_position=Point(x=0, y=self.cursor),
+            show_cursor=False,
+        )
+
+    def move_cursor_down(self):
+        self.cursor = min(self.cursor + 1, self.index.line_count - 1)
+
+    def move_cursor_up(self):
+        self.cursor = max(self.cursor - 1, 0)
+
+    def scroll(self, window, lines):
+        """Scroll window by lines, keeping the last page full"""
+        info = window.render_info
+        if info is None:
+            return
+        bottom = max(0, self.index.line_count - info.window_height)
+        top = min(max(window.vertical_scroll + lines, 0), bottom)
+        window.vertical_scroll = self.cursor = top
+
+    def get_key_bindings(self):
+        kb = KeyBindings()
+
+        def page(event):
+            info = event.app.layout.current_window.render_info
+            return info.window_height if info else 1
+
+        @kb.add("down")
+        def _(event):
+            self.scroll(event.app.layout.current_window, 1)
+
+        @kb.add("up")
+        def _(event):
+            self.scroll(event.app.layout.current_window, -1)
+
+        @kb.add("pagedown")
+        @kb.add(" ")
+        def _(event):
+            self.scroll(event.app.layout.current_window, page(event))
+
+        @kb.add("pageup")
+        def _(event):
+            self.scroll(event.app.layout.current_window, -page(event))
+
+        @kb.add("home")
+        def _(event):
+            self.scroll(event.app.layout.current_window, -self.index.line_count)
+
+        @kb.add("end")
+        def _(event):
+            self.scroll(event.app.layout.current_window, self.index.line_count)
+
+        @kb.add("enter")
+        def _(event):
+            if self.accept_handler is not None:
+                self.accept_handler()
+
+        return kb
+
+
+class TextPager(object):
+    """
+    Scrollable read-only text, fast to open however long the text is.
+
+    Lines are indexed as they scroll into view, and only visible lines are
+    rendered.  Scroll with the arrow keys, Page Up/Down, Space, Home/End or
+    the mouse wheel.
+
+    :param text: Text to show
+    :param lexer: Optional prompt_toolkit lexer for the text
+    :param width: Width of the text, defaults to its longest visible line
+    :param wrap_lines: Wrap lines wider than the window
+    :param scrollbar: Show a scrollbar, or None to show one for long texts
+    :param accept_handler: Called when Enter is pressed
+    """
+
+    def __init__(
+        self,
+        text="",
+        lexer=None,
+        width=None,
+        wrap_lines=True,
+        scrollbar=None,
+        accept_handler=None,
+    ):
+        self.control = PagerControl(text, lexer=lexer, accept_handler=accept_handler)
+
+        @Condition
+        def show_scrollbar():
+            if scrollbar is not None:
+                return scrollbar
+            rows = get_app().output.get_size().rows
+            return self.control.index.line_count > rows - 6
+
+        self.window = Window(
+            content=self.control,
+            width=width,
+            wrap_lines=wrap_lines,
+            right_margins=[
+                ConditionalMargin(ScrollbarMargin(display_arrows=True), show_scrollbar)
+            ],
+        )
+
+    @property
+    def text(self):
+        return self.control.index.text
+
+    def append(self, text):
+        """Add text to the end, without indexing the text already shown again"""
+        self.control.append(text)
+
+    def scroll_to(self, lineno):
+        """Scroll so lineno is the top line, or as near as a full last page allows"""
+        self.control.scroll(self.window, lineno - self.window.vertical_scroll)
+
+    def __pt_container__(self):
+        return self.window
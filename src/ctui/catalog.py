@@ -0,0 +1,176 @@
+"""
+Control Things User Interface, aka ctui.py
+
+# Copyright (C) 2019  Justin Searle
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or any later version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details at <http://www.gnu.org/licenses/>.
+"""
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from ctui.database import count_documents
+
+
+class ProjectCatalog(object):
+    """
+    Index of the saved projects in a project folder, kept in a file there.
+
+    Each project has its size, modification time and document counts per
+    table.  For names, the folder is only scanned again when its mtime
+    changes, which happens when a project is added, removed or replaced.
+    Listing projects also checks the size and mtime of each file, since a
+    file rewritten in place leaves the folder mtime alone, and only files
+    whose size or mtime changed are opened to count their documents.  The
+    open project is marked with touch, as SQLite may only have written to
+    its write-ahead log.  A folder changed in the last couple of seconds is
+    scanned again on each call, since a change right after a scan may leave
+    its mtime unchanged.
+
+    :param folder: Folder holding the project files
+    :param suffix: Extension of the project files, such as ".MyApp"
+    """
+
+    filename = ".catalog.json"
+    # A folder changed this recently may change again without its mtime moving
+    racy_window = 2 * 10**9  # nanoseconds
+
+    def __init__(self, folder, suffix):
+        self.folder = Path(folder)
+        self.suffix = suffix
+        self._projects = {}
+        self._folder_mtime = None  # of the folder, when last scanned
+        self._file_mtime = None  # of the catalog file, when last read or written
+
+    @property
+    def path(self):
+        return self.folder / self.filename
+
+    def _read(self):
+        """Load the catalog file, if another process changed it since last time"""
+        try:
+            mtime = self.path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._file_mtime:
+            return
+        try:
+            data = json.loads(self.path.read_text())
+            self._projects = data["projects"]
+            self._folder_mtime = data["folder_mtime"]
+        except (OSError, ValueError, KeyError):
+            self._projects = {}  # unreadable, so rebuild it
+            self._folder_mtime = None
+        self._file_mtime = mtime
+
+    def _trusted(self, folder_mtime):
+        """Return folder_mtime, or None if it is too recent to rely on"""
+        if time.time_ns() - folder_mtime < self.racy_window:
+            return None
+        return folder_mtime
+
+    def _write(self):
+        """Replace the catalog file atomically, so readers never see half of it"""
+        scanned = self._folder_mtime
+        before = self.folder.stat().st_mtime_ns
+        fd, temporary = tempfile.mkstemp(
+            prefix=f"{self.filename}.", suffix=".tmp", dir=self.folder
+        )
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump({"folder_mtime": scanned, "projects": self._projects}, f)
+            os.replace(temporary, self.path)
+        except BaseException:
+            Path(temporary).unlink(missing_ok=True)
+            raise
+        self._file_mtime = self.path.stat().st_mtime_ns
+        # the rename changed the folder mtime, which only this process knows,
+        # and which it may only rely on if nothing else changed the folder
+        after = self.folder.stat().st_mtime_ns
+        self._folder_mtime = self._trusted(after) if before == scanned else None
+
+    def _scan(self):
+        """Match the catalog to the project files, if the folder changed"""
+        self._read()
+        try:
+            folder_mtime = self.folder.stat().st_mtime_ns
+        except FileNotFoundError:
+            self._projects = {}
+            return False
+        if folder_mtime == self._folder_mtime:
+            return False
+        projects = {}
+        with os.scandir(self.folder) as entries:
+            for entry in entries:
+                if not entry.name.endswith(self.suffix) or not entry.is_file():
+                    continue
+                name = entry.name[: -len(self.suffix)]
+                stat = entry.stat()
+                project = self._projects.get(name)
+                if (
+                    project is None
+                    or project["size"] != stat.st_size
+                    or project["mtime"] != stat.st_mtime_ns
+                ):
+                    project = {"size": stat.st_size, "mtime": stat.st_mtime_ns}
+                    project["counts"] = None  # counted when first listed
+                projects[name] = project
+        # a changed folder mtime alone is not written, as writing changes it
+        changed = projects != self._projects
+        self._projects = projects
+        self._folder_mtime = self._trusted(folder_mtime)
+        return changed
+
+    def names(self):
+        """Return the sorted names of the saved projects, without opening any"""
+        if self._scan():
+            self._write()
+        return sorted(self._projects)
+
+    def projects(self):
+        """Return a dict of each saved project name to its details"""
+        changed = self._scan()
+        for name, project in list(self._projects.items()):
+            path = self.folder / f"{name}{self.suffix}"
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                del self._projects[name]
+                changed = True
+                continue
+            if (
+                project["counts"] is not None
+                and project["size"] == stat.st_size
+                and project["mtime"] == stat.st_mtime_ns
+            ):
+                continue
+            try:
+                counts = count_documents(path)
+            except FileNotFoundError:
+                del self._projects[name]
+                changed = True
+                continue
+            except (OSError, ValueError):
+                counts = {}  # not a valid project, shown without records
+            project.update(size=stat.st_size, mtime=stat.st_mtime_ns, counts=counts)
+            changed = True
+        if changed:
+            self._write()
+        return dict(self._projects)
+
+    def touch(self, name):
+        """Mark a project as changed in place, so it is counted again when listed"""
+        self._read()
+        project = self._projects.get(name)
+        if project is not None and project["counts"] is not None:
+            project["counts"] = None
+            self._write()
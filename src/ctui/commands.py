@@ -13,28 +13,69 @@ Control Things User Interface, aka ctui.py
 # details at <http://www.gnu.org/licenses/>.
 """
 import shlex
-from inspect import getfullargspec
+from bisect import bisect_left, insort
+from contextvars import copy_context
+from datetime import datetime
+from functools import partial
+from inspect import (
+    getfullargspec,
+    isasyncgenfunction,
+    iscoroutinefunction,
+    isgeneratorfunction,
+)
+from itertools import islice
 from pathlib import Path
+from threading import Event
 
-from tabulate import tabulate
-from tinydb import Query
+from ctui.database import (
+    BACKENDS,
+    check_project_file,
+    convert_database,
+    copy_database,
+    copy_project_file,
+    open_memory_database,
+    remove_database,
+    save_database,
+)
+from ctui.dialogs import message_dialog, paged_dialog, yes_no_dialog
+from ctui.functions import show_help, table_lines, table_pages
+from ctui.profiling import CommandTimings, profile_command
+from ctui.types import GreedyStr, converter, is_greedy
 
-from ctui.dialogs import message_dialog, yes_no_dialog
-from ctui.functions import show_help
-from ctui.types import is_greedy, to_type
+
+def modified(mtime_ns):
+    """Format a file modification time in nanoseconds for project listings"""
+    return datetime.fromtimestamp(mtime_ns / 1e9).strftime("%Y-%m-%d %H:%M")
+
+
+def run_in_thread(func):
+    """Run func on the event loop's worker threads, keeping context variables"""
+    from asyncio import get_running_loop
+
+    return get_running_loop().run_in_executor(None, copy_context().run, func)
+
+
+class CommandTimeout(Exception):
+    """A non-blocking command ran longer than its timeout and was cancelled"""
+
+    def __init__(self, timeout):
+        super(CommandTimeout, self).__init__(f"Command timed out after {timeout}s")
+        self.timeout = timeout
 
 
 class KwArgs(object):
     """Defines the elements of each command argument"""
 
-    def __init__(self, kwarg, argtype, argdesc):
+    def __init__(self, kwarg, argtype, argdesc, complete=None):
         self.name = kwarg
         self.type = argtype
         self.desc = argdesc
+        self.complete = complete  # returns values to suggest for this argument
+        self.convert = converter(argtype, kwarg)  # argument string to argtype
 
     def to_type(self, value: str):
         assert isinstance(value, str)
-        return to_type(value, self)
+        return self.convert(value)
 
     def __repr__(self):
         return str({"name": self.name, "type": self.type, "desc": self.desc})
@@ -44,9 +85,19 @@ class KwArgs(object):
 
 
 class Command(object):
-    """Defines the elements of each command"""
-
-    def __init__(self, func):
+    """
+    Defines the elements of each command
+
+    :param func: Function to run, may be an ``async def`` coroutine function, or
+        a generator (sync or async) that yields chunks of output text
+    :param thread: Run a regular function on a worker thread, keeping the UI live
+    :param timeout: Seconds before a non-blocking command is cancelled
+    :param complete: Dict of argument names to functions returning the values
+        to suggest when completing that argument
+    :param timings: CommandTimings each run is recorded in
+    """
+
+    def __init__(self, func, thread=False, timeout=None, complete=None, timings=None):
         """Called by @commands property, registers passed function as a ctui command"""
         self.func_name = func.__name__  # used to track original function name
         if self.func_name.startswith(
@@ -61,18 +112,39 @@ class Command(object):
             )  # used to match multi-word commands
         self.string_parts = self.string.split()
         self.func = func  # used to call the function
+        self.is_async = iscoroutinefunction(func)
+        self.is_async_stream = isasyncgenfunction(func)
+        self.is_stream = self.is_async_stream or isgeneratorfunction(func)
+        if self.is_async or self.is_async_stream:
+            self.thread = False
+        else:
+            # a regular function can only be timed out if it runs on a thread
+            self.thread = thread or (timeout is not None and not self.is_stream)
+        self.timeout = timeout
+        self.timings = timings if timings is not None else CommandTimings(0)
         doc_lines = func.__doc__.split("\n")
         if doc_lines[0] == "":
             self.desc = doc_lines[1].strip()  # used for completion description
         else:
             self.desc = doc_lines[0].strip()  # used for completion description
         self.kwargs = self.register_args(getfullargspec(func), doc_lines)
+        for name, values in (complete or {}).items():
+            kwarg = self.kwarg(name)
+            assert kwarg, f'"{self.string}" has no argument "{name}" to complete'
+            kwarg.complete = values
         # Determine if command supports infinite arguments (greedy final arg)
         if self.kwargs and is_greedy(self.kwargs[-1].type):
             self.greedy = True
         else:
             self.greedy = False
 
+    def kwarg(self, name):
+        """Return the argument called name, or None"""
+        for kwarg in self.kwargs:
+            if kwarg.name == name:
+                return kwarg
+        return None
+
     @property
     def kwarg_descriptions(self):
         descriptions = {}
@@ -121,19 +193,159 @@ class Command(object):
         for argnum in range(pairs):
             kwarg = self.kwargs[argnum]
             if argnum < pairs - 1:
-                kwargs[kwarg.name] = kwarg.to_type(args[argnum])
+                kwargs[kwarg.name] = kwarg.convert(args[argnum])
             elif argnum == pairs - 1:
-                if self.req_args > len(args):
+                if self.greedy and len(args) > len(self.kwargs):
                     greedy_str = " ".join(
                         args[argnum:]
                     )  # Minor bug, will loose mupti-spaces
-                    kwargs[kwarg.name] = kwarg.to_type(greedy_str)
+                    kwargs[kwarg.name] = kwarg.convert(greedy_str)
                 else:
-                    kwargs[kwarg.name] = kwarg.to_type(args[argnum])
+                    kwargs[kwarg.name] = kwarg.convert(args[argnum])
         return kwargs
 
+    @property
+    def blocking(self):
+        """True if the command runs directly inside the event loop"""
+        return not (self.is_async or self.is_stream or self.thread)
+
     def execute(self, **kwargs):
-        return self.func(**kwargs)
+        with self.timings.measure(self.string) as run:
+            return run.returned(self.func(**kwargs))
+
+    async def execute_async(self, **kwargs):
+        """
+        Run the command without blocking the event loop.
+
+        Threaded commands cannot be interrupted, so on cancel or timeout their
+        thread runs to completion in the background and its result is dropped.
+        """
+        with self.timings.measure(self.string) as run:
+            if self.is_async:
+                result = self.func(**kwargs)
+            else:
+                result = run_in_thread(partial(self.func, **kwargs))
+            return run.returned(await self._wait(result))
+
+    async def stream(self, append, **kwargs):
+        """
+        Run a generator command, passing each chunk it yields to append.
+
+        Regular generators are stepped on the event loop, yielding to the UI
+        between chunks, or on a worker thread if the command is threaded.
+        Threaded generators stop at their next chunk once cancelled.
+        """
+        stop = Event()
+        with self.timings.measure(self.string) as run:
+            append = run.counted(append)
+            if self.is_async_stream:
+                result = self._stream_async(append, kwargs)
+            elif self.thread:
+                result = run_in_thread(
+                    partial(self._stream_thread, append, kwargs, stop)
+                )
+            else:
+                result = self._stream_steps(append, kwargs)
+            try:
+                await self._wait(result)
+            finally:
+                stop.set()
+
+    async def _wait(self, result):
+        """Await result, raising CommandTimeout once the timeout has passed"""
+        if self.timeout is None:
+            return await result
+        from asyncio import TimeoutError, ensure_future, wait_for
+
+        future = ensure_future(result)
+        try:
+            return await wait_for(future, self.timeout)
+        except TimeoutError:
+            # raised by the command itself, such as a socket timeout
+            if not future.cancelled():
+                raise
+            raise CommandTimeout(self.timeout) from None
+
+    async def _stream_async(self, append, kwargs):
+        async for chunk in self.func(**kwargs):
+            append(str(chunk))
+
+    async def _stream_steps(self, append, kwargs):
+        from asyncio import sleep
+
+        for chunk in self.func(**kwargs):
+            append(str(chunk))
+            await sleep(0)
+
+    def _stream_thread(self, append, kwargs, stop):
+        for chunk in self.func(**kwargs):
+            if stop.is_set():
+                break
+            append(str(chunk))
+
+
+class CommandNode(object):
+    """One word of a multi-word command string within a CommandTrie"""
+
+    __slots__ = ("children", "words", "command")
+
+    def __init__(self):
+        self.children = {}  # maps each following word to its CommandNode
+        self.words = []  # sorted child words, used for prefix lookups
+        self.command = None  # set when the words leading here form a command
+
+    @property
+    def desc(self):
+        return self.command.desc if self.command else ""
+
+    def add_child(self, word):
+        node = self.children.get(word)
+        if node is None:
+            node = self.children[word] = CommandNode()
+            insort(self.words, word)
+        return node
+
+    def starting_with(self, prefix):
+        """Yield (word, node) for each child word beginning with prefix, in order"""
+        index = bisect_left(self.words, prefix)
+        while index < len(self.words) and self.words[index].startswith(prefix):
+            word = self.words[index]
+            yield word, self.children[word]
+            index += 1
+
+
+class CommandTrie(object):
+    """Word-level prefix tree of all registered command strings"""
+
+    def __init__(self):
+        self.root = CommandNode()
+
+    def insert(self, command):
+        node = self.root
+        for word in command.string_parts:
+            node = node.add_child(word)
+        node.command = command
+
+    def find(self, words):
+        """Return the node reached by following words from the root, or None"""
+        node = self.root
+        for word in words:
+            node = node.children.get(word)
+            if node is None:
+                return None
+        return node
+
+    def longest_match(self, words):
+        """Return (command, word_count) for the longest command prefixing words"""
+        node = self.root
+        match = (None, 0)
+        for count, word in enumerate(words, 1):
+            node = node.children.get(word)
+            if node is None:
+                break
+            if node.command:
+                match = (node.command, count)
+        return match
 
 
 class Commands(object):
@@ -141,10 +353,19 @@ class Commands(object):
 
     def __init__(self):
         self.commands = {}
-
-    def register(self, func):
-        command = Command(func)
+        self.trie = CommandTrie()  # used for fast completion and dispatch
+        self.timings = CommandTimings()  # latest runs of every command
+
+    def register(self, func, thread=False, timeout=None, complete=None):
+        command = Command(
+            func,
+            thread=thread,
+            timeout=timeout,
+            complete=complete,
+            timings=self.timings,
+        )
         self.commands[command.string] = command
+        self.trie.insert(command)
 
     @property
     def strings(self):
@@ -177,16 +398,15 @@ class Commands(object):
     def extract(self, input_text):
         """Extract command arguments from user text."""
         parts = input_text.split()
-        # try the the longest combination of parts to the smallest combination
-        for i in range(len(parts), 0, -1):
-            for command in self:
-                # if command exists, parse and type-convert command arguments
-                if command.string == " ".join(parts[:i]):
-                    if i == len(parts):
-                        return command, {}
-                    kwargs = command.parse_args(input_text.split(maxsplit=i)[i])
-                    return command, kwargs
-        return None, None
+        # find the longest combination of parts that is a command, in one pass
+        command, i = self.trie.longest_match(parts)
+        if command is None:
+            return None, None
+        # if command exists, parse and type-convert command arguments
+        if i == len(parts):
+            return command, {}
+        kwargs = command.parse_args(input_text.split(maxsplit=i)[i])
+        return command, kwargs
 
     def __getitem__(self, key):
         return self.commands[key]
@@ -216,32 +436,120 @@ def register_default_commands(ctui):
     @ctui.command
     def do_history(count: int = 0):
         """
-        Print history of commands entered
+        Print history of commands entered, newest first
 
         :PARAM count: Optional number of last histories to print
         """
-        message = tabulate(
-            ctui.history.all()[-count:], headers="keys", tablefmt="simple"
-        )
-        message_dialog(title="History", text=message)
+        records = reversed(ctui.history)
+        if count:
+            records = islice(records, count)
+        pages = table_pages(records, ctui.page_size, headers="keys")
+        paged_dialog(title="History", pages=pages)
 
     @ctui.command
     def do_history_clear():
         """Clear history of commands entered"""
-        ctui.db.purge_table("history")
-        ctui.history = ctui.db.table("history")
+        ctui.history.truncate()
 
     @ctui.command
-    def do_history_search(query: str):
+    def do_history_search(query: str, since: str = "", until: str = ""):
         """
         Search history of commands ...
 
         :PARAM query: Regex string to search in history
+        :PARAM since: Optional earliest date and time, like "2026-01-31 08:00"
+        :PARAM until: Optional latest date and time, like "2026-01-31"
+        """
+        search_results = ctui.history.find(query, since, until)
+        pages = table_pages(search_results, ctui.page_size, headers="keys")
+        paged_dialog(title="History Search Results", pages=pages)
+
+    @ctui.command
+    def do_debug_lag():
+        """Show when the user interface froze, and the code that froze it"""
+        message_dialog(
+            title="Event Loop Lag",
+            text=ctui.lag_monitor.report(),
+            wrap_lines=False,
+            scrollbar=True,
+        )
+
+    @ctui.command
+    def do_debug_lag_stop():
+        """Stop watching for user interface freezes"""
+        ctui.stop_watching_lag()
+
+    @ctui.command
+    def do_debug_lag_watch(threshold: int = 100):
+        """
+        Watch for user interface freezes, to show with debug lag
+
+        :PARAM threshold: Optional milliseconds of freeze to record, 100 by default
         """
-        History = Query()
-        search_results = ctui.history.search(History.Command.matches(".*" + query))
-        message = tabulate(search_results, headers="keys", tablefmt="simple")
-        message_dialog(title="History Search Results", text=message)
+        assert threshold > 0, "Threshold must be a positive number of milliseconds"
+        ctui.watch_lag(threshold / 1000)
+
+    @ctui.command
+    async def do_debug_profile(command_line: GreedyStr):
+        """
+        Run a command under cProfile and show the functions it spent time in
+
+        The command runs on the thread it normally runs on: threaded commands
+        on a worker thread, and all others on the UI thread.
+
+        :PARAM command_line: Command to profile, with its arguments
+        """
+        command, kwargs = ctui.commands.extract(command_line)
+        assert command is not None, f'Unknown command "{command_line}"'
+        result, profile = await profile_command(command, kwargs, ctui.append_output)
+        message_dialog(
+            title=f"Profile of {command_line}",
+            text=profile,
+            wrap_lines=False,
+            scrollbar=True,
+        )
+        return result
+
+    @ctui.command
+    def do_debug_timings():
+        """Show how long the latest runs of each command took"""
+        timings = ctui.commands.timings
+        rows = timings.summary()
+        assert rows, "No commands have been timed yet"
+        message = "\n".join(table_lines(rows, headers="keys", floatfmt=".1f"))
+        message_dialog(
+            title=f"Command Timings, last {len(timings.runs)} runs",
+            text=message,
+            scrollbar=True,
+        )
+
+    @ctui.command
+    def do_debug_timings_clear():
+        """Forget the timings of the latest commands"""
+        ctui.commands.timings.clear()
+
+    @ctui.command
+    def do_debug_timings_save():
+        """Save the current command timings in the project, to compare later"""
+        rows = ctui.commands.timings.summary()
+        assert rows, "No commands have been timed yet"
+        date, time = str(datetime.today()).split()
+        stamp = {"Date": date, "Time": time.split(".")[0]}
+        ctui.db.table("timings").insert_multiple([{**stamp, **row} for row in rows])
+        message_dialog(title="Success", text=f"Saved timings of {len(rows)} commands")
+
+    @ctui.command
+    def do_debug_timings_saved(name: str = ""):
+        """
+        Show the command timings saved in the project, oldest first
+
+        :PARAM name: Optional command to compare, like "history search"
+        """
+        records = iter(ctui.db.table("timings"))
+        if name:
+            records = (record for record in records if record["Command"] == name)
+        pages = table_pages(records, ctui.page_size, headers="keys", floatfmt=".1f")
+        paged_dialog(title="Saved Command Timings", pages=pages)
 
     # @ctui.command
     # def do_macro_set(name: str, command: GreedyStr):
@@ -257,14 +565,43 @@ def register_default_commands(ctui):
     def do_project():
         """Information about the current project"""
         message = f"  Project Name:  {ctui.project_name}\n"
-        message += f"  Project Path:  {ctui._project_path}\n"
-        message += f"     File Size:  {Path(ctui._project_path).stat().st_size} KB\n"
+        if ctui._in_memory:
+            message += "  Project Path:  not saved, kept in memory\n"
+        else:
+            stat = Path(ctui._project_path).stat()
+            message += f"  Project Path:  {ctui._project_path}\n"
+            message += f"     File Size:  {stat.st_size / 1024:,.1f} KB\n"
+            message += f"      Modified:  {modified(stat.st_mtime_ns)}\n"
         message += f" History Count:  {len(ctui.history)} records\n"
         message += f"Settings Count:  {len(ctui.settings)} records\n"
         message += f" Storage Count:  {len(ctui.storage)} records"
         message_dialog(title="Project Information", text=message)
 
     @ctui.command
+    def do_project_convert(backend: str):
+        """
+        Convert the current project file to another format ...
+
+        :PARAM backend: New project file format, "tinydb" or "sqlite"
+        """
+        assert backend in BACKENDS, f"Format must be one of: {', '.join(BACKENDS)}"
+        ctui._close_db()
+        if ctui._in_memory:
+            converted = open_memory_database(backend)
+            copy_database(ctui.db, converted)
+            ctui.db.close()
+            ctui._memory_db = converted
+            ctui._init_db()
+        else:
+            try:  # the project file is only replaced once converted
+                convert_database(ctui._project_path, ctui._project_path, backend)
+            finally:
+                ctui._init_db()
+        message_dialog(
+            title="Success", text=f'Project "{ctui.project_name}" is now {backend}.'
+        )
+
+    @ctui.command(complete={"name": lambda: ctui.catalog.names()})
     def do_project_delete(name: str):
         """
         Delete saved project ...
@@ -281,7 +618,7 @@ def register_default_commands(ctui):
         yes_no_dialog(
             title="Confirmation",
             text=f"Delete {name} project?",
-            yes_func=lambda: Path.unlink(Path(project_to_delete_path)),
+            yes_func=lambda: remove_database(project_to_delete_path),
         )
 
     @ctui.command
@@ -294,7 +631,12 @@ def register_default_commands(ctui):
         export_file = Path(f"{filename}.{ctui.name}").expanduser()
 
         def project_export():
-            export_file.write_bytes(Path(ctui._project_path).read_bytes())
+            ctui._close_db()  # also folds any SQLite write-ahead log into the file
+            if ctui._in_memory:
+                save_database(ctui.db, export_file)
+            else:
+                copy_project_file(ctui._project_path, export_file)
+            ctui._init_db()
 
         if export_file.is_file():
             yes_no_dialog(
@@ -308,8 +650,7 @@ def register_default_commands(ctui):
                 title="Success", text=f'Project exported as:\n"{export_file}"'
             )
 
-    # TODO: Fix, seems broken, good files say invalid or currupt
-    @ctui.command
+    @ctui.command(thread=True)
     def do_project_import(filename: str):
         """
         Import exported project from ...
@@ -320,21 +661,41 @@ def register_default_commands(ctui):
         if project_to_import_path.is_file() is False:
             project_to_import_path = Path(str(project_to_import_path) + f".{ctui.name}")
         assert project_to_import_path.is_file(), "File does not exist"
-        with open(project_to_import_path) as f:
-            assert f.read(14) == '{"_default": {', "Invald or corrupted project file"
 
         # build new project name and path
         if project_to_import_path.suffix[1:] == ctui.name:
-            ctui.project_name = project_to_import_path.stem
+            name = project_to_import_path.stem
         else:
-            ctui.project_name = project_to_import_path.name
+            name = project_to_import_path.name
+        assert name != "default", 'Rename the file, "default" is the unsaved project'
+        project_path = f"{ctui.project_folder}{name}.{ctui.name}"
+
+        # check the whole file on this worker thread before touching the
+        # current project, showing progress every 10% for large files
+        size = project_to_import_path.stat().st_size
+        shown = 0 if size >= 10 * 1024 * 1024 else 100
+        try:
+            for checked in check_project_file(project_to_import_path):
+                percent = checked * 100 // max(size, 1)
+                if percent >= shown + 10:
+                    shown = percent - percent % 10
+                    yield f"Checked {shown}% of {project_to_import_path.name}\n"
+        except ValueError as error:
+            raise AssertionError(f"Invalid or corrupted project file\n\n{error}")
 
         def project_import():
-            ctui.db.close()
-            Path(ctui._project_path).write_bytes(project_to_import_path.read_bytes())
+            Path(ctui.project_folder).mkdir(parents=True, exist_ok=True)
+            ctui._close_db()
+            copy_project_file(project_to_import_path, project_path)
+            ctui.project_name = name
             ctui._init_db()
 
-        if Path(ctui._project_path).is_file():
+        def project_import_new():
+            project_import()
+            message_dialog(title="Success", text=f'Project imported as "{name}"')
+
+        # switch projects on the UI thread, which also reads the database
+        if Path(project_path).is_file():
             yes_no_dialog(
                 title="WARNING",
                 text="Project already exists.\nOverwrite project?",
@@ -342,21 +703,31 @@ def register_default_commands(ctui):
             )
             # TODO: use input_dialog to request new project name
         else:
-            project_import()
-            message_dialog(
-                title="Success", text=f'Project imported as "{ctui.project_name}"'
-            )
+            ctui._call_in_ui(project_import_new)
 
     @ctui.command
     def do_project_list():
         """List saved projects"""
+        ctui.history.flush()  # so the open project's file is up to date
         lines = []
-        for file in list(Path(ctui.project_folder).glob(f"*.{ctui.name}")):
-            lines.append({"Project": file.stem, "Size (KB)": file.stat().st_size})
-        message = tabulate(lines, headers="keys", tablefmt="simple")
+        for name, project in sorted(ctui.catalog.projects().items()):
+            counts = project["counts"]
+            if name == ctui.project_name and not ctui._in_memory:
+                # the file may not show writes still in a write-ahead log
+                counts = {"history": len(ctui.history), "storage": len(ctui.storage)}
+            lines.append(
+                {
+                    "Project": name,
+                    "Size (KB)": project["size"] / 1024,
+                    "Modified": modified(project["mtime"]),
+                    "History": counts.get("history", 0),
+                    "Storage": counts.get("storage", 0),
+                }
+            )
+        message = "\n".join(table_lines(lines, headers="keys", floatfmt=".1f"))
         message_dialog(title="Saved Projects", text=message, scrollbar=True)
 
-    @ctui.command
+    @ctui.command(complete={"name": lambda: ctui.catalog.names()})
     def do_project_load(name: str):
         """
         Load saved project ...
@@ -364,9 +735,13 @@ def register_default_commands(ctui):
         :PARAM name: Name of project to load
         """
         project_to_load_path = f"{ctui.project_folder}{name}.{ctui.name}"
-        assert Path(project_to_load_path).is_file(), f'"{name}" is not a valid project'
+        # "default" loads the unsaved project this session started with
+        if name != "default":
+            assert Path(
+                project_to_load_path
+            ).is_file(), f'"{name}" is not a valid project'
 
-        ctui.db.close()
+        ctui._close_db()
         ctui.project_name = name
         ctui._init_db()
 
@@ -377,8 +752,12 @@ def register_default_commands(ctui):
         """Reset the current project file"""
 
         def project_reset():
-            ctui.db.close()
-            Path.unlink(Path(ctui._project_path))
+            ctui._close_db()
+            if ctui._in_memory:
+                ctui.db.close()
+                ctui._memory_db = None
+            else:
+                remove_database(ctui._project_path)
             ctui._init_db()
 
         yes_no_dialog(
@@ -396,13 +775,17 @@ def register_default_commands(ctui):
 
         :PARAM name: New name of project you are saving
         """
+        assert name != "default", 'Choose a name other than "default"'
         project_to_save_path = f"{ctui.project_folder}{name}.{ctui.name}"
 
         def project_saveas():
-            ctui.db.close()
-            old_project = Path(ctui._project_path)
+            Path(ctui.project_folder).mkdir(parents=True, exist_ok=True)
+            ctui._close_db()
+            if ctui._in_memory:
+                save_database(ctui.db, project_to_save_path)
+            else:
+                copy_project_file(ctui._project_path, project_to_save_path)
             ctui.project_name = name
-            Path(ctui._project_path).write_bytes(old_project.read_bytes())
             ctui._init_db()
 
         if Path(project_to_save_path).is_file():
@@ -15,7 +15,6 @@ Control Things User Interface, aka ctui.py
 from __future__ import unicode_literals
 
 from prompt_toolkit.completion import Completer, Completion
-from six import string_types
 
 from ctui.commands import Commands
 
@@ -37,51 +36,47 @@ class CommandCompleter(Completer):
 
     def get_completions(self, document, complete_event):
         parts_before_cursor = document.text_before_cursor.split()  # clean up spaces
-        text_before_cursor = " ".join(parts_before_cursor)
-        current_part = len(parts_before_cursor) - 1
-        next_part = False
-        if document.text_before_cursor[-1] == " ":  # re-add trailing space if present
-            next_part = True
+        if not parts_before_cursor:
+            return
+        next_part = document.text_before_cursor.endswith(" ")
+        if next_part:  # suggest the words that may follow a completed word
+            complete_parts = parts_before_cursor
+            current_word = ""
+        else:  # suggest the words that may complete the word under the cursor
+            complete_parts = parts_before_cursor[:-1]
+            current_word = parts_before_cursor[-1]
 
-        def previous_parts_match(command_parts):
-            if current_part == 0:
-                return True
-            if len(command_parts) == len(parts_before_cursor):
-                for i in range(current_part):
-                    if command_parts[i] == parts_before_cursor[i]:
-                        return True
+        # Walk the command trie, so cost follows the typed words, not command count
+        node = self.commands.trie.find(complete_parts)
+        if node is None:
+            # Past the command words, so suggest values for the next argument
+            command, count = self.commands.trie.longest_match(complete_parts)
+            if command is not None:
+                yield from self.argument_completions(
+                    command, len(complete_parts) - count, current_word
+                )
+            return
 
-        def last_part_full_match(command_parts):
-            if next_part and len(command_parts) >= current_part + 2:
-                if command_parts[current_part] == parts_before_cursor[current_part]:
-                    return True
+        # If all command parts exactly match, suggest the user can hit enter
+        if next_part and node.command:
+            yield Completion("", 0, display="<enter>", display_meta=node.desc)
 
-        def last_part_partial_match(command_parts):
-            if len(command_parts) == current_part + 1:
-                if command_parts[current_part] != (parts_before_cursor[current_part]):
-                    return command_parts[current_part].startswith(
-                        parts_before_cursor[current_part]
-                    )
-
-        # Check all commands for matches
-        for command in self.commands:
-            # If all command parts exactly match, suggest the user can hit enter
-            if command.string_parts == parts_before_cursor:
-                yield Completion("", 0, display="<enter>", display_meta=command.desc)
-
-            elif previous_parts_match(command.string_parts):
+        for word, child in node.starting_with(current_word):
+            if word == current_word:
+                if child.command:
+                    yield Completion("", 0, display="<enter>", display_meta=child.desc)
+            else:
                 # Suggest next parts (words) for commands that match so far
-                if last_part_full_match(command.string_parts):
-                    yield Completion(
-                        command.string_parts[current_part + 1],
-                        0,
-                        display_meta=command.desc,
-                    )
+                yield Completion(word, -len(current_word), display_meta=child.desc)
+
+        if node.command:
+            yield from self.argument_completions(node.command, 0, current_word)
 
-                # Keep suggesting the parts (words) for commands that still match
-                elif last_part_partial_match(command.string_parts):
-                    yield Completion(
-                        command.string_parts[current_part],
-                        -len(parts_before_cursor[current_part]),
-                        display_meta=command.desc,
-                    )
+    def argument_completions(self, command, index, current_word):
+        """Suggest values for the argument at index, if it has a complete function"""
+        if index >= len(command.kwargs) or command.kwargs[index].complete is None:
+            return
+        kwarg = command.kwargs[index]
+        for value in kwarg.complete():
+            if value.startswith(current_word) and value != current_word:
+                yield Completion(value, -len(current_word), display_meta=kwarg.desc)
@@ -0,0 +1,636 @@
+"""
+Control Things User Interface, aka ctui.py
+
+# Copyright (C) 2019  Justin Searle
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or any later version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details at <http://www.gnu.org/licenses/>.
+"""
+import codecs
+import errno
+import json
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import threading
+from pathlib import Path
+
+from tinydb import TinyDB
+from tinydb.storages import MemoryStorage
+from tinydb.table import Document
+
+SQLITE_HEADER = b"SQLite format 3\x00"
+COPY_CHUNK = 1 << 30  # bytes per copy_file_range call
+CHECK_CHUNK = 1 << 20  # bytes read at a time when checking a project file
+FETCH_SIZE = 500  # SQLite rows read at a time when iterating a table
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+# object keys without escapes, and the separator after a value, matched in one
+# step instead of character by character
+SIMPLE_KEY = re.compile(r'[ \t\n\r]*"([^"\\\x00-\x1f]*)"[ \t\n\r]*:[ \t\n\r]*')
+SEPARATOR = re.compile(r"[ \t\n\r]*([,}])")
+
+
+class SQLiteTable(object):
+    """
+    A project table stored in SQLite, with the same interface as a TinyDB table.
+
+    Queries are TinyDB queries, tested against each document in the table.
+    Inserts, document ID lookups and counts use the table's primary key index.
+    """
+
+    def __init__(self, db, name):
+        self._db = db
+        self._name = name
+
+    @property
+    def name(self):
+        return self._name
+
+    def _execute(self, sql, parameters=()):
+        return self._db.connection.execute(sql, (self._name,) + tuple(parameters))
+
+    def _fetchone(self, sql, parameters=()):
+        with self._db.lock:
+            return self._execute(sql, parameters).fetchone()
+
+    def _documents(self, sql="", parameters=()):
+        with self._db.lock:
+            cursor = self._execute(
+                f"SELECT doc_id, doc FROM documents WHERE tbl = ? {sql}", parameters
+            )
+        while True:
+            with self._db.lock:  # not held between batches, so reads stay lazy
+                rows = cursor.fetchmany(FETCH_SIZE)
+            if not rows:
+                return
+            for doc_id, doc in rows:
+                yield Document(json.loads(doc), doc_id)
+
+    def _next_id(self):
+        (doc_id,) = self._fetchone(
+            "SELECT COALESCE(MAX(doc_id), 0) + 1 FROM documents WHERE tbl = ?"
+        )
+        return doc_id
+
+    def _matching_ids(self, cond=None, doc_ids=None):
+        if doc_ids is not None:
+            return list(doc_ids)
+        if cond is None:
+            return [doc.doc_id for doc in self]
+        return [doc.doc_id for doc in self if cond(doc)]
+
+    def insert(self, document):
+        return self.insert_multiple([document])[0]
+
+    def insert_multiple(self, documents):
+        doc_ids = []
+        rows = []
+        with self._db.lock:  # so no other thread takes the same IDs
+            next_id = self._next_id()
+            for document in documents:
+                if isinstance(document, Document):
+                    doc_id = document.doc_id
+                else:
+                    doc_id = next_id
+                next_id = max(next_id, doc_id + 1)
+                doc_ids.append(doc_id)
+                rows.append((self._name, doc_id, json.dumps(dict(document))))
+            with self._db.connection:
+                self._db.connection.executemany(
+                    "INSERT INTO documents (tbl, doc_id, doc) VALUES (?, ?, ?)", rows
+                )
+        return doc_ids
+
+    def all(self):
+        return list(self)
+
+    def search(self, cond):
+        return [doc for doc in self if cond(doc)]
+
+    def get(self, cond=None, doc_id=None, doc_ids=None):
+        if doc_id is not None:
+            for doc in self._documents("AND doc_id = ?", (doc_id,)):
+                return doc
+            return None
+        if doc_ids is not None:
+            doc_ids = set(doc_ids)
+            return [doc for doc in self if doc.doc_id in doc_ids]
+        for doc in self:
+            if cond(doc):
+                return doc
+        return None
+
+    def contains(self, cond=None, doc_id=None):
+        if doc_id is not None:
+            return self.get(doc_id=doc_id) is not None
+        return self.get(cond) is not None
+
+    def count(self, cond):
+        return len(self.search(cond))
+
+    def update(self, fields, cond=None, doc_ids=None):
+        if doc_ids is not None:
+            documents = [self.get(doc_id=doc_id) for doc_id in doc_ids]
+        elif cond is None:
+            documents = self.all()
+        else:
+            documents = self.search(cond)
+        rows = []
+        for document in documents:
+            if document is None:
+                continue
+            if callable(fields):
+                fields(document)
+            else:
+                document.update(fields)
+            rows.append((json.dumps(dict(document)), self._name, document.doc_id))
+        with self._db.lock, self._db.connection:
+            self._db.connection.executemany(
+                "UPDATE documents SET doc = ? WHERE tbl = ? AND doc_id = ?", rows
+            )
+        return [row[2] for row in rows]
+
+    def update_multiple(self, updates):
+        doc_ids = []
+        for fields, cond in updates:
+            doc_ids += self.update(fields, cond)
+        return doc_ids
+
+    def upsert(self, document, cond=None):
+        if isinstance(document, Document) and cond is None:
+            if self.contains(doc_id=document.doc_id):
+                return self.update(dict(document), doc_ids=[document.doc_id])
+        elif cond is not None:
+            updated = self.update(dict(document), cond)
+            if updated:
+                return updated
+        return [self.insert(document)]
+
+    def remove(self, cond=None, doc_ids=None):
+        doc_ids = self._matching_ids(cond, doc_ids)
+        with self._db.lock, self._db.connection:
+            self._db.connection.executemany(
+                "DELETE FROM documents WHERE tbl = ? AND doc_id = ?",
+                [(self._name, doc_id) for doc_id in doc_ids],
+            )
+        return doc_ids
+
+    def truncate(self):
+        with self._db.lock, self._db.connection:
+            self._execute("DELETE FROM documents WHERE tbl = ?")
+
+    def clear_cache(self):
+        pass
+
+    def __len__(self):
+        (count,) = self._fetchone("SELECT COUNT(*) FROM documents WHERE tbl = ?")
+        return count
+
+    def __iter__(self):
+        return self._documents("ORDER BY doc_id")
+
+    def __reversed__(self):
+        return self._documents("ORDER BY doc_id DESC")
+
+    def __repr__(self):
+        return f"<SQLiteTable name={self._name!r}, total={len(self)}>"
+
+
+class SQLiteDB(object):
+    """
+    Project database in a single SQLite file, with the same interface as TinyDB.
+
+    The file uses write-ahead logging, so each change only appends to the log
+    instead of rewriting the project file.  Threaded commands share the one
+    connection, so each use of it holds lock.
+
+    :param path: Path of the SQLite project file
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self.lock = threading.RLock()
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            " tbl TEXT NOT NULL,"
+            " doc_id INTEGER NOT NULL,"
+            " doc TEXT NOT NULL,"
+            " PRIMARY KEY (tbl, doc_id)"
+            ") WITHOUT ROWID"
+        )
+        self.connection.commit()
+        self._tables = {}
+
+    def table(self, name):
+        if name not in self._tables:
+            self._tables[name] = SQLiteTable(self, name)
+        return self._tables[name]
+
+    def tables(self):
+        with self.lock:
+            cursor = self.connection.execute("SELECT DISTINCT tbl FROM documents")
+            return {name for (name,) in cursor}
+
+    def drop_table(self, name):
+        self.table(name).truncate()
+        self._tables.pop(name, None)
+
+    def drop_tables(self):
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM documents")
+        self._tables.clear()
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+BACKENDS = {
+    "tinydb": TinyDB,
+    "sqlite": SQLiteDB,
+}
+
+
+def open_memory_database(backend="tinydb"):
+    """Open an empty project database that is kept in memory, never on disk"""
+    if backend not in BACKENDS:
+        raise ValueError(f"Must be one of: {', '.join(BACKENDS)}")
+    if backend == "sqlite":
+        return SQLiteDB(":memory:")
+    return TinyDB(storage=MemoryStorage)
+
+
+def database_backend(db):
+    """Return the backend name of an open project database"""
+    return "sqlite" if isinstance(db, SQLiteDB) else "tinydb"
+
+
+def detect_backend(path):
+    """Return the backend name of an existing project file, or None if unknown"""
+    with open(path, "rb") as f:
+        header = f.read(len(SQLITE_HEADER))
+    if header == SQLITE_HEADER:
+        return "sqlite"
+    if header.lstrip()[:1] in (b"{", b""):
+        return "tinydb"
+    return None
+
+
+class _JSONReader(object):
+    """
+    Decodes one JSON value at a time from a file read in chunks.
+
+    Only the text that has not been decoded yet is kept in memory.
+    """
+
+    # Errors this close to the end of the text may only mean the value
+    # continues in the next chunk, such as a literal split after "tru"
+    SPLIT_VALUE = 16
+    # Characters kept ahead of the current position, so keys and separators
+    # shorter than this are never split between chunks
+    LOOKAHEAD = 1 << 16
+
+    def __init__(self, f, chunk_size):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.utf8 = codecs.getincrementaldecoder("utf-8")()
+        self.text = ""
+        self.index = 0
+        self.offset = 0  # characters dropped from the start of text
+        self.bytes_read = 0
+        self.eof = False
+
+    def _read(self, size):
+        chunk = self.f.read(size)
+        self.bytes_read += len(chunk)
+        self.eof = not chunk
+        self.offset += self.index
+        try:
+            self.text = self.text[self.index :] + self.utf8.decode(chunk, self.eof)
+        except UnicodeDecodeError:
+            raise ValueError(f"Invalid UTF-8 near byte {self.bytes_read}") from None
+        self.index = 0
+
+    def _fill(self):
+        while len(self.text) - self.index < self.LOOKAHEAD and not self.eof:
+            self._read(self.chunk_size)
+
+    def error(self, message):
+        return ValueError(f"{message} (char {self.offset + self.index})")
+
+    def next_char(self):
+        """Skip whitespace and return the next character, or "" at the end"""
+        while True:
+            self.index = WHITESPACE.match(self.text, self.index).end()
+            if self.index < len(self.text) or self.eof:
+                return self.text[self.index : self.index + 1]
+            self._read(self.chunk_size)
+
+    def expect(self, chars):
+        """Consume the next character, which must be one of chars"""
+        char = self.next_char()
+        if not char or char not in chars:
+            expected = " or ".join(repr(char) for char in chars)
+            raise self.error(f"Expecting {expected}")
+        self.index += 1
+        return char
+
+    def keys(self):
+        """Consume a JSON object, yielding each key before its value is read"""
+        self.expect("{")
+        if self.next_char() == "}":
+            self.index += 1
+            return
+        while True:
+            self._fill()
+            match = SIMPLE_KEY.match(self.text, self.index)
+            if match:
+                key = match.group(1)
+                self.index = match.end()
+            else:
+                key = self.value()
+                if not isinstance(key, str):
+                    raise self.error(
+                        "Expecting property name enclosed in double quotes"
+                    )
+                self.expect(":")
+            yield key
+            match = SEPARATOR.match(self.text, self.index)
+            if match:
+                self.index = match.end()
+                separator = match.group(1)
+            else:
+                separator = self.expect(",}")
+            if separator == "}":
+                return
+
+    def value(self):
+        """Decode and consume the next JSON value"""
+        if self.text[self.index : self.index + 1] in " \t\n\r":
+            self.next_char()  # also reads more text once none is left
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.text, self.index)
+            except json.JSONDecodeError as error:
+                complete = self.eof or (
+                    len(self.text) - error.pos > self.SPLIT_VALUE
+                    and not error.msg.startswith("Unterminated string")
+                )
+                if complete:
+                    self.index = error.pos
+                    raise self.error(error.msg) from None
+                # read at least as much again, so long values are not re-decoded
+                # once per chunk
+                self._read(max(self.chunk_size, len(self.text)))
+                continue
+            if end < len(self.text) or self.eof:
+                self.index = end
+                return value
+            self._read(self.chunk_size)  # a number may continue in the next chunk
+
+
+def _check_tinydb_file(path, chunk_size, counts=None):
+    with open(path, "rb") as f:
+        reader = _JSONReader(f, chunk_size)
+        if reader.next_char() == "":
+            return  # TinyDB reads an empty file as an empty project
+        checked = 0
+        for name in reader.keys():
+            for doc_id in reader.keys():
+                if not doc_id.isdecimal():
+                    raise reader.error(f'Invalid document ID in table "{name}"')
+                if not isinstance(reader.value(), dict):
+                    raise reader.error(
+                        f'Document {doc_id} of "{name}" is not an object'
+                    )
+                if counts is not None:
+                    counts[name] = counts.get(name, 0) + 1
+                if reader.bytes_read != checked:
+                    checked = reader.bytes_read
+                    yield checked
+        if reader.next_char() != "":
+            raise reader.error("Unexpected data after the project tables")
+
+
+def _connect_read_only(path):
+    uri = f"{Path(path).resolve().as_uri()}?mode=ro&immutable=1"
+    return sqlite3.connect(uri, uri=True)
+
+
+def _check_sqlite_file(path):
+    connection = _connect_read_only(path)
+    try:
+        (result,) = connection.execute("PRAGMA quick_check").fetchone()
+        if result != "ok":
+            raise ValueError(result)
+        columns = connection.execute("PRAGMA table_info(documents)").fetchall()
+        if [column[1] for column in columns] != ["tbl", "doc_id", "doc"]:
+            raise ValueError("No documents table")
+    except sqlite3.DatabaseError as error:
+        raise ValueError(str(error)) from None
+    finally:
+        connection.close()
+    yield Path(path).stat().st_size
+
+
+def check_project_file(path, chunk_size=CHECK_CHUNK):
+    """
+    Check that path is a complete project file, without loading it into memory.
+
+    TinyDB files are parsed a chunk at a time, checking that every table maps
+    document IDs to documents.  SQLite files get a quick integrity check.
+
+    :param path: Path of the project file to check
+    :param chunk_size: Bytes read from the file at a time
+    :return: Generator of the number of bytes checked so far
+    :raises ValueError: describing the first problem found
+    """
+    backend = detect_backend(path)
+    if backend == "sqlite":
+        yield from _check_sqlite_file(path)
+    elif backend == "tinydb":
+        yield from _check_tinydb_file(path, chunk_size)
+        yield Path(path).stat().st_size
+    else:
+        raise ValueError("Not a project file")
+
+
+def count_documents(path):
+    """
+    Return the number of documents in each table of a closed project file.
+
+    TinyDB files are counted a chunk at a time rather than loaded whole.
+
+    :raises ValueError: if the file is not a valid project file
+    """
+    counts = {}
+    backend = detect_backend(path)
+    if backend == "sqlite":
+        connection = _connect_read_only(path)
+        try:
+            cursor = connection.execute(
+                "SELECT tbl, COUNT(*) FROM documents GROUP BY tbl"
+            )
+            counts.update(cursor)
+        except sqlite3.DatabaseError as error:
+            raise ValueError(str(error)) from None
+        finally:
+            connection.close()
+    elif backend == "tinydb":
+        for _ in _check_tinydb_file(path, CHECK_CHUNK, counts):
+            pass
+    else:
+        raise ValueError("Not a project file")
+    return counts
+
+
+def open_database(path, backend="tinydb"):
+    """
+    Open a project database, creating it with backend if it does not exist.
+
+    Existing files are opened with whichever backend wrote them.
+    """
+    if Path(path).is_file():
+        backend = detect_backend(path) or backend
+    if backend not in BACKENDS:
+        raise ValueError(f"Must be one of: {', '.join(BACKENDS)}")
+    return BACKENDS[backend](path)
+
+
+def remove_database(path):
+    """Delete a project file, along with any SQLite write-ahead log files"""
+    for suffix in ("", "-wal", "-shm"):
+        Path(f"{path}{suffix}").unlink(missing_ok=True)
+
+
+def _temporary_path(destination):
+    """Return an unused path next to destination, for writing a file to rename"""
+    destination = Path(destination)
+    fd, path = tempfile.mkstemp(
+        prefix=f".{destination.name}.", suffix=".tmp", dir=destination.parent
+    )
+    os.close(fd)
+    return path
+
+
+def _replace_database(path, destination):
+    """Atomically rename the closed project file path over destination"""
+    with open(path, "rb+") as f:
+        os.fsync(f.fileno())  # so a crash cannot leave a renamed but empty file
+    if Path(f"{destination}-wal").exists() and detect_backend(destination) == "sqlite":
+        # write the old file's log back into it, so it stays whole until replaced
+        sqlite3.connect(str(destination)).close()
+    os.replace(path, destination)
+    # a write-ahead log left by the old destination would corrupt the new file
+    for suffix in ("-wal", "-shm"):
+        Path(f"{destination}{suffix}").unlink(missing_ok=True)
+
+
+def _copy_file(source, destination):
+    """Copy file contents inside the kernel, without reading them into Python"""
+    if hasattr(os, "copy_file_range"):
+        try:
+            with open(source, "rb") as src, open(destination, "wb") as dst:
+                while os.copy_file_range(src.fileno(), dst.fileno(), COPY_CHUNK):
+                    pass
+            return
+        except OSError as error:
+            # not supported between these files, such as across filesystems
+            # on older kernels, so let shutil pick another zero-copy method
+            if error.errno not in (errno.EXDEV, errno.ENOSYS, errno.EOPNOTSUPP):
+                raise
+    shutil.copyfile(source, destination)
+
+
+def copy_project_file(source, destination):
+    """
+    Copy the closed project file source to destination, replacing it atomically.
+
+    The copy is written next to destination and renamed over it once
+    complete, so an interrupted copy never leaves a partial project file.
+    """
+    path = _temporary_path(destination)
+    try:
+        _copy_file(source, path)
+        shutil.copymode(source, path)
+        _replace_database(path, destination)
+    except BaseException:
+        remove_database(path)
+        raise
+
+
+def convert_database(source, destination, backend):
+    """
+    Copy every table of the project file source into a new file with backend.
+
+    Document IDs are kept, so records keep their identity across formats.
+    Destination may be source itself, as it is only replaced once the new
+    file is complete and source is closed.
+    """
+    path = _temporary_path(destination)
+    try:
+        source_db = open_database(source)
+        try:
+            save_database(source_db, path, backend)
+        finally:
+            source_db.close()
+        _replace_database(path, destination)
+    except BaseException:
+        remove_database(path)
+        raise
+
+
+def save_database(db, destination, backend=None):
+    """
+    Write every table of the open database db to a new project file.
+
+    The file uses the same backend as db, unless backend is given.  Document
+    IDs are kept, so records keep their identity across formats.  Like
+    copy_project_file, destination is only replaced once the file is complete.
+    """
+    path = _temporary_path(destination)
+    try:
+        os.remove(path)  # an empty file would be detected as a TinyDB project
+        destination_db = open_database(path, backend or database_backend(db))
+        try:
+            copy_database(db, destination_db)
+        finally:
+            destination_db.close()
+        _replace_database(path, destination)
+    except BaseException:
+        remove_database(path)
+        raise
+
+
+def copy_database(source_db, destination_db):
+    """Copy every table of source_db into the empty database destination_db"""
+    tables = {name: list(source_db.table(name)) for name in source_db.tables()}
+    if isinstance(destination_db, TinyDB):
+        # write all tables at once rather than rewriting the file per insert
+        destination_db.storage.write(
+            {
+                name: {str(doc.doc_id): dict(doc) for doc in documents}
+                for name, documents in tables.items()
+            }
+        )
+    else:
+        for name, documents in tables.items():
+            destination_db.table(name).insert_multiple(documents)
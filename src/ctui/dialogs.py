@@ -12,17 +12,10 @@ Control Things User Interface, aka ctui.py
 # FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
 # details at <http://www.gnu.org/licenses/>.
 """
-from asyncio import Future, ensure_future
+from contextvars import ContextVar
 
-from prompt_toolkit.application.current import get_app
-from prompt_toolkit.formatted_text import to_formatted_text
-from prompt_toolkit.formatted_text.utils import fragment_list_to_text
-from prompt_toolkit.layout.containers import Float, HSplit
-from prompt_toolkit.layout.dimension import D
-from prompt_toolkit.utils import get_cwidth
-from prompt_toolkit.widgets import Dialog, Label, TextArea
-
-from .base import Button
+# prompt_toolkit and asyncio are imported where dialogs are built, so headless
+# runs that only log dialogs never load them
 
 
 class YesNoDialog(object):
@@ -36,6 +29,13 @@ class YesNoDialog(object):
         wrap_lines=True,
         scrollbar=False,
     ):
+        from asyncio import Future
+
+        from prompt_toolkit.layout.dimension import D
+        from prompt_toolkit.widgets import Dialog, TextArea
+
+        from .base import Button
+
         self.future = Future()
 
         def yes_handler():
@@ -81,6 +81,15 @@ class TextInputDialog(object):
         wrap_lines=True,
         scrollbar=False,
     ):
+        from asyncio import Future
+
+        from prompt_toolkit.application.current import get_app
+        from prompt_toolkit.layout.containers import HSplit
+        from prompt_toolkit.layout.dimension import D
+        from prompt_toolkit.widgets import Dialog, Label, TextArea
+
+        from .base import Button
+
         self.future = Future()
 
         def accept_text(buf):
@@ -119,6 +128,16 @@ class TextInputDialog(object):
 
 
 class MessageDialog(object):
+    """
+    Message box that opens quickly however long its text is.
+
+    Only the lines on screen are rendered, and its width comes from the lines
+    that fit on the first screen.  The text scrolls with the arrow keys,
+    Page Up/Down, Home/End and the mouse wheel, and Enter closes the box.
+    Unless scrollbar is True or False, a scrollbar is shown whenever the text
+    is taller than the screen.
+    """
+
     def __init__(
         self,
         title="",
@@ -127,50 +146,27 @@ class MessageDialog(object):
         lexer=None,
         width=None,
         wrap_lines=True,
-        scrollbar=False,
+        scrollbar=None,
     ):
+        from asyncio import Future
+
+        from prompt_toolkit.widgets import Dialog
+
+        from .base import Button, TextPager
+
         self.future = Future()
         self.text = text
 
         def set_done():
             self.future.set_result(None)
 
-        def get_text_width():
-            if width is None:
-                text_fragments = to_formatted_text(self.text)
-                text = fragment_list_to_text(text_fragments)
-                if text:
-                    longest_line = max(get_cwidth(line) for line in text.splitlines())
-                else:
-                    return D(preferred=0)
-                return D(preferred=longest_line)
-            else:
-                return width
-
-        # text_width = len(max(self.text.split('\n'), key=len)) + 2
-        # text_height = len(text.split('\n'))
-
-        # TODO: Add dynamic_h_scrollbar to TextArea and this Dialog
-        # def dynamic_horizontal_scrollbar():
-        #     max_text_width = get_app().renderer.output.get_size().columns - 2
-
-        def dynamic_virtical_scrollbar():
-            text_fragments = to_formatted_text(self.text)
-            text = fragment_list_to_text(text_fragments)
-            if text:
-                text_height = len(self.text.splitlines())
-                max_text_height = get_app().renderer.output.get_size().rows - 6
-                if text_height > max_text_height:
-                    return True
-
-        self.text_area = TextArea(
+        self.text_area = TextPager(
             text=text,
             lexer=lexer,
-            read_only=True,
-            focusable=False,
-            width=get_text_width(),
+            width=width,
             wrap_lines=wrap_lines,
-            scrollbar=dynamic_virtical_scrollbar(),
+            scrollbar=scrollbar,
+            accept_handler=set_done,
         )
 
         ok_button = Button(text="OK", handler=(lambda: set_done()))
@@ -187,8 +183,69 @@ class MessageDialog(object):
         return self.dialog
 
 
+class PagedMessageDialog(object):
+    """
+    Message box that pulls its text from an iterator of pages.
+
+    Only the first page is built when the dialog opens; each press of the
+    More button appends the next page and scrolls to it.
+    """
+
+    def __init__(self, title="", pages=(), lexer=None, width=None, wrap_lines=True):
+        from asyncio import Future
+
+        from prompt_toolkit.widgets import Dialog
+
+        from .base import Button, TextPager
+
+        self.future = Future()
+        self.pages = iter(pages)
+        text = next(self.pages, "")
+        self.next_page = next(self.pages, None)  # read ahead to know if more exist
+
+        def set_done():
+            self.future.set_result(None)
+
+        def more():
+            if self.next_page is None:
+                return
+            start = self.text_area.control.index.line_count
+            self.text_area.append("\n" + self.next_page)
+            self.text_area.scroll_to(start)
+            self.next_page = next(self.pages, None)
+            if self.next_page is None:
+                self.more_button.text = "End"
+
+        self.text_area = TextPager(
+            text=text,
+            lexer=lexer,
+            width=width,
+            wrap_lines=wrap_lines,
+            scrollbar=True,
+            accept_handler=set_done,
+        )
+
+        self.more_button = Button(
+            text="More" if self.next_page else "End", handler=more
+        )
+        ok_button = Button(text="OK", handler=set_done)
+
+        self.dialog = Dialog(
+            title=title,
+            body=self.text_area,
+            buttons=[ok_button, self.more_button],
+            modal=True,
+        )
+
+    def __pt_container__(self):
+        return self.dialog
+
+
 async def show_dialog(dialog):
     "Coroutine."
+    from prompt_toolkit.application.current import get_app
+    from prompt_toolkit.layout.containers import Float
+
     app = get_app()
     float_ = Float(content=dialog)
     app.layout.container.floats.insert(0, float_)
@@ -206,10 +263,44 @@ async def show_dialog(dialog):
 # Functions that use dialog classes and return results
 
 
+class DialogLog(list):
+    """
+    Collects the dialogs a command shows while no user interface is running.
+
+    Each dialog becomes a dict with its title and text.  Yes/No dialogs are
+    answered with assume_yes, and the answer is logged with them.
+    """
+
+    def __init__(self, assume_yes=False):
+        super(DialogLog, self).__init__()
+        self.assume_yes = assume_yes
+
+
+# Set by Ctui.execute, so dialogs are logged instead of drawn in headless mode
+headless_dialogs = ContextVar("headless_dialogs", default=None)
+
+
 def func_pass():
     pass
 
 
+def schedule(coroutine):
+    """Run a dialog coroutine on the application event loop, from any thread"""
+    from asyncio import ensure_future, get_running_loop, run_coroutine_threadsafe
+
+    from prompt_toolkit.application.current import get_app
+
+    loop = get_app().loop
+    try:
+        running_loop = get_running_loop()
+    except RuntimeError:
+        running_loop = None
+    if loop is None or loop is running_loop:
+        ensure_future(coroutine)
+    else:
+        run_coroutine_threadsafe(coroutine, loop)
+
+
 def yes_no_dialog(
     title="",
     text="",
@@ -222,6 +313,14 @@ def yes_no_dialog(
     Display a Yes/No dialog.
     Execute a passed function.
     """
+    log = headless_dialogs.get()
+    if log is not None:
+        log.append({"title": title, "text": text, "answer": log.assume_yes})
+        if log.assume_yes:
+            yes_func()
+        else:
+            no_func()
+        return
 
     async def coroutine():
         dialog = YesNoDialog(title=title, text=text, yes_text=yes_text, no_text=no_text)
@@ -231,7 +330,7 @@ def yes_no_dialog(
         else:
             no_func()
 
-    ensure_future(coroutine())
+    schedule(coroutine())
 
 
 # def button_dialog(title='', text='', buttons=[], style=None):
@@ -253,6 +352,10 @@ def input_dialog(
     Display a text input box.
     Return the given text, or None when cancelled.
     """
+    log = headless_dialogs.get()
+    if log is not None:
+        log.append({"title": title, "text": text, "answer": None})
+        return None
     output_text = ""
 
     async def coroutine():
@@ -261,7 +364,7 @@ def input_dialog(
 
         output_text = await show_dialog(open_dialog)
 
-    ensure_future(coroutine())
+    schedule(coroutine())
     return output_text
 
 
@@ -277,19 +380,48 @@ def message_dialog(
     """
     Display a simple message box and wait until the user presses enter.
     """
+    log = headless_dialogs.get()
+    if log is not None:
+        log.append({"title": title, "text": text})
+        return
 
     async def coroutine():
         dialog = MessageDialog(
             title=title,
             text=text,
             ok_text=ok_text,
+            lexer=lexer,
             width=width,
             wrap_lines=wrap_lines,
             scrollbar=scrollbar,
         )
         await show_dialog(dialog)
 
-    ensure_future(coroutine())
+    schedule(coroutine())
+
+
+def paged_dialog(title="", pages=(), lexer=None, width=None, wrap_lines=True):
+    """
+    Display a message box that loads pages of text on demand.
+
+    :param pages: Iterable of page texts, only consumed as the user asks for more
+    """
+    log = headless_dialogs.get()
+    if log is not None:
+        log.append({"title": title, "text": "\n".join(pages)})
+        return
+
+    async def coroutine():
+        dialog = PagedMessageDialog(
+            title=title,
+            pages=pages,
+            lexer=lexer,
+            width=width,
+            wrap_lines=wrap_lines,
+        )
+        await show_dialog(dialog)
+
+    schedule(coroutine())
 
 
 # def radiolist_dialog(title='', text='', ok_text='Ok', cancel_text='Cancel',
@@ -12,14 +12,7 @@ Control Things User Interface, aka ctui.py
 # FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
 # details at <http://www.gnu.org/licenses/>.
 """
-import datetime
-import time
-
-from prompt_toolkit.document import Document
-from prompt_toolkit.filters import has_focus
-from prompt_toolkit.key_binding import KeyBindings
-from prompt_toolkit.search import SearchDirection, start_search
-from tabulate import tabulate
+from itertools import islice
 
 from .dialogs import message_dialog
 
@@ -118,6 +111,110 @@ def scroll_home(event):
     event.app.layout.focus(event.app.input_field)
 
 
+def paginate(iterable, size):
+    """Yield lists of up to size items from iterable, consuming it lazily"""
+    iterator = iter(iterable)
+    page = list(islice(iterator, size))
+    while page:
+        yield page
+        page = list(islice(iterator, size))
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def table_lines(rows, headers=(), widths=None, sample=200, floatfmt="g"):
+    """
+    Yield the lines of a table, laid out like tabulate's "simple" format
+
+    Rows are read as lines are taken, so a table of any length is formatted
+    in constant memory.  Columns are sized and aligned from the headers and
+    the first sample rows, or from widths if given; longer cells further down
+    are not cut.  Number columns are right aligned on the decimal point.
+
+    :param rows: Iterable of dicts, or of sequences of cell values
+    :param headers: Column names, or "keys" for the keys of the first dict
+        row.  Without headers the table has no header or rule lines.
+    :param widths: Optional width of each column
+    :param sample: Number of rows read ahead to size and align the columns
+    :param floatfmt: Format of float cells
+    """
+    rows = iter(rows)
+    head = list(islice(rows, sample))
+    if headers == "keys":
+        headers = list(head[0]) if head else []
+    headers = [str(header) for header in headers]
+    keys = headers if head and isinstance(head[0], dict) else None
+
+    def values(row):
+        return [row.get(key) for key in keys] if keys is not None else list(row)
+
+    sampled = [values(row) for row in head]
+    count = max([len(headers)] + [len(row) for row in sampled])
+    columns = [[row[i] for row in sampled if i < len(row)] for i in range(count)]
+    numeric = [
+        any(_is_number(value) for value in column)
+        and all(_is_number(value) or value is None for value in column)
+        for column in columns
+    ]
+    # number columns holding floats format all their numbers with floatfmt
+    floats = [
+        number and any(isinstance(value, float) for value in column)
+        for column, number in zip(columns, numeric)
+    ]
+
+    def text(value, i):
+        if value is None:
+            return ""
+        if floats[i] and _is_number(value):
+            return format(value, floatfmt)
+        return str(value)
+
+    def decimals(cell):
+        point = cell.find(".")
+        return len(cell) - point if point >= 0 else 0
+
+    # characters after the decimal point, to pad shorter numbers to
+    fractions = [
+        max([decimals(text(value, i)) for value in column] + [0]) if numeric[i] else 0
+        for i, column in enumerate(columns)
+    ]
+
+    def cells(row):
+        row = values(row)
+        cells = [text(row[i], i) if i < len(row) else "" for i in range(count)]
+        for i, cell in enumerate(cells):
+            if numeric[i] and cell:
+                cells[i] = cell + " " * (fractions[i] - decimals(cell))
+        return cells
+
+    if widths is None:
+        widths = [len(header) + 2 for header in headers] + [0] * count
+        for row in head:
+            widths = [max(width, len(cell)) for width, cell in zip(widths, cells(row))]
+
+    def line(cells):
+        return "  ".join(
+            cell.rjust(width) if number else cell.ljust(width)
+            for cell, width, number in zip(cells, widths, numeric)
+        ).rstrip()
+
+    if headers:
+        yield line(headers)
+        yield "  ".join("-" * width for width in widths[:count])
+    for row in head:
+        yield line(cells(row))
+    for row in rows:
+        yield line(cells(row))
+
+
+def table_pages(rows, page_size, **kwargs):
+    """Yield the text of a table in pages of page_size lines, see table_lines"""
+    for page in paginate(table_lines(rows, **kwargs), page_size):
+        yield "\n".join(page)
+
+
 def show_help(ctui):
     dialog = "{}\n\n{}\n\nAvaiable commands are:\n\n".format(
         ctui.welcome, ctui.help_message
@@ -126,5 +223,5 @@ def show_help(ctui):
     for command in ctui.commands:
         if len(command.string.split()) == 1:
             table.append((command.string, command.desc))
-    dialog += tabulate(sorted(table), tablefmt="plain")
+    dialog += "\n".join(table_lines(sorted(table)))
     message_dialog("Help", dialog)
@@ -0,0 +1,232 @@
+"""
+Control Things User Interface, aka ctui.py
+
+# Copyright (C) 2019  Justin Searle
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or any later version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details at <http://www.gnu.org/licenses/>.
+"""
+import re
+from bisect import bisect_left, bisect_right, insort
+from itertools import chain
+
+REGEX_CHARACTERS = set(".^$*+?{}[]\\|()")
+
+
+def tokenize(text):
+    return re.findall(r"\w+", text.lower())
+
+
+class HistoryIndex(object):
+    """
+    Token index over history commands, kept current as commands are recorded.
+
+    Literal searches only test records whose commands contain every word of
+    the query, and date/time ranges are found by bisecting the timestamps,
+    so searching does not re-read or re-scan the whole history.  Words the
+    query has other characters on both sides of must be whole words, found
+    in a dict.  The query's first word may end a word and its last word may
+    start one, found by bisecting the words sorted from the end or from the
+    start.  Only a query of one bare word scans every word for it.
+
+    :param records: History records to index, oldest first
+    """
+
+    def __init__(self, records=()):
+        self.records = []
+        self.stamps = []  # "Date Time" of each record, in the order recorded
+        self.tokens = {}  # maps each lowercase word to positions of its records
+        self._starts = None  # sorted tokens
+        self._ends = None  # sorted reversed tokens
+        for record in records:
+            self.add(record)
+        self._starts = sorted(self.tokens)  # sorted once, then kept sorted
+        self._ends = sorted(token[::-1] for token in self.tokens)
+
+    def add(self, record):
+        position = len(self.records)
+        self.records.append(record)
+        self.stamps.append(f"{record.get('Date', '')} {record.get('Time', '')}")
+        for token in set(tokenize(record.get("Command", ""))):
+            if token not in self.tokens:
+                self.tokens[token] = []
+                if self._starts is not None:
+                    insort(self._starts, token)
+                    insort(self._ends, token[::-1])
+            self.tokens[token].append(position)
+
+    def _tokens_with(self, word, open_before, open_after):
+        """
+        Return the tokens a word of a literal query may be part of
+
+        :param open_before: True if the query has no characters before word
+        :param open_after: True if the query has no characters after word
+        """
+        if not open_before and not open_after:
+            return [word] if word in self.tokens else []
+        if open_before and open_after:
+            return [token for token in self.tokens if word in token]
+        if open_after:  # tokens starting with word
+            vocabulary, prefix = self._starts, word
+        else:  # tokens ending with word
+            vocabulary, prefix = self._ends, word[::-1]
+        tokens = []
+        index = bisect_left(vocabulary, prefix)
+        while index < len(vocabulary) and vocabulary[index].startswith(prefix):
+            token = vocabulary[index]
+            tokens.append(token if open_after else token[::-1])
+            index += 1
+        return tokens
+
+    def _candidates(self, query, start, stop):
+        """Return positions that may match query, or None if all in range may"""
+        query = query.lower()
+        words = list(re.finditer(r"\w+", query))
+        if not words or REGEX_CHARACTERS & set(query):
+            return None
+        candidates = None
+        for word in words:
+            positions = set()
+            for token in self._tokens_with(
+                word.group(), word.start() == 0, word.end() == len(query)
+            ):
+                positions.update(self.tokens[token])
+            candidates = positions if candidates is None else candidates & positions
+        return sorted(position for position in candidates if start <= position < stop)
+
+    def search(self, query, since=None, until=None):
+        """
+        Return an iterator of records whose command matches the regex query.
+
+        Records are found lazily, oldest first, as the iterator is consumed.
+
+        :param since: Only records at or after this "YYYY-MM-DD HH:MM:SS" prefix
+        :param until: Only records at or before this "YYYY-MM-DD HH:MM:SS" prefix
+        """
+        try:
+            pattern = re.compile(query)
+        except re.error as error:
+            raise AssertionError(f"Invalid search regex: {error}")
+        start = bisect_left(self.stamps, since) if since else 0
+        stop = len(self.stamps)
+        if until:  # include every record whose stamp starts with until
+            stop = bisect_right(self.stamps, until + "\uffff")
+        positions = self._candidates(query, start, stop)
+        if positions is None:
+            positions = range(start, stop)
+        return (
+            self.records[position]
+            for position in positions
+            if pattern.search(self.records[position].get("Command", ""))
+        )
+
+
+class HistoryJournal(object):
+    """
+    Write-behind journal in front of the project's history table.
+
+    Inserted records are held in memory and written to the table in batches,
+    so entering a command usually costs the same however long the history
+    grows.  Each batched write still costs what the project backend charges
+    for an insert: TinyDB rewrites the whole file, so with TinyDB the cost
+    per command, averaged over the batch, grows with the history, while
+    SQLite only writes the new rows.  Any other use of the table (all,
+    search, ...) writes pending records first.
+
+    :param table: The history table that records are written to
+    :param durability: "immediate" writes every record as it is inserted,
+        "batched" writes after batch_size records or interval seconds, and
+        "exit" writes only when flushed, such as when the project is closed
+    :param batch_size: Number of pending records that triggers a batched write
+    :param interval: Max seconds a batched record may stay pending
+    :param schedule: Callable (delay, func) used to run timed writes, if any
+    """
+
+    durabilities = ("immediate", "batched", "exit")
+
+    def __init__(
+        self, table, durability="batched", batch_size=100, interval=5, schedule=None
+    ):
+        if durability not in self.durabilities:
+            raise ValueError('Must be "immediate", "batched" or "exit"')
+        self.table = table
+        self.durability = durability
+        self.batch_size = batch_size
+        self.interval = interval
+        self.schedule = schedule
+        self.pending = []
+        self._timer = None
+        self._index = None
+        self._records = None  # whole history of a JSON table, read for a tail
+
+    @property
+    def index(self):
+        """Search index over the whole history, built on first use"""
+        if self._index is None:
+            self._index = HistoryIndex(self._records or self.all())
+            self._records = None  # the index keeps them from now on
+        return self._index
+
+    def find(self, query, since=None, until=None):
+        """Return an iterator of history records whose command matches query"""
+        return self.index.search(query, since, until)
+
+    def insert(self, record):
+        if self._index is not None:
+            self._index.add(record)
+        elif self._records is not None:
+            self._records.append(record)
+        if self.durability == "immediate":
+            self.table.insert(record)
+            return
+        self.pending.append(record)
+        if self.durability == "batched":
+            if len(self.pending) >= self.batch_size:
+                self.flush()
+            elif self._timer is None and self.schedule is not None:
+                self._timer = self.schedule(self.interval, self.flush)
+
+    def flush(self):
+        """Write all pending records to the history table"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self.pending:
+            records, self.pending = self.pending, []
+            self.table.insert_multiple(records)
+
+    def truncate(self):
+        """Remove all history, including pending records"""
+        self.pending = []
+        self._index = None
+        self._records = None
+        self.table.truncate()
+
+    def __getattr__(self, name):
+        if name.startswith("_") or name in ("table", "pending", "index"):
+            raise AttributeError(name)
+        self.flush()
+        return getattr(self.table, name)
+
+    def __len__(self):
+        return len(self.table) + len(self.pending)
+
+    def __iter__(self):
+        self.flush()
+        return iter(self.table)
+
+    def __reversed__(self):
+        """Iterate records newest first, reading only as many as are consumed"""
+        if self._index is not None:
+            return reversed(self._index.records)
+        if hasattr(self.table, "__reversed__"):
+            return chain(reversed(self.pending), reversed(self.table))
+        if self._records is None:
+            self._records = self.all()  # JSON tables can only be read whole
+        return reversed(self._records)
@@ -12,16 +12,16 @@ Control Things User Interface, aka ctui.py
 # FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
 # details at <http://www.gnu.org/licenses/>.
 """
+import asyncio
+import re
 import time
 import traceback
-from datetime import datetime
 
-from prompt_toolkit.document import Document
-from prompt_toolkit.filters import has_focus
+from prompt_toolkit.filters import Condition, has_focus
 from prompt_toolkit.formatted_text import HTML, to_formatted_text
 from prompt_toolkit.key_binding import KeyBindings
-from prompt_toolkit.search import SearchDirection, start_search
 
+from .commands import CommandTimeout
 from .dialogs import message_dialog
 from .functions import (
     scroll_end,
@@ -31,12 +31,14 @@ from .functions import (
     scroll_page_down,
     scroll_page_up,
 )
+from .output import OutputSearch
 
 
 def get_key_bindings(ctui):
     """Return keybinding object for application shortcut keys"""
     input_field = ctui.layout.input_field
     output_field = ctui.layout.output_field
+    search_field = ctui.layout.search_field
     kb = KeyBindings()
 
     #######################
@@ -60,55 +62,77 @@ def get_key_bindings(ctui):
     # Input Field ONLY key bindings #
     #################################
 
+    def finish_command(command_text, output_text):
+        """Record a successful command in history and show its output"""
+        # For invalid commands forcing users to correct them
+        if output_text == False:
+            return
+
+        ctui._record_history(command_text)
+        ctui.invalidate_statusbar()  # commands may change what the statusbar shows
+        # Leave the prompt alone if the user typed on while the command ran
+        if input_field.text == command_text:
+            input_field.buffer.reset(append_to_history=True)
+
+        # For commands that do not have output_text
+        if output_text != None:
+            ctui.output_text = output_text
+
+    async def run_command(command, kwargs, command_text):
+        """Await a non-blocking command while the UI stays responsive"""
+        ctui._running_command = command_text
+        ctui.app.invalidate()
+        try:
+            if command.is_stream:
+                output_text = await command.stream(ctui.append_output, **kwargs)
+            else:
+                output_text = await command.execute_async(**kwargs)
+        except (CommandTimeout, AssertionError) as error:
+            message_dialog(title="Error", text=str(error))
+            return
+        except asyncio.CancelledError:
+            raise
+        except:
+            message_dialog(title="Error", text=traceback.format_exc(), scrollbar=True)
+            return
+        finally:
+            ctui._running_task = None
+            ctui._running_command = None
+            ctui.app.invalidate()
+        finish_command(command_text, output_text)
+
     @kb.add("enter", filter=has_focus(input_field))
     def _(event):
         if len(input_field.text) == 0:
             return
-        # Process commands on prompt after hitting enter key
-        # do_function, args = ctui._extract_do_function(input_field.text)
-        #
-        # if do_function:
-        #     try:
-        #         output_text = ctui._execute(do_function, args, output_field.text)
-        #     except AssertionError as error:
-        #         message_dialog(title='Error', text=str(error))
-        #     except:
-        #         message_dialog(title='Error', text=traceback.format_exc(),
-        #                        scrollbar=True)
+        # Only one command runs at a time, Ctrl-C cancels the running one
+        if ctui._running_task is not None:
+            return
+        command_text = input_field.text
 
         try:
-            command, kwargs = ctui.commands.extract(input_field.text)
+            command, kwargs = ctui.commands.extract(command_text)
+            if command and not command.blocking:
+                ctui._running_task = ctui.app.create_background_task(
+                    run_command(command, kwargs, command_text)
+                )
+                return
             if command:
-                ctui.output_text = output_field.text
                 output_text = command.execute(**kwargs)
         except AssertionError as error:
             message_dialog(title="Error", text=str(error))
         except:
             message_dialog(title="Error", text=traceback.format_exc(), scrollbar=True)
 
-        # For invalid commands forcing users to correct them
-        if "output_text" not in locals() or output_text == False:
-            return
-
-        date, time = str(datetime.today()).split()
-        ctui.history.insert(
-            {"Date": date, "Time": time.split(".")[0], "Command": input_field.text}
-        )
-        input_field.buffer.reset(append_to_history=True)
-
-        # For commands that do not have output_text
-        if output_text == None:
-            input_field.text = ""
-            return
-        else:
-            output_field.buffer.document = Document(
-                text=output_text, cursor_position=len(output_text)
-            )
-            input_field.text = ""
+        if "output_text" in locals():
+            finish_command(command_text, output_text)
 
     @kb.add("c-c", filter=has_focus(input_field))
     def _(event):
-        """Pressing Control-C will copy highlighted text to clipboard"""
+        """Pressing Control-C will cancel a running command or copy highlighted text"""
+        if ctui._running_task is not None:
+            ctui._running_task.cancel()
+            return
         data = input_field.buffer.copy_selection()
         ctui.app.clipboard.set_data(data)
 
@@ -153,22 +177,76 @@ def get_key_bindings(ctui):
         """Scroll output_field down one line"""
         scroll_home(event)
 
+    ###################################
+    # Searching the output_field text #
+    ###################################
+
+    def goto_match(backward=False):
+        """Move the output_field cursor to the next or previous search match"""
+        search = ctui.layout.search
+        if search is None:
+            return
+        ctui._show_changed_output()  # so offsets in the output match the window
+        buffer = output_field.buffer
+        if backward:
+            position = search.before(buffer.cursor_position)
+        else:
+            position = search.after(buffer.cursor_position)
+        if position is not None:
+            buffer.cursor_position = position
+
+    @kb.add(
+        "/", filter=has_focus(input_field) & Condition(lambda: not input_field.text)
+    )
+    @kb.add("/", filter=has_focus(output_field))
+    def _(event):
+        """Search output_field for a regex, highlighting matches as it is typed"""
+        search_field.text = ""
+        event.app.layout.focus(search_field)
+
+    @kb.add("enter", filter=has_focus(search_field))
+    def _(event):
+        """Go to the last match above the cursor, an empty search repeats the last"""
+        pattern = search_field.text
+        if pattern:
+            try:
+                ctui.layout.search = OutputSearch(ctui.output, pattern)
+            except re.error as error:
+                message_dialog(title="Error", text=f"Invalid search regex: {error}")
+                return
+        event.app.layout.focus(output_field)
+        goto_match(backward=True)  # the cursor follows the output at its end
+
+    @kb.add("escape", filter=has_focus(search_field))
+    @kb.add("c-c", filter=has_focus(search_field))
+    def _(event):
+        """Cancel the search being typed"""
+        event.app.layout.focus_last()
+
+    @kb.add("n", filter=has_focus(output_field))
+    def _(event):
+        """Goto next match of the output_field search"""
+        goto_match()
+
+    @kb.add("N", filter=has_focus(output_field))
+    def _(event):
+        """Goto previous match of the output_field search"""
+        goto_match(backward=True)
+
+    @kb.add("q", filter=has_focus(output_field))
+    @kb.add("escape", filter=has_focus(output_field))
+    def _(event):
+        """Clear the search and go back to input_field, following new output"""
+        ctui.layout.search = None
+        event.app.layout.focus(input_field)
+        ctui._show_output()
+
     # kb.add('pagedown', filter=has_focus(output_field))(scroll_page_down)
     # kb.add('space', filter=has_focus(output_field))(scroll_page_down)
     # kb.add('f', filter=has_focus(output_field))(scroll_page_down)
     # kb.add('pageup')(scroll_page_up)
     # kb.add('b')(scroll_page_up)
     #
-    # @kb.add('q', filter=has_focus(output_field))
-    # def _(event):
-    #     """Quit navigation back to input_field"""
-    #     ctui.app.layout.focus_previous()
-    #
-    # @kb.add('/', filter=has_focus(output_field))
-    # def _(event):
-    #     """Search and highlight strigs in output_field"""
-    #     start_search(output_field.control)
-    #
     # @kb.add('g', filter=has_focus(output_field))
     # def _(event):
     #     """Goto beginning of output_field"""
@@ -181,22 +259,6 @@ def get_key_bindings(ctui):
     #     output_field.buffer.document = Document(
     #         text=output_field.text, cursor_position=len(output_field.text))
     #
-    # @kb.add('n', filter=has_focus(output_field))
-    # def _(event):
-    #     """Goto next item in output_field search"""
-    #     search_state = ctui.app.current_search_state
-    #     cursor_position = output_field.buffer.get_search_position(
-    #         search_state, include_current_position=False)
-    #     output_field.buffer.cursor_position = cursor_position
-    #
-    # @kb.add('N', filter=has_focus(output_field))
-    # def _(event):
-    #     """Goto previous item in output_field search"""
-    #     search_state = ctui.app.current_search_state
-    #     cursor_position = output_field.buffer.get_search_position(
-    #         ~search_state, include_current_position=True)
-    #     output_field.buffer.cursor_position = cursor_position
-    #
     # @kb.add('c-c', filter=has_focus(output_field))
     # def _(event):
     #     """Pressing Control-C will copy highlighted text to clipboard"""
@@ -12,10 +12,15 @@ Control Things User Interface, aka ctui.py
 # FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
 # details at <http://www.gnu.org/licenses/>.
 """
+import re
 from pathlib import Path
 
+from prompt_toolkit.application.current import get_app
+from prompt_toolkit.filters import has_focus
+from prompt_toolkit.formatted_text.utils import fragment_list_to_text
 from prompt_toolkit.history import FileHistory
 from prompt_toolkit.layout.containers import (
+    ConditionalContainer,
     Float,
     FloatContainer,
     HSplit,
@@ -24,6 +29,11 @@ from prompt_toolkit.layout.containers import (
 )
 from prompt_toolkit.layout.controls import FormattedTextControl
 from prompt_toolkit.layout.menus import CompletionsMenu
+from prompt_toolkit.layout.processors import (
+    Processor,
+    Transformation,
+    explode_text_fragments,
+)
 from prompt_toolkit.lexers import Lexer
 from prompt_toolkit.widgets import MenuContainer, MenuItem, SearchToolbar, TextArea
 
@@ -31,6 +41,42 @@ from ctui.completion import CommandCompleter
 from ctui.functions import show_help
 
 
+class SearchHighlighter(Processor):
+    """
+    Highlight the matches of a regular expression on the lines being drawn
+
+    Only the visible lines are searched, so highlighting costs the same
+    however long the text is.  The match under the cursor is shown as the
+    current one.
+
+    :param get_regex: Function returning the compiled regex, or None
+    """
+
+    def __init__(self, get_regex):
+        self.get_regex = get_regex
+
+    def apply_transformation(self, transformation_input):
+        fragments = transformation_input.fragments
+        regex = self.get_regex()
+        if regex is None:
+            return Transformation(fragments)
+        document = transformation_input.document
+        cursor = -1
+        if transformation_input.lineno == document.cursor_position_row:
+            cursor = document.cursor_position_col
+        exploded = None
+        for match in regex.finditer(fragment_list_to_text(fragments)):
+            start, end = match.span()
+            if start == end:
+                continue
+            if exploded is None:
+                exploded = explode_text_fragments(fragments)
+            style = " class:search.current " if start == cursor else " class:search "
+            for i in range(start, end):
+                exploded[i] = (exploded[i][0] + style,) + tuple(exploded[i][1:])
+        return Transformation(fragments if exploded is None else exploded)
+
+
 class CtuiLayout(object):
     """Class to facilitate editing and accessing different layout elements"""
 
@@ -65,6 +111,17 @@ class CtuiLayout(object):
             style="class:output_field",
             wrap_lines=self.ctui.wrap_lines,
             scrollbar=True,
+            read_only=True,
+            input_processors=[SearchHighlighter(self._search_regex)],
+        )
+
+        self.search = None  # OutputSearch of the last search accepted
+        self._typed = (None, None)  # last pattern typed, and its compiled regex
+        self._search_field = TextArea(
+            height=1,
+            prompt="/",
+            style="class:input_field",
+            multiline=False,
         )
 
         self._statusbar = Window(
@@ -75,7 +132,15 @@ class CtuiLayout(object):
 
         self._body = FloatContainer(
             HSplit(
-                [self.input_field, self.header_field, self.output_field, self.statusbar]
+                [
+                    self.input_field,
+                    self.header_field,
+                    self.output_field,
+                    ConditionalContainer(
+                        self.search_field, filter=has_focus(self.search_field)
+                    ),
+                    self.statusbar,
+                ]
             ),
             floats=[
                 Float(
@@ -144,6 +209,23 @@ class CtuiLayout(object):
     def output_field(self):
         return self._output_field
 
+    @property
+    def search_field(self):
+        return self._search_field
+
+    def _search_regex(self):
+        """Regex to highlight: the one being typed, else the last search"""
+        if not get_app().layout.has_focus(self.search_field):
+            return self.search.regex if self.search is not None else None
+        pattern = self.search_field.text
+        if pattern != self._typed[0]:
+            try:
+                regex = re.compile(pattern, re.MULTILINE) if pattern else None
+            except re.error:
+                regex = None  # not a complete regex yet
+            self._typed = (pattern, regex)
+        return self._typed[1]
+
     @property
     def statusbar_text(self):
         return self.ctui._statusbar
@@ -0,0 +1,259 @@
+"""
+Control Things User Interface, aka ctui.py
+
+# Copyright (C) 2019  Justin Searle
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or any later version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details at <http://www.gnu.org/licenses/>.
+"""
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import deque
+
+
+class OutputBuffer(object):
+    """
+    Scrollback of the main output window, kept as a ring buffer of lines.
+
+    Appending only touches the new text, the current last line and the oldest
+    lines it pushes out, so the cost of each command's output is bounded by
+    the size of that output rather than by the scrollback.  The text of the
+    whole scrollback is only joined when it is read, to redraw the window or
+    to search it, and is kept until the next change.
+
+    :param scrollback: Maximum number of lines to keep, None for unlimited
+    """
+
+    def __init__(self, scrollback=10000):
+        self._scrollback = scrollback
+        self._length = 0
+        self.offset = 0  # of the first character kept, counting all output ever
+        self.clear()
+
+    @property
+    def scrollback(self):
+        return self._scrollback
+
+    @scrollback.setter
+    def scrollback(self, value):
+        self._scrollback = value
+        self._trim()
+
+    @property
+    def text(self):
+        if self._text is None:
+            self._text = "\n".join(self.lines)
+        return self._text
+
+    @property
+    def line_count(self):
+        return len(self.lines)
+
+    def clear(self):
+        self.lines = deque([""])  # last line is the unfinished current line
+        self.offset += self._length
+        self._length = 0
+        self._text = ""
+
+    def append(self, text):
+        """Append text to the end of the output, dropping the oldest lines"""
+        if not text:
+            return
+        new_lines = text.split("\n")
+        self.lines[-1] += new_lines[0]
+        self.lines.extend(new_lines[1:])
+        self._length += len(text)
+        self._text = None
+        self._trim()
+
+    def replace(self, text):
+        """Replace all output with text, appending only if text extends it"""
+        if text.startswith(self.text):
+            self.append(text[len(self) :])
+        else:
+            self.clear()
+            self.append(text)
+
+    def _trim(self):
+        if self._scrollback is None:
+            return
+        dropped = 0
+        while len(self.lines) > max(self._scrollback, 1):
+            dropped += len(self.lines.popleft()) + 1
+        if dropped:
+            self._length -= dropped
+            self.offset += dropped
+            self._text = None
+
+    def __len__(self):
+        return self._length
+
+    def __str__(self):
+        return self.text
+
+
+class LineIndex(object):
+    """
+    Start offsets of the lines of a text, found only as far as they are needed.
+
+    Gives any line of a very long text, and the number of lines, without
+    splitting the whole text into a list of lines.  Lines are found from
+    whichever end of the text is nearer, since views look at both the start
+    and the last page.  The length of the longest line found so far is kept,
+    to size views of the text.
+
+    :param text: Text to index, which may be extended later with append
+    """
+
+    def __init__(self, text=""):
+        self.text = text
+        self.line_count = text.count("\n") + 1
+        self.starts = array("q", [0])  # offset of each line from the first
+        self.tail = array("q")  # offset of each line from the last, backwards
+        self.width = 0  # length of the longest line found so far
+
+    def append(self, text):
+        """Extend the text, keeping the lines found from the start"""
+        self.text += text
+        self.line_count += text.count("\n")
+        del self.tail[:]  # the lines from the end have moved
+
+    def _find_forward(self, lineno):
+        starts = self.starts
+        text = self.text
+        while len(starts) <= lineno:
+            start = starts[-1]
+            end = text.find("\n", start)
+            starts.append(end + 1)
+            self.width = max(self.width, end - start)
+
+    def _find_backward(self, lineno):
+        tail = self.tail
+        text = self.text
+        while self.line_count - len(tail) > lineno:
+            end = tail[-1] - 1 if tail else len(text)
+            start = text.rfind("\n", 0, end) + 1
+            tail.append(start)
+            self.width = max(self.width, end - start)
+
+    def find(self, lineno):
+        """Find the start of line lineno, from the nearer end of the text"""
+        lineno = min(lineno, self.line_count - 1)
+        from_start = lineno - (len(self.starts) - 1)
+        from_end = self.line_count - len(self.tail) - lineno
+        if from_start <= 0:
+            return self.starts[lineno]
+        if from_end <= 0:
+            return self.tail[self.line_count - 1 - lineno]
+        if from_start <= from_end:
+            self._find_forward(lineno)
+            return self.starts[lineno]
+        self._find_backward(lineno)
+        return self.tail[self.line_count - 1 - lineno]
+
+    def line(self, lineno):
+        """Return the text of line lineno, without its newline"""
+        if not 0 <= lineno < self.line_count:
+            raise IndexError("line number out of range")
+        if lineno == self.line_count - 1:
+            self._find_backward(lineno)  # measures the last line
+            return self.text[self.tail[0] :]
+        return self.text[self.find(lineno) : self.find(lineno + 1) - 1]
+
+    def __len__(self):
+        return self.line_count
+
+
+class OutputSearch(object):
+    """
+    Offsets of the matches of a regular expression in an OutputBuffer.
+
+    The output is searched once, and after that only the output appended
+    since the last update, so stepping between matches stays fast however
+    long the scrollback is.  Matches are kept as offsets counted from the
+    start of all output, so lines dropped from the scrollback only drop
+    their own matches.  A match may start in the last lines already searched
+    and end in new output, so those lines are searched again: the last line,
+    and one more for each line break the pattern spells out as ``\\n``.
+    Matches that cross line breaks in other ways, such as with ``\\s`` or
+    ``[^x]``, are missed when they also cross the end of an earlier update.
+    Empty matches are skipped.
+
+    :param output: OutputBuffer to search
+    :param pattern: Regular expression string
+    :param flags: re flags, by default ^ and $ match at each line
+    """
+
+    def __init__(self, output, pattern, flags=re.MULTILINE):
+        self.output = output
+        self.regex = re.compile(pattern, flags)
+        self.lines = pattern.count("\n") + pattern.count("\\n")  # breaks spanned
+        self.hits = array("q")  # start of each match, counting all output ever
+        self._resume = output.offset  # where matches may still change
+        self._end = output.offset  # end of the output when last searched
+        self.update()
+
+    def update(self):
+        """Search the output appended since the last update"""
+        output = self.output
+        text = output.text
+        offset = output.offset
+        hits = self.hits
+        if hits and hits[0] < offset:
+            del hits[: bisect_left(hits, offset)]
+        end = offset + len(text)
+        if end == self._end:
+            return
+        start = max(self._resume, offset) - offset
+        del hits[bisect_left(hits, offset + start) :]
+        resume = self._last_lines(text, start)
+        for match in self.regex.finditer(text, start):
+            if match.end() > match.start():
+                hits.append(offset + match.start())
+                if match.start() < resume:  # kept, so search on after its end
+                    resume = max(resume, match.end())
+        self._resume = offset + resume
+        self._end = end
+
+    def _last_lines(self, text, start):
+        """Return the start of the lines a match ending later could start in"""
+        resume = len(text)
+        for _ in range(self.lines + 1):
+            newline = text.rfind("\n", start, resume)
+            if newline < 0:
+                return start
+            resume = newline
+        return resume + 1
+
+    def after(self, position):
+        """
+        Return the offset in output.text of the first match after position,
+        from the start again past the last match, or None without matches
+        """
+        self.update()
+        if not self.hits:
+            return None
+        index = bisect_right(self.hits, self.output.offset + position)
+        return self.hits[index % len(self.hits)] - self.output.offset
+
+    def before(self, position):
+        """
+        Return the offset in output.text of the last match before position,
+        from the end again before the first match, or None without matches
+        """
+        self.update()
+        if not self.hits:
+            return None
+        index = bisect_left(self.hits, self.output.offset + position) - 1
+        return self.hits[index] - self.output.offset
+
+    def __len__(self):
+        self.update()
+        return len(self.hits)
@@ -0,0 +1,296 @@
+"""
+Control Things User Interface, aka ctui.py
+
+# Copyright (C) 2019  Justin Searle
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or any later version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details at <http://www.gnu.org/licenses/>.
+"""
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from contextlib import contextmanager
+
+from ctui.functions import table_lines
+
+
+class Run(object):
+    """Measurements of one run of a command"""
+
+    __slots__ = ("command", "started", "wall", "cpu", "size", "error")
+
+    def __init__(self, command):
+        self.command = command  # command string, such as "history search"
+        self.started = time.time()
+        self.wall = 0.0  # seconds
+        self.cpu = 0.0  # seconds of process CPU time
+        self.size = 0  # characters the command returned or streamed
+        self.error = None  # name of the exception the command raised
+
+    def returned(self, value):
+        """Count the size of the command's return value and pass it on"""
+        if isinstance(value, (str, bytes)):
+            self.size += len(value)
+        return value
+
+    def counted(self, append):
+        """Wrap an append function to count the size of the chunks streamed"""
+
+        def counted_append(text):
+            self.size += len(text)
+            append(text)
+
+        return counted_append
+
+
+class CommandTimings(object):
+    """
+    Rolling window of the latest runs of all commands, for debug timings.
+
+    Wall time is measured around the whole run.  CPU time is that of the
+    whole process meanwhile, so for threaded and async commands it includes
+    whatever the user interface did while they ran.
+
+    :param window: Number of latest runs to keep
+    """
+
+    def __init__(self, window=1000):
+        self.runs = deque(maxlen=window)
+
+    @property
+    def window(self):
+        return self.runs.maxlen
+
+    @window.setter
+    def window(self, value):
+        if value != self.runs.maxlen:
+            self.runs = deque(self.runs, maxlen=value)
+
+    @contextmanager
+    def measure(self, command):
+        """Context to time one run of command, yielding its Run"""
+        run = Run(command)
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield run
+        except BaseException as error:  # also counts cancels and timeouts
+            run.error = type(error).__name__
+            raise
+        finally:
+            run.wall = time.perf_counter() - wall
+            run.cpu = time.process_time() - cpu
+            self.runs.append(run)
+
+    def summary(self):
+        """Return a row of statistics per command, slowest on average first"""
+        commands = {}
+        for run in self.runs:
+            commands.setdefault(run.command, []).append(run)
+        rows = []
+        for command, runs in commands.items():
+            count = len(runs)
+            rows.append(
+                {
+                    "Command": command,
+                    "Runs": count,
+                    "Errors": sum(run.error is not None for run in runs),
+                    "Mean ms": sum(run.wall for run in runs) * 1000 / count,
+                    "Max ms": max(run.wall for run in runs) * 1000,
+                    "CPU ms": sum(run.cpu for run in runs) * 1000 / count,
+                    "Mean size": sum(run.size for run in runs) // count,
+                }
+            )
+        rows.sort(key=lambda row: row["Mean ms"], reverse=True)
+        return rows
+
+    def clear(self):
+        self.runs.clear()
+
+
+async def profile_command(command, kwargs, append, limit=30):
+    """
+    Run a command once under cProfile, on the thread it normally runs on
+
+    Threaded commands are profiled on a worker thread, and all others on the
+    event loop, so no command touches the project or the user interface from
+    a thread it would not use.  Async and generator commands give the loop
+    back while they run, so their profile also holds what the loop did then.
+
+    :param command: Command to run
+    :param kwargs: Its converted arguments
+    :param append: Function taking chunks of output text
+    :param limit: Number of functions to list
+    :return: The value the command returned, and the text of its profile with
+        the functions taking the most cumulative time first
+    """
+    import cProfile
+    import pstats
+    from io import StringIO
+
+    from ctui.commands import run_in_thread
+
+    profiler = cProfile.Profile()
+
+    def run_threaded():
+        profiler.enable()
+        try:
+            if command.is_stream:
+                for chunk in command.func(**kwargs):
+                    append(str(chunk))
+                return None
+            return command.func(**kwargs)
+        finally:
+            profiler.disable()
+
+    if command.thread:
+        result = await run_in_thread(run_threaded)
+    else:
+        profiler.enable()
+        try:
+            if command.is_stream:
+                result = await command.stream(append, **kwargs)
+            elif command.is_async:
+                result = await command.execute_async(**kwargs)
+            else:
+                result = command.execute(**kwargs)
+        finally:
+            profiler.disable()
+    text = StringIO()
+    stats = pstats.Stats(profiler, stream=text)
+    stats.strip_dirs().sort_stats("cumulative").print_stats(limit)
+    return result, text.getvalue().strip("\n")
+
+
+def _library_folders():
+    """Folders of the standard library and prompt_toolkit, to skip in stacks"""
+    import prompt_toolkit
+
+    return (
+        os.path.dirname(os.__file__) + os.sep,
+        os.path.dirname(prompt_toolkit.__file__) + os.sep,
+    )
+
+
+class Stall(object):
+    """One time the event loop was blocked, and the stack that was blocking it"""
+
+    def __init__(self, lag, stack):
+        self.started = time.time() - lag
+        self.lag = lag  # seconds, until the loop ran again
+        self.stack = stack  # traceback.StackSummary of the loop thread
+
+    @property
+    def where(self):
+        """The innermost frame of the stack outside the libraries ctui runs on"""
+        libraries = _library_folders()
+        for frame in reversed(self.stack):
+            filename = frame.filename
+            if "site-packages" in filename and not filename.startswith(libraries[1]):
+                break
+            if not filename.startswith(libraries):
+                break
+        else:
+            frame = self.stack[-1]
+        return f"{frame.name} ({os.path.basename(frame.filename)}:{frame.lineno})"
+
+
+class LagMonitor(object):
+    """
+    Watchdog recording when the event loop is blocked, and by what.
+
+    A heartbeat task on the loop notes the time every half threshold, and
+    measures how late each beat is.  A watchdog thread checks the heartbeat,
+    and once the loop has been blocked for threshold seconds it records the
+    stack of the loop's thread, which shows the command, dialog, completer
+    or statusbar callback that is blocking it.  The stall's full length is
+    recorded when the loop runs again.
+
+    :param threshold: Seconds the loop may be blocked before it is recorded
+    :param size: Number of latest stalls kept
+    """
+
+    def __init__(self, threshold=0.1, size=50):
+        self.threshold = threshold
+        self.stalls = deque(maxlen=size)
+        self.max_lag = 0.0  # longest lag of a heartbeat, in seconds
+        self.running = False
+        self._beat = None  # time.monotonic() of the last heartbeat
+        self._stall = None  # stall recorded by the watchdog, still going on
+
+    async def run(self):
+        """Beat until cancelled, with the watchdog thread watching the beats"""
+        from asyncio import sleep
+
+        self._beat = time.monotonic()
+        stop = threading.Event()
+        watchdog = threading.Thread(
+            target=self._watch,
+            args=(threading.get_ident(), stop),
+            name="ctui lag monitor",
+            daemon=True,
+        )
+        watchdog.start()
+        self.running = True
+        try:
+            while True:
+                interval = self.threshold / 2
+                await sleep(interval)
+                now = time.monotonic()
+                lag = now - self._beat - interval
+                self._beat = now
+                self.max_lag = max(self.max_lag, lag)
+                stall = self._stall
+                if stall is not None:
+                    stall.lag = max(stall.lag, lag)
+                    self._stall = None
+        finally:
+            self.running = False
+            stop.set()
+
+    def _watch(self, loop_thread, stop):
+        while not stop.wait(self.threshold / 2):
+            beat = self._beat
+            lag = time.monotonic() - beat - self.threshold / 2
+            if lag < self.threshold or self._stall is not None:
+                continue
+            frame = sys._current_frames().get(loop_thread)
+            stack = traceback.extract_stack(frame) if frame is not None else None
+            del frame
+            if stack is None or self._beat != beat:
+                continue  # the loop ran again meanwhile
+            self._stall = Stall(lag, stack)
+            self.stalls.append(self._stall)
+
+    def report(self):
+        """Return the text of a report on the latest stalls, newest first"""
+        state = "Watching" if self.running else "Not watching"
+        lines = [
+            f"{state} for event loop stalls over {self.threshold * 1000:.0f} ms, "
+            f"longest lag {self.max_lag * 1000:.1f} ms",
+        ]
+        stalls = list(reversed(self.stalls))
+        if not stalls:
+            return lines[0]
+        rows = [
+            {
+                "Time": time.strftime("%H:%M:%S", time.localtime(stall.started)),
+                "Lag ms": stall.lag * 1000,
+                "Where": stall.where,
+            }
+            for stall in stalls
+        ]
+        lines += [""] + list(table_lines(rows, headers="keys", floatfmt=".1f"))
+        for row, stall in zip(rows, stalls):
+            lines += ["", f"{row['Time']} {row['Where']}:"]
+            lines += "".join(stall.stack.format()).rstrip("\n").split("\n")
+        return "\n".join(lines)
@@ -0,0 +1,150 @@
+"""
+Control Things User Interface, aka ctui.py
+
+# Copyright (C) 2019  Justin Searle
+#
+# This program is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or any later version.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details at <http://www.gnu.org/licenses/>.
+"""
+import time
+from inspect import iscoroutinefunction
+
+from ctui.commands import run_in_thread
+
+
+class StatusSegment(object):
+    """
+    One named part of the statusbar, with its text kept between repaints
+
+    :param name: Name used to invalidate or remove the segment
+    :param func: Function returning the text to show, may be ``async def``
+    :param interval: Seconds between refreshes, None to refresh only when
+        invalidated
+    """
+
+    def __init__(self, name, func, interval=None):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.is_async = iscoroutinefunction(func)
+        self.text = ""
+        self.stale = True  # refresh as soon as possible
+        self.refreshed = None  # time.monotonic() of the last refresh
+        self.refreshing = False
+
+    def next_refresh(self):
+        """Return the time.monotonic() this segment is next due, None if never"""
+        if self.refreshing:
+            return None
+        if self.stale:
+            return 0
+        if self.interval is None:
+            return None
+        return self.refreshed + self.interval
+
+    async def refresh(self):
+        """Call func without blocking the event loop and keep its text"""
+        self.stale = False  # invalidating while refreshing refreshes again
+        self.refreshing = True
+        try:
+            if self.is_async:
+                text = await self.func()
+            else:
+                text = await run_in_thread(self.func)
+        except Exception as error:
+            text = f"ERROR: {error!r}"
+        finally:
+            self.refreshing = False
+        self.text = "" if text is None else str(text)
+        self.refreshed = time.monotonic()
+
+    def __repr__(self):
+        return str({"name": self.name, "interval": self.interval, "text": self.text})
+
+
+class Statusbar(object):
+    """
+    Statusbar made of named segments, refreshed off the render path.
+
+    Repaints only join the cached text of the segments, so a slow segment,
+    such as one asking a device for its connection state, never delays
+    typing.  While run is awaited, each segment is refreshed on a worker
+    thread once its interval has passed or it was invalidated, and on_change
+    is called when its text changes.
+    """
+
+    separator = " | "
+
+    def __init__(self):
+        self.segments = {}
+        self._loop = None  # event loop of run, while it runs
+        self._wake = None
+        self._tasks = set()
+
+    def add(self, name, func, interval=None):
+        """Add a segment, or replace the one with the same name in its place"""
+        self.segments[name] = StatusSegment(name, func, interval)
+        self._wake_up()
+
+    def remove(self, name):
+        self.segments.pop(name, None)
+
+    def invalidate(self, *names):
+        """Refresh the named segments, or all of them, as soon as possible"""
+        for name in names or list(self.segments):
+            self.segments[name].stale = True
+        self._wake_up()
+
+    def _wake_up(self):
+        """Wake run up early, from any thread"""
+        loop = self._loop
+        if loop is not None:
+            loop.call_soon_threadsafe(self._wake.set)
+
+    def text(self):
+        return self.separator.join(
+            segment.text for segment in self.segments.values() if segment.text
+        )
+
+    async def run(self, on_change):
+        """Refresh the segments as they fall due, until cancelled"""
+        from asyncio import Event, TimeoutError, get_running_loop, wait_for
+
+        self._wake = Event()
+        self._loop = get_running_loop()  # last, as _wake_up then uses _wake
+        try:
+            while True:
+                self._wake.clear()
+                now = time.monotonic()
+                delays = []
+                for segment in list(self.segments.values()):
+                    due = segment.next_refresh()
+                    if due is None:
+                        continue
+                    if due <= now:
+                        task = self._loop.create_task(self._refresh(segment, on_change))
+                        self._tasks.add(task)
+                        task.add_done_callback(self._tasks.discard)
+                    else:
+                        delays.append(due - now)
+                try:
+                    await wait_for(self._wake.wait(), min(delays, default=None))
+                except TimeoutError:
+                    pass
+        finally:
+            self._loop = None
+            for task in list(self._tasks):
+                task.cancel()
+
+    async def _refresh(self, segment, on_change):
+        text = segment.text
+        await segment.refresh()
+        self._wake.set()  # to schedule its next refresh
+        if segment.text != text:
+            on_change()
@@ -46,6 +46,8 @@ class CtuiStyle(object):
             "output_field scrollbar.arrow": "",
             "output_field scrollbar.start": "nounderline",
             "output_field scrollbar.end": "nounderline",
+            "output_field search": "bg:ansibrightyellow ansiblack",
+            "output_field search.current": "bg:ansibrightred ansiblack",
             "line last-line": "nounderline",
             "statusbar": "bg:#AAAAAA",
             # Dialog windows.
@@ -89,6 +91,8 @@ class CtuiStyle(object):
             "output_field scrollbar.arrow": "",
             "output_field scrollbar.start": "nounderline",
             "output_field scrollbar.end": "nounderline",
+            "output_field search": "bg:ansibrightyellow ansiblack",
+            "output_field search.current": "bg:ansibrightred ansiblack",
             "line last-line": "nounderline",
             "statusbar": "bg:#AAAAAA",
             # Dialog windows.
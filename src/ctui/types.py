@@ -12,9 +12,78 @@ Control Things User Interface, aka ctui.py
 # FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
 # details at <http://www.gnu.org/licenses/>.
 """
-import re
+import binascii
+from array import array
+from functools import partial
+from operator import index as as_index
 from typing import List, NewType
 
+
+class BitArray(object):
+    """
+    Bits packed eight to a byte, first bit in the most significant bit
+
+    Indexes like the list of bools from GreedyBin, in an eighth of a byte per bit
+    rather than 8 bytes per list item.
+
+    :param data: Packed bits, ignoring any bits past length
+    :param length: Number of bits, defaults to all the bits in data
+    """
+
+    __slots__ = ("data", "length")
+
+    def __init__(self, data=b"", length=None):
+        self.data = bytes(data)
+        self.length = len(self.data) * 8 if length is None else length
+        assert 0 <= self.length <= len(self.data) * 8, "length is out of range"
+
+    @classmethod
+    def from01(cls, digits):
+        """Pack text or bytes of 0 and 1 characters, such as "0101" or b"0101"."""
+        length = len(digits)
+        number = int(digits, 2) if length else 0  # linear time for base 2
+        return cls((number << (-length % 8)).to_bytes((length + 7) // 8, "big"), length)
+
+    def to01(self):
+        """Return the bits as text of 0 and 1 characters"""
+        if not self.length:
+            return ""
+        digits = bin(int.from_bytes(self.data, "big"))[2:]
+        return digits.zfill(len(self.data) * 8)[: self.length]
+
+    def tobytes(self):
+        return self.data
+
+    def count(self, value=True):
+        """Number of bits set to value"""
+        ones = self.to01().count("1")
+        return ones if value else self.length - ones
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return BitArray.from01(self.to01()[index])
+        index = as_index(index)
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError("bit index out of range")
+        return bool(self.data[index >> 3] >> (7 - (index & 7)) & 1)
+
+    def __iter__(self):
+        return map("1".__eq__, self.to01())
+
+    def __eq__(self, other):
+        if not isinstance(other, BitArray):
+            return NotImplemented
+        return self.length == other.length and self.to01() == other.to01()
+
+    def __repr__(self):
+        return f"BitArray('{self.to01()}')"
+
+
 Hex = NewType("Hex", bytes)
 Bin = NewType("Bin", bool)
 # These Greedy types can only be used on the last argument of functions
@@ -24,6 +93,10 @@ GreedyHex = NewType("GreedyHex", bytes)
 GreedyBin = NewType("GreedyBin", List[bool])
 GreedyInt = NewType("GreedyInt", List[int])
 GreedyFloat = NewType("GreedyFloat", List[float])
+# Compact alternatives to GreedyInt, GreedyFloat and GreedyBin for large inputs
+GreedyIntArray = NewType("GreedyIntArray", array)  # array("q"), 64 bit signed
+GreedyFloatArray = NewType("GreedyFloatArray", array)  # array("d")
+GreedyBitArray = NewType("GreedyBitArray", BitArray)
 
 
 def is_greedy(argtype):
@@ -34,57 +107,125 @@ def is_greedy(argtype):
         GreedyBin,
         GreedyInt,
         GreedyFloat,
+        GreedyIntArray,
+        GreedyFloatArray,
+        GreedyBitArray,
     ]
 
 
+# Characters dropped between hex digits and bits, as in "0xde 0xad", "\\xde\\xad"
+# or "0b1 0b0", once the 0x and 0b prefixes are removed
+HEX_SEPARATORS = b"\\x "
+BIN_SEPARATORS = b"\\b "
+HEX_DIGITS = b"0123456789abcdef"
+
+
+def _ascii(value, message):
+    try:
+        return value.encode("ascii")
+    except UnicodeEncodeError:
+        raise AssertionError(message) from None
+
+
+def _without_prefix(data, prefix):
+    """Lowercase data and remove each prefix, skipping replace when there are none"""
+    data = data.lower()
+    if prefix[1:] in data:  # much faster than replace when there is no match
+        data = data.replace(prefix, b"")
+    return data
+
+
+def _to_hex(value, name):
+    """Decode hex text with C-level passes over the whole string, for large pastes"""
+    message = f"{name} must be hex characters"
+    data = _without_prefix(_ascii(value, message), b"0x")
+    raw_hex = data.translate(None, HEX_SEPARATORS)
+    assert data, message
+    if len(raw_hex) % 2:
+        assert not raw_hex.translate(None, HEX_DIGITS), message
+        raise AssertionError(f"{name} must be an even number of hex characters")
+    try:
+        return binascii.unhexlify(raw_hex)
+    except binascii.Error:
+        raise AssertionError(message) from None
+
+
+def _to_int_list(value):
+    return [int(digit) for digit in value.split()]
+
+
+def _to_float_list(value):
+    return [float(decimal) for decimal in value.split()]
+
+
+def _to_int_array(value):
+    # array reads the ints from map in C, with no list of ints in between
+    return array("q", map(int, value.split()))
+
+
+def _to_float_array(value):
+    return array("d", map(float, value.split()))
+
+
+def _bin_digits(value, name):
+    """Return the bytes of 0 and 1 in bit text, with prefixes and separators dropped"""
+    message = f"{name} must be sequence of 1s and 0s"
+    data = _without_prefix(_ascii(value, message), b"0b")
+    digits = data.translate(None, BIN_SEPARATORS)
+    assert data and not digits.translate(None, b"01"), message
+    return digits
+
+
+def _to_bin(value, name):
+    return list(map(ord("1").__eq__, _bin_digits(value, name)))
+
+
+def _to_bit_array(value, name):
+    return BitArray.from01(_bin_digits(value, name))
+
+
+def _not_implemented(value):
+    raise AssertionError("type not implimented yet")
+
+
+# argument type -> function converting the argument string to that type
+CONVERTERS = {
+    str: str,
+    int: int,
+    float: float,
+    GreedyStr: str,
+    GreedyBytes: str,
+    GreedyInt: _to_int_list,
+    List[int]: _to_int_list,
+    GreedyFloat: _to_float_list,
+    List[float]: _to_float_list,
+    GreedyIntArray: _to_int_array,
+    GreedyFloatArray: _to_float_array,
+}
+# argument type -> function also taking the argument name, for error messages
+NAMED_CONVERTERS = {
+    Hex: _to_hex,
+    GreedyHex: _to_hex,
+    GreedyBin: _to_bin,
+    List[Bin]: _to_bin,
+    GreedyBitArray: _to_bit_array,
+}
+
+
+def converter(argtype, name):
+    """
+    Return a function converting an argument string to argtype
+
+    Built once when a command is registered, so converting each argument of a
+    command call is a single function call.
+    """
+    try:
+        if argtype in NAMED_CONVERTERS:
+            return partial(NAMED_CONVERTERS[argtype], name=name)
+        return CONVERTERS.get(argtype, _not_implemented)
+    except TypeError:  # unhashable annotation
+        return _not_implemented
+
+
 def to_type(value, kwarg):
-    if kwarg.type == str:
-        return value
-
-    elif kwarg.type == int:
-        assert value.isdigit, f"{kwarg.name} must be an digit"
-        return int(value)
-
-    elif kwarg.type == float:
-        assert value.isdecimal, f"{kwarg.name} must be an decimal"
-        return float(value)
-
-    elif kwarg.type == GreedyStr:
-        return value
-
-    elif kwarg.type == GreedyBytes:
-        return value
-
-    elif kwarg.type == GreedyHex or kwarg.type == Hex:
-        data = value.lower().replace("0x", "")
-        if re.match("^[0123456789abcdef\\\\x ]+$", data):
-            raw_hex = re.sub("[\\\\x ]", "", data)
-            if len(raw_hex) % 2 == 0:
-                return bytes.fromhex(raw_hex)
-        else:
-            raise AssertionError(f"{kwarg.name} must be hex characters")
-
-    elif kwarg.type == GreedyInt or kwarg.type == List[int]:
-        list_int = []
-        for digit in value.split():
-            assert digit.isdigit, f"{kwarg.name} must a sequence of digits"
-            list_int.append(int(digit))
-        return list_int
-
-    elif kwarg.type == GreedyFloat or kwarg.type == List[float]:
-        list_float = []
-        for decimal in value.split():
-            assert decimal.isdecimal, f"{kwarg.name} must a sequence of decimals"
-            list_float.append(float(decimal))
-        return list_float
-
-    elif kwarg.type == GreedyBin or kwarg.type == List[Bin]:
-        data = value.lower().replace("0b", "")
-        if re.match("^[01\\\\b ]+$", data):
-            raw_bin = re.sub("[\\\\b ]", "", data)
-            return [False if bit == "0" else True for bit in raw_bin]
-        else:
-            raise AssertionError(f"{kwarg.name} must be sequence of 1s and 0s")
-
-    else:
-        raise AssertionError("type not implimented yet")
+    return converter(kwarg.type, kwarg.name)(value)
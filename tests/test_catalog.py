@@ -0,0 +1,108 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from ctui.catalog import ProjectCatalog
+from ctui.database import open_database
+
+
+class ProjectCatalogTests(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+        self.path = Path(self.folder.name)
+        self.catalog = ProjectCatalog(self.path, ".MyApp")
+        self.catalog.racy_window = 0
+        self.stamp = 10**18  # distinct folder mtimes, in nanoseconds
+
+    def make_project(self, name, backend="tinydb", history=1, storage=0):
+        db = open_database(self.path / f"{name}.MyApp", backend)
+        db.table("history").insert_multiple([{"Command": "a"}] * history)
+        db.table("storage").insert_multiple([{"a": 1}] * storage)
+        db.close()
+        self.stamp += 10**9
+        os.utime(self.path, ns=(self.stamp, self.stamp))
+
+    def test_projects_and_counts(self):
+        self.make_project("one", history=2, storage=3)
+        self.make_project("two", backend="sqlite", history=1)
+        (self.path / "notes.txt").write_text("not a project")
+        projects = self.catalog.projects()
+        self.assertEqual(sorted(projects), ["one", "two"])
+        self.assertEqual(projects["one"]["counts"], {"history": 2, "storage": 3})
+        self.assertEqual(projects["two"]["counts"]["history"], 1)
+        self.assertEqual(
+            projects["one"]["size"], (self.path / "one.MyApp").stat().st_size
+        )
+        self.assertEqual(self.catalog.names(), ["one", "two"])
+
+    def test_counts_are_cached_until_folder_changes(self):
+        self.make_project("one")
+        self.catalog.projects()
+        with mock.patch("ctui.catalog.count_documents") as count:
+            self.assertEqual(sorted(self.catalog.projects()), ["one"])
+            count.assert_not_called()
+            # a fresh catalog reads the counts back from the catalog file
+            self.assertEqual(
+                ProjectCatalog(self.path, ".MyApp").projects()["one"]["counts"],
+                {"history": 1},
+            )
+            count.assert_not_called()
+
+        self.make_project("two")
+        (self.path / "one.MyApp").unlink()
+        self.assertEqual(self.catalog.names(), ["two"])
+        self.assertEqual(sorted(self.catalog.projects()), ["two"])
+
+    def test_touch_counts_project_again(self):
+        self.make_project("one")
+        self.catalog.projects()
+        db = open_database(self.path / "one.MyApp", "tinydb")
+        db.table("history").insert({"Command": "b"})
+        db.close()
+        self.catalog.touch("one")
+        self.assertEqual(self.catalog.projects()["one"]["counts"], {"history": 2})
+
+    def test_file_changed_in_place_is_counted_again(self):
+        self.make_project("one")
+        self.assertEqual(self.catalog.projects()["one"]["counts"], {"history": 1})
+        folder_mtime = self.path.stat().st_mtime_ns
+        db = open_database(self.path / "one.MyApp", "tinydb")
+        db.table("history").insert({"Command": "b"})
+        db.close()  # by another process, so without touch
+        os.utime(self.path, ns=(folder_mtime, folder_mtime))
+        self.assertEqual(self.catalog.projects()["one"]["counts"], {"history": 2})
+
+    def test_catalog_is_replaced_once_per_change(self):
+        self.catalog.racy_window = ProjectCatalog.racy_window
+        self.make_project("one")
+        with mock.patch.object(
+            ProjectCatalog, "_write", autospec=True, side_effect=ProjectCatalog._write
+        ) as write:
+            for _ in range(3):
+                self.assertEqual(self.catalog.names(), ["one"])
+                self.catalog.projects()
+        self.assertEqual(write.call_count, 2)  # the new project, then its counts
+        self.assertEqual(
+            sorted(path.name for path in self.path.iterdir()),
+            [".catalog.json", "one.MyApp"],
+        )
+
+    def test_recent_folder_change_is_scanned_again(self):
+        self.catalog.racy_window = 10**18
+        self.make_project("one")
+        self.assertEqual(self.catalog.names(), ["one"])
+        self.make_project("two")
+        os.utime(self.path, ns=(self.stamp - 10**9, self.stamp - 10**9))
+        self.assertEqual(self.catalog.names(), ["one", "two"])
+
+    def test_invalid_and_missing_folder(self):
+        self.assertEqual(ProjectCatalog(self.path / "none", ".MyApp").names(), [])
+        (self.path / "bad.MyApp").write_text('{"history": ')
+        self.assertEqual(self.catalog.projects()["bad"]["counts"], {})
+
+
+if __name__ == "__main__":
+    unittest.main()
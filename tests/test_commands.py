@@ -0,0 +1,227 @@
+import asyncio
+import socket
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from ctui.commands import Command, Commands, CommandTimeout
+from ctui.profiling import CommandTimings
+from ctui.types import GreedyBin, GreedyStr, Hex
+
+
+def make_command(name, func=None):
+    def default(address: int = 0):
+        pass
+
+    func = func or default
+    func.__name__ = name
+    func.__doc__ = f"{name} help\n\n:PARAM address: Register address"
+    return func
+
+
+class ExtractTests(unittest.TestCase):
+    def setUp(self):
+        self.commands = Commands()
+        for name in ["do_reg", "do_reg_read", "do_reg_read_all", "do_other"]:
+            self.commands.register(make_command(name))
+
+    def test_longest_command_wins(self):
+        command, kwargs = self.commands.extract("reg read all")
+        self.assertEqual(command.string, "reg read all")
+        self.assertEqual(kwargs, {})
+
+    def test_arguments_follow_longest_match(self):
+        command, kwargs = self.commands.extract("reg  read   12")
+        self.assertEqual(command.string, "reg read")
+        self.assertEqual(kwargs, {"address": 12})
+
+    def test_falls_back_to_shorter_command(self):
+        command, kwargs = self.commands.extract("reg 7")
+        self.assertEqual(command.string, "reg")
+        self.assertEqual(kwargs, {"address": 7})
+
+    def test_unknown_command(self):
+        self.assertEqual(self.commands.extract("nope 1"), (None, None))
+        self.assertEqual(self.commands.extract(""), (None, None))
+
+
+class ParseArgsTests(unittest.TestCase):
+    def parse(self, func, text):
+        func.__doc__ = "help"
+        return Command(func).parse_args(text)
+
+    def test_converters_are_built_at_registration(self):
+        def do_write(address: int, data: Hex, values: List[int]):
+            pass
+
+        command = Command(make_command("do_write", do_write))
+        self.assertIs(command.kwargs[0].convert, int)
+        self.assertEqual(
+            command.parse_args('7 "0xde ad" "1 2"'),
+            {"address": 7, "data": b"\xde\xad", "values": [1, 2]},
+        )
+
+    def test_greedy_arguments(self):
+        def do_say(count: float, words: GreedyStr):
+            pass
+
+        def do_bits(bits: GreedyBin):
+            pass
+
+        self.assertEqual(
+            self.parse(do_say, '1.5 "hello there"'),
+            {"count": 1.5, "words": "hello there"},
+        )
+        self.assertEqual(
+            self.parse(do_bits, '"0b1 0 1"'), {"bits": [True, False, True]}
+        )
+
+    def test_greedy_argument_of_unquoted_words(self):
+        def do_say(count: float, words: GreedyStr):
+            pass
+
+        def do_echo(words: GreedyStr = ""):
+            pass
+
+        self.assertEqual(
+            self.parse(do_say, "2 hello  there"), {"count": 2.0, "words": "hello there"}
+        )
+        self.assertEqual(
+            self.parse(do_say, "2 hello"), {"count": 2.0, "words": "hello"}
+        )
+        self.assertEqual(self.parse(do_echo, "a b c"), {"words": "a b c"})
+        self.assertEqual(self.parse(do_echo, ""), {})
+
+    def test_hex_and_bin_formats(self):
+        def do_write(data: Hex):
+            pass
+
+        def do_bits(bits: GreedyBin):
+            pass
+
+        for text in ['"0xDE 0xad"', "'\\xde\\xAD'", "dead", '"de ad"']:
+            self.assertEqual(self.parse(do_write, text), {"data": b"\xde\xad"})
+        self.assertEqual(
+            self.parse(do_bits, '"0b1 0B0 11"'), {"bits": [True, False, True, True]}
+        )
+
+    def test_conversion_errors(self):
+        def do_write(data: Hex):
+            pass
+
+        def do_untyped(value):
+            pass
+
+        with self.assertRaisesRegex(AssertionError, "data must be hex characters"):
+            self.parse(do_write, "xyz")
+        with self.assertRaisesRegex(AssertionError, "even number of hex characters"):
+            self.parse(do_write, "abc")
+        with self.assertRaisesRegex(AssertionError, "type not implimented yet"):
+            self.parse(do_untyped, "1")
+
+
+class ExecuteAsyncTests(unittest.TestCase):
+    def test_async_command_is_non_blocking(self):
+        async def do_wait():
+            await asyncio.sleep(0)
+            return "done"
+
+        command = Command(make_command("do_wait", do_wait))
+        self.assertFalse(command.blocking)
+        self.assertEqual(asyncio.run(command.execute_async()), "done")
+
+    def test_threaded_command_runs_off_the_event_loop(self):
+        def do_where():
+            return threading.current_thread() is threading.main_thread()
+
+        command = Command(make_command("do_where", do_where), thread=True)
+        self.assertFalse(command.blocking)
+        self.assertFalse(asyncio.run(command.execute_async()))
+
+    def test_timeout_implies_thread_and_cancels(self):
+        def do_sleep():
+            time.sleep(0.2)
+
+        command = Command(make_command("do_sleep", do_sleep), timeout=0.01)
+        self.assertTrue(command.thread)
+        with self.assertRaisesRegex(CommandTimeout, "after 0.01s"):
+            asyncio.run(command.execute_async())
+
+    def test_timeouts_raised_by_the_command_are_its_errors(self):
+        def do_read():
+            raise socket.timeout("no reply")
+
+        async def do_aread():
+            raise asyncio.TimeoutError()
+
+        for func in [do_read, do_aread]:
+            command = Command(make_command(func.__name__, func), timeout=5)
+            with self.assertRaises((socket.timeout, asyncio.TimeoutError)) as caught:
+                asyncio.run(command.execute_async())
+            self.assertNotIsInstance(caught.exception, CommandTimeout)
+
+    def test_threaded_command_is_timed_from_its_dispatch(self):
+        def do_nothing():
+            pass
+
+        async def run(command):
+            executor = ThreadPoolExecutor(1)
+            asyncio.get_running_loop().set_default_executor(executor)
+            executor.shutdown()  # so handing the command to a thread fails
+            await command.execute_async()
+
+        command = Command(
+            make_command("do_nothing", do_nothing),
+            thread=True,
+            timings=CommandTimings(),
+        )
+        with self.assertRaises(RuntimeError):
+            asyncio.run(run(command))
+        self.assertEqual([run.error for run in command.timings.runs], ["RuntimeError"])
+
+    def test_generator_chunks_are_streamed(self):
+        def do_count(count: int):
+            for number in range(count):
+                yield f"{number}\n"
+
+        async def do_acount(count: int):
+            for number in range(count):
+                yield number
+
+        for func, expected in [(do_count, "0\n1\n2\n"), (do_acount, "012")]:
+            command = Command(make_command(func.__name__, func))
+            self.assertFalse(command.blocking)
+            chunks = []
+            asyncio.run(command.stream(chunks.append, count=3))
+            self.assertEqual("".join(chunks), expected)
+
+    def test_threaded_generator_stops_when_cancelled(self):
+        produced = []
+
+        def do_forever():
+            while True:
+                produced.append(None)
+                time.sleep(0.01)
+                yield "x"
+
+        async def cancel_soon(command):
+            task = asyncio.ensure_future(command.stream(lambda chunk: None))
+            await asyncio.sleep(0.05)
+            task.cancel()
+            await asyncio.sleep(0.05)
+
+        command = Command(make_command("do_forever", do_forever), thread=True)
+        asyncio.run(cancel_soon(command))
+        count = len(produced)
+        time.sleep(0.05)
+        self.assertEqual(len(produced), count)
+
+    def test_regular_command_blocks(self):
+        command = Command(make_command("do_plain"))
+        self.assertTrue(command.blocking)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+
+from prompt_toolkit.completion import CompleteEvent
+from prompt_toolkit.document import Document
+
+from ctui.commands import Commands
+from ctui.completion import CommandCompleter
+
+
+def make_command(name, desc):
+    def func():
+        pass
+
+    func.__name__ = name
+    func.__doc__ = desc
+    return func
+
+
+class CommandCompleterTests(unittest.TestCase):
+    def setUp(self):
+        self.commands = Commands()
+        for name in ["do_history", "do_history_clear", "do_history_search", "do_help"]:
+            self.commands.register(make_command(name, f"{name} help"))
+        self.completer = CommandCompleter(self.commands)
+
+    def complete(self, text):
+        completions = self.completer.get_completions(Document(text), CompleteEvent())
+        return [(c.text, c.start_position, c.display_text) for c in completions]
+
+    def test_partial_first_word(self):
+        self.assertEqual(
+            self.complete("h"), [("help", -1, "help"), ("history", -1, "history")]
+        )
+
+    def test_exact_word_suggests_enter(self):
+        self.assertEqual(self.complete("help"), [("", 0, "<enter>")])
+
+    def test_next_words_after_space(self):
+        self.assertEqual(
+            self.complete("history "),
+            [("", 0, "<enter>"), ("clear", 0, "clear"), ("search", 0, "search")],
+        )
+
+    def test_partial_second_word(self):
+        self.assertEqual(self.complete("history  s"), [("search", -1, "search")])
+
+    def test_unknown_words_and_empty_text(self):
+        self.assertEqual(self.complete("nope "), [])
+        self.assertEqual(self.complete(""), [])
+
+    def test_argument_values(self):
+        def do_history_load(name: str, count: int):
+            """
+            Load history
+
+            :PARAM name: Name to load
+            :PARAM count: How many
+            """
+
+        self.commands.register(
+            do_history_load, complete={"name": lambda: ["alpha", "beta", "bravo"]}
+        )
+        self.assertEqual(
+            self.complete("history load b"),
+            [("beta", -1, "beta"), ("bravo", -1, "bravo")],
+        )
+        self.assertEqual(
+            [text for text, _, _ in self.complete("history load ")][1:],
+            ["alpha", "beta", "bravo"],
+        )
+        self.assertEqual(self.complete("history load beta"), [])
+        self.assertEqual(self.complete("history load beta "), [])
+
+    def test_reregistered_command_replaces_trie_entry(self):
+        self.commands.register(make_command("do_help", "new help"))
+        node = self.commands.trie.find(["help"])
+        self.assertIs(node.command, self.commands["help"])
+        self.assertEqual(node.desc, "new help")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,203 @@
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+from tinydb import Query, TinyDB
+
+from ctui.database import (
+    SQLiteDB,
+    check_project_file,
+    convert_database,
+    copy_project_file,
+    detect_backend,
+    open_database,
+    open_memory_database,
+    save_database,
+)
+
+
+class SQLiteDBTests(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.path = Path(self.folder.name) / "project.MyApp"
+        self.db = open_database(self.path, "sqlite")
+        self.table = self.db.table("storage")
+
+    def tearDown(self):
+        self.db.close()
+        self.folder.cleanup()
+
+    def test_insert_and_read(self):
+        self.assertEqual(self.table.insert({"a": 1}), 1)
+        self.assertEqual(self.table.insert_multiple([{"a": 2}, {"a": 3}]), [2, 3])
+        self.assertEqual(len(self.table), 3)
+        self.assertEqual([doc["a"] for doc in self.table.all()], [1, 2, 3])
+        self.assertEqual(self.table.get(doc_id=2), {"a": 2})
+        self.assertEqual(self.table.get(doc_id=2).doc_id, 2)
+        self.assertEqual(self.db.tables(), {"storage"})
+
+    def test_tinydb_queries(self):
+        Item = Query()
+        self.table.insert_multiple([{"a": 1}, {"a": 2}, {"a": 3}])
+        self.assertEqual(self.table.search(Item.a > 1), [{"a": 2}, {"a": 3}])
+        self.assertEqual(self.table.count(Item.a > 1), 2)
+        self.assertEqual(self.table.update({"b": True}, Item.a == 2), [2])
+        self.assertEqual(self.table.get(Item.b == True), {"a": 2, "b": True})
+        self.assertEqual(self.table.upsert({"a": 4}, Item.a == 4), [4])
+        self.assertEqual(self.table.remove(Item.a < 3), [1, 2])
+        self.assertEqual(len(self.table), 2)
+        self.table.truncate()
+        self.assertEqual(self.table.all(), [])
+
+    def test_threads_share_the_connection(self):
+        def insert():
+            for number in range(50):
+                self.table.insert({"n": number})
+                self.assertGreater(len(list(reversed(self.table))), 0)
+
+        threads = [threading.Thread(target=insert) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(self.table), 200)
+        self.assertEqual([doc.doc_id for doc in self.table], list(range(1, 201)))
+
+    def test_detect_and_reopen(self):
+        self.table.insert({"a": 1})
+        self.db.close()
+        self.assertEqual(detect_backend(self.path), "sqlite")
+        self.db = open_database(self.path, "tinydb")
+        self.assertIsInstance(self.db, SQLiteDB)
+        self.assertEqual(self.db.table("storage").all(), [{"a": 1}])
+
+
+class ConvertDatabaseTests(unittest.TestCase):
+    def test_round_trip_keeps_documents_and_ids(self):
+        with tempfile.TemporaryDirectory() as folder:
+            tinydb_path = Path(folder) / "a.MyApp"
+            sqlite_path = Path(folder) / "b.MyApp"
+            back_path = Path(folder) / "c.MyApp"
+            db = TinyDB(tinydb_path)
+            db.table("history").insert_multiple([{"Command": "a"}, {"Command": "b"}])
+            db.table("history").remove(doc_ids=[1])
+            db.table("settings").insert({"x": 1})
+            db.close()
+
+            convert_database(tinydb_path, sqlite_path, "sqlite")
+            self.assertEqual(detect_backend(sqlite_path), "sqlite")
+            convert_database(sqlite_path, back_path, "tinydb")
+            self.assertEqual(detect_backend(back_path), "tinydb")
+
+            db = open_database(back_path)
+            self.assertEqual(db.table("history").get(doc_id=2), {"Command": "b"})
+            self.assertEqual(db.table("settings").all(), [{"x": 1}])
+            db.close()
+
+    def test_convert_in_place(self):
+        with tempfile.TemporaryDirectory() as folder:
+            path = Path(folder) / "a.MyApp"
+            db = open_database(path, "sqlite")
+            db.table("history").insert({"Command": "a"})
+            db.close()
+            for backend in ["tinydb", "sqlite"]:
+                convert_database(path, path, backend)
+                self.assertEqual(detect_backend(path), backend)
+                self.assertEqual(list(Path(folder).iterdir()), [path])
+            db = open_database(path)
+            self.assertEqual(db.table("history").all(), [{"Command": "a"}])
+            db.close()
+
+
+class MemoryDatabaseTests(unittest.TestCase):
+    def test_save_writes_file_with_same_backend(self):
+        with tempfile.TemporaryDirectory() as folder:
+            for backend in ["tinydb", "sqlite"]:
+                path = Path(folder) / f"{backend}.MyApp"
+                db = open_memory_database(backend)
+                db.table("history").insert_multiple([{"Command": "a"}, {"n": 2}])
+                save_database(db, path)
+                db.close()
+                self.assertEqual(detect_backend(path), backend)
+                db = open_database(path)
+                self.assertEqual(db.table("history").get(doc_id=2), {"n": 2})
+                db.close()
+
+
+class CopyProjectFileTests(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+        self.source = Path(self.folder.name) / "source.MyApp"
+        self.destination = Path(self.folder.name) / "destination.MyApp"
+
+    def test_copy_replaces_destination_and_its_log(self):
+        db = open_database(self.source, "sqlite")
+        db.table("history").insert({"Command": "a"})
+        db.close()
+        self.destination.write_text("old")
+        Path(f"{self.destination}-wal").write_text("stale log")
+        copy_project_file(self.source, self.destination)
+        self.assertEqual(self.destination.read_bytes(), self.source.read_bytes())
+        self.assertEqual(
+            sorted(path.name for path in Path(self.folder.name).iterdir()),
+            ["destination.MyApp", "source.MyApp"],
+        )
+
+    def test_failed_copy_keeps_destination(self):
+        self.destination.write_text("old")
+        with self.assertRaises(FileNotFoundError):
+            copy_project_file(self.source, self.destination)
+        self.assertEqual(self.destination.read_text(), "old")
+        self.assertEqual(list(Path(self.folder.name).iterdir()), [self.destination])
+
+
+class CheckProjectFileTests(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+        self.path = Path(self.folder.name) / "project.MyApp"
+
+    def check(self, text, chunk_size=3):
+        self.path.write_text(text, encoding="utf-8")
+        return list(check_project_file(self.path, chunk_size))
+
+    def test_valid_files(self):
+        for backend in ["tinydb", "sqlite"]:
+            db = open_memory_database(backend)
+            db.table("history").insert_multiple([{"Command": "é"}, {"n": [1.5, None]}])
+            db.table("settings").insert({"a": True})
+            save_database(db, self.path)
+            checked = list(check_project_file(self.path, chunk_size=5))
+            self.assertEqual(checked[-1], self.path.stat().st_size)
+        self.assertEqual(self.check(""), [0])
+        self.assertEqual(self.check('{"_default": {}}'), [16])
+
+    def test_corrupt_files(self):
+        problems = {
+            '{"history": {"1": {"Command": "a"}}': "Expecting ',' or '}'",
+            '{"history": {"1": {"Command": "a}}}': "Unterminated string",
+            '{"history": {"1": {"a": tru}}}': "Expecting value",
+            '{"history": {"a": {}}}': "Invalid document ID",
+            '{"history": {"1": []}}': "not an object",
+            '{"history": []}': "Expecting '{'",
+            '{"history": {}} {}': "Unexpected data",
+            "not json": "Not a project file",
+        }
+        for text, problem in problems.items():
+            with self.assertRaises(ValueError) as context:
+                self.check(text)
+            self.assertIn(problem, str(context.exception))
+
+    def test_corrupt_sqlite_file(self):
+        db = open_database(self.path, "sqlite")
+        db.table("history").insert({"Command": "a"})
+        db.close()
+        self.path.write_bytes(self.path.read_bytes()[:1000])
+        with self.assertRaises(ValueError):
+            list(check_project_file(self.path))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import asyncio
+import unittest
+
+from prompt_toolkit.application import Application
+from prompt_toolkit.application.current import set_app
+from prompt_toolkit.layout import Layout
+from prompt_toolkit.layout.containers import to_container
+from prompt_toolkit.layout.mouse_handlers import MouseHandlers
+from prompt_toolkit.layout.screen import Screen, WritePosition
+from prompt_toolkit.output import DummyOutput
+
+from ctui.dialogs import MessageDialog, PagedMessageDialog
+
+WIDTH = 60
+HEIGHT = 20
+
+
+class DialogRenderTests(unittest.TestCase):
+    def render(self, dialog):
+        screen = Screen()
+        to_container(dialog).write_to_screen(
+            screen, MouseHandlers(), WritePosition(0, 0, WIDTH, HEIGHT), "", True, None
+        )
+        return [
+            "".join(screen.data_buffer[y][x].char for x in range(WIDTH))
+            for y in range(HEIGHT)
+        ]
+
+    def show(self, make_dialog, check):
+        async def run():
+            dialog = make_dialog()
+            app = Application(layout=Layout(to_container(dialog)), output=DummyOutput())
+            with set_app(app):
+                app.layout.focus(dialog)
+                check(dialog, app.layout.current_window)
+
+        asyncio.run(run())
+
+    def test_long_text_renders_visible_lines_only(self):
+        text = "\n".join(f"line {number}" for number in range(100000))
+
+        def check(dialog, window):
+            pager = dialog.text_area.control
+            self.assertIs(window, dialog.text_area.window)
+            self.assertIn("line 0", self.render(dialog)[2])
+            self.assertLess(len(pager.index.starts) + len(pager.index.tail), 1000)
+
+            pager.scroll(window, 5000)
+            self.assertIn("line 5000", self.render(dialog)[2])
+            pager.scroll(window, 100000)
+            screen = "\n".join(self.render(dialog))
+            self.assertIn("line 99999", screen)
+            self.assertNotIn("line 99980", screen)
+            pager.scroll(window, -100000)
+            self.assertIn("line 0", self.render(dialog)[2])
+
+        self.show(lambda: MessageDialog(title="Long", text=text), check)
+
+    def test_scrollbar_argument_overrides_text_length(self):
+        long_text = "\n".join(f"line {number}" for number in range(100))
+        cases = [("short", None, False), ("short", True, True)]
+        cases += [(long_text, None, True), (long_text, False, False)]
+        for text, scrollbar, shown in cases:
+
+            def check(dialog, window):
+                screen = "\n".join(self.render(dialog))
+                self.assertEqual("^" in screen, shown, (text[:5], scrollbar))
+
+            self.show(lambda: MessageDialog(text=text, scrollbar=scrollbar), check)
+
+    def test_more_appends_next_page(self):
+        pages = ["\n".join(f"{page}.{row}" for row in range(30)) for page in "ab"]
+
+        def check(dialog, window):
+            self.render(dialog)
+            dialog.more_button.handler()
+            self.assertIn("b.0", self.render(dialog)[2])
+            self.assertEqual(dialog.text_area.text, "\n".join(pages))
+
+        self.show(lambda: PagedMessageDialog(title="Pages", pages=pages), check)
+
+
+if __name__ == "__main__":
+    unittest.main()
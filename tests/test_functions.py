@@ -0,0 +1,55 @@
+import unittest
+from itertools import count, islice
+
+from ctui.functions import table_lines, table_pages
+
+
+class TableLinesTests(unittest.TestCase):
+    def test_matches_tabulate_when_sample_covers_rows(self):
+        rows = [
+            {"Project": "a", "Size": 1.25, "History": 10, "Note": None},
+            {"Project": "bbbbbbb", "Size": -1234.5, "History": 3, "Note": "x"},
+            {"Project": "c", "Size": 7, "History": 12345, "Note": ""},
+        ]
+        # as tabulate(rows, headers="keys", tablefmt="simple", floatfmt=".1f")
+        self.assertEqual(
+            list(table_lines(rows, headers="keys", floatfmt=".1f")),
+            [
+                "Project       Size    History  Note",
+                "---------  -------  ---------  ------",
+                "a              1.2         10",
+                "bbbbbbb    -1234.5          3  x",
+                "c              7.0      12345",
+            ],
+        )
+        plain = [("help", "Print help"), ("history", "Print history")]
+        # as tabulate(plain, tablefmt="plain")
+        self.assertEqual(
+            list(table_lines(plain)), ["help     Print help", "history  Print history"]
+        )
+        self.assertEqual(list(table_lines([], headers="keys")), [])
+
+    def test_rows_are_read_lazily(self):
+        rows = ({"Number": number, "Text": f"row {number}"} for number in count())
+        lines = list(islice(table_lines(rows, headers="keys", sample=5), 12))
+        self.assertEqual(lines[:2], ["  Number  Text", "--------  ------"])
+        self.assertEqual(lines[11], "       9  row 9")
+        # cells wider than the sample are kept whole
+        self.assertEqual(
+            list(table_lines([("a", 1), ("long cell", 2)], sample=1)),
+            ["a  1", "long cell  2"],
+        )
+
+    def test_declared_widths_and_pages(self):
+        rows = [(number, "x" * number) for number in range(5)]
+        pages = list(
+            table_pages(rows, 2, headers=["N", "Text"], widths=[3, 4], sample=0)
+        )
+        self.assertEqual(
+            pages,
+            ["N    Text\n---  ----", "0\n1    x", "2    xx\n3    xxx", "4    xxxx"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
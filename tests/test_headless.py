@@ -0,0 +1,158 @@
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from ctui.application import Ctui
+from ctui.database import database_backend
+
+
+class HeadlessTests(unittest.TestCase):
+    def setUp(self):
+        self.home = tempfile.TemporaryDirectory()
+        patcher = mock.patch.dict(os.environ, {"HOME": self.home.name})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.home.cleanup)
+        self.app = Ctui()
+
+        @self.app.command
+        def do_hello(name: str):
+            """Say hello"""
+            self.app.append_output(f"hello {name}\n")
+
+        @self.app.command
+        def do_count(count: int):
+            """Count up"""
+            for number in range(count):
+                yield f"{number}\n"
+
+    def tearDown(self):
+        if self.app._mode == "headless":
+            self.app._close_db()
+
+    def test_execute_collects_output_and_history(self):
+        result = self.app.execute("hello bob")
+        self.assertTrue(result.ok)
+        self.assertEqual(result.output, "hello bob\n")
+        self.assertEqual(self.app.execute("count 2").output, "0\n1\n")
+        self.assertEqual(self.app.output_text, "hello bob\n0\n1\n")
+        commands = [record["Command"] for record in self.app.history.all()]
+        self.assertEqual(commands, ["hello bob", "count 2"])
+
+    def test_history_of_execute_is_kept(self):
+        self.app.execute("project saveas kept")
+        for name in ["a", "b", "c"]:
+            self.app.execute(f"hello {name}")
+        other = Ctui()  # sees the project as it is on disk
+        self.assertTrue(other.execute("project load kept").ok)
+        commands = [record["Command"] for record in other.history.all()]
+        self.assertEqual(commands[1:4], ["hello a", "hello b", "hello c"])
+        other.close()
+        self.app.close()
+        self.assertIsNone(self.app._mode)
+        self.app.close()  # already closed
+
+    def test_errors_are_results(self):
+        self.assertEqual(self.app.execute("nope").error, 'Unknown command "nope"')
+        self.assertIn("Wrong number of arguments", self.app.execute("hello a b").error)
+        self.assertEqual(len(self.app.history), 0)
+
+    def test_dialogs_are_logged(self):
+        self.app.execute("hello bob")
+        result = self.app.execute("history")
+        self.assertEqual(result.dialogs[0]["title"], "History")
+        self.assertIn("hello bob", result.dialogs[0]["text"])
+
+    def test_project_list_counts_records(self):
+        self.app.execute("hello bob")
+        self.app.execute("project saveas first")
+        self.app.execute("hello amy")
+        self.app.execute("project load first")  # recorded in first as it loads
+        lines = self.app.execute("project list").dialogs[0]["text"].splitlines()
+        self.assertEqual(
+            lines[0].split(),
+            ["Project", "Size", "(KB)", "Modified", "History", "Storage"],
+        )
+        self.assertEqual(lines[2].split()[0], "first")
+        self.assertEqual(lines[2].split()[-2:], ["4", "0"])
+
+    def test_project_list_counts_open_project(self):
+        for backend in ["tinydb", "sqlite"]:
+            app = Ctui()
+            app.project_backend = backend
+            script = f"project saveas {backend}\nproject list\nproject list\n"
+            results = app.run_headless(io.StringIO(script))
+            rows = results[-1].dialogs[0]["text"].splitlines()[2:]
+            counts = {row.split()[0]: row.split()[-2:] for row in rows}
+            self.assertEqual(counts[backend], ["2", "0"], backend)
+
+    def test_yes_no_dialogs_follow_assume_yes(self):
+        self.app.execute("project saveas other")
+        self.app.execute("project saveas spare")
+        result = self.app.execute("project delete other")
+        self.assertEqual(result.dialogs[0]["answer"], False)
+        self.assertTrue(os.path.isfile(self.app.project_folder + "other.MyApp"))
+        self.app.headless_assume_yes = True
+        self.app.execute("project delete other")
+        self.assertFalse(os.path.isfile(self.app.project_folder + "other.MyApp"))
+
+    def test_default_project_is_saved_only_on_request(self):
+        self.app.execute("hello bob")
+        self.assertFalse(os.path.exists(self.app.project_folder))
+        self.assertTrue(self.app.execute("project saveas kept").ok)
+        self.assertEqual(self.app.project_name, "kept")
+        commands = [record["Command"] for record in self.app.history.all()]
+        self.assertEqual(commands, ["hello bob", "project saveas kept"])
+        self.assertFalse(self.app.execute("project saveas default").ok)
+
+    def test_default_project_can_be_loaded_again(self):
+        self.app.execute("hello bob")
+        self.app.execute("project saveas kept")
+        self.app.execute("project load default")
+        self.assertTrue(self.app._in_memory)
+        commands = [record["Command"] for record in self.app.history.all()]
+        self.assertEqual(commands, ["hello bob", "project load default"])
+
+    def test_import_checks_file_first(self):
+        self.app.execute("hello bob")
+        self.app.execute(f"project export {self.home.name}/good")
+        corrupt = os.path.join(self.home.name, "bad.MyApp")
+        with open(corrupt, "w") as f:
+            f.write('{"history": {"1": {"Command": "a"}')
+        result = self.app.execute(f"project import {corrupt}")
+        self.assertIn("Invalid or corrupted project file", result.error)
+        self.assertEqual(self.app.project_name, "default")
+        result = self.app.execute(f"project import {self.home.name}/good")
+        self.assertTrue(result.ok)
+        self.assertEqual(self.app.project_name, "good")
+        commands = [record["Command"] for record in self.app.history.all()]
+        self.assertEqual(commands[0], "hello bob")
+
+    def test_convert_replaces_project_file(self):
+        self.app.execute("hello bob")
+        self.app.execute("project saveas converted")
+        for backend in ["sqlite", "tinydb"]:
+            self.assertTrue(self.app.execute(f"project convert {backend}").ok)
+            self.assertEqual(database_backend(self.app.db), backend)
+        commands = [record["Command"] for record in self.app.history.all()]
+        self.assertEqual(commands[0], "hello bob")
+        self.assertEqual(
+            sorted(os.listdir(self.app.project_folder)),
+            ["converted.MyApp"],
+        )
+
+    def test_run_headless_stream(self):
+        output = io.StringIO()
+        script = io.StringIO("# setup\nhello a\n\nhello b\nexit\n")
+        results = self.app.run_headless(script, output=output)
+        self.assertEqual(
+            [result.text for result in results], ["hello a", "hello b", "exit"]
+        )
+        self.assertEqual(output.getvalue(), "hello a\nhello b\n")
+        self.assertIsNone(self.app._mode)
+
+
+if __name__ == "__main__":
+    unittest.main()
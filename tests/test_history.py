@@ -0,0 +1,171 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from tinydb import TinyDB
+from tinydb.storages import MemoryStorage
+
+from ctui.database import open_database
+from ctui.history import HistoryIndex, HistoryJournal
+
+
+class Timer(object):
+    def __init__(self, func):
+        self.func = func
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class HistoryJournalTests(unittest.TestCase):
+    def setUp(self):
+        self.table = TinyDB(storage=MemoryStorage).table("history")
+        self.timers = []
+
+    def schedule(self, delay, func):
+        self.timers.append(Timer(func))
+        return self.timers[-1]
+
+    def journal(self, durability, batch_size=3):
+        return HistoryJournal(
+            self.table, durability, batch_size=batch_size, schedule=self.schedule
+        )
+
+    def test_immediate_writes_each_record(self):
+        history = self.journal("immediate")
+        history.insert({"Command": "a"})
+        self.assertEqual(len(self.table), 1)
+
+    def test_batched_writes_after_batch_size(self):
+        history = self.journal("batched")
+        history.insert({"Command": "a"})
+        history.insert({"Command": "b"})
+        self.assertEqual(len(self.table), 0)
+        self.assertEqual(len(history), 2)
+        history.insert({"Command": "c"})
+        self.assertEqual(len(self.table), 3)
+        self.assertTrue(self.timers[0].cancelled)
+
+    def test_batched_writes_on_timer(self):
+        history = self.journal("batched")
+        history.insert({"Command": "a"})
+        history.insert({"Command": "b"})
+        self.assertEqual(len(self.timers), 1)
+        self.timers[0].func()
+        self.assertEqual([r["Command"] for r in self.table.all()], ["a", "b"])
+
+    def test_exit_only_writes_on_flush(self):
+        history = self.journal("exit", batch_size=1)
+        history.insert({"Command": "a"})
+        history.insert({"Command": "b"})
+        self.assertEqual((len(self.table), self.timers), (0, []))
+        history.flush()
+        self.assertEqual(len(self.table), 2)
+
+    def test_reads_include_pending_records(self):
+        history = self.journal("exit")
+        history.insert({"Command": "a"})
+        self.assertEqual(history.all(), [{"Command": "a"}])
+        history.insert({"Command": "b"})
+        history.truncate()
+        self.assertEqual(list(history), [])
+
+    def test_unknown_durability(self):
+        with self.assertRaises(ValueError):
+            self.journal("sometimes")
+
+
+def record(date, time, command):
+    return {"Date": date, "Time": time, "Command": command}
+
+
+class HistoryIndexTests(unittest.TestCase):
+    def setUp(self):
+        self.index = HistoryIndex(
+            [
+                record("2026-01-01", "08:00:00", "reg 12 read"),
+                record("2026-01-01", "09:30:00", "reg 12 write 0x0f"),
+                record("2026-01-02", "10:00:00", "history"),
+                record("2026-01-03", "11:00:00", "register dump"),
+            ]
+        )
+
+    def commands(self, *args):
+        return [r["Command"] for r in self.index.search(*args)]
+
+    def test_literal_substring_search(self):
+        self.assertEqual(
+            self.commands("reg"), ["reg 12 read", "reg 12 write 0x0f", "register dump"]
+        )
+        self.assertEqual(self.commands("12 w"), ["reg 12 write 0x0f"])
+        self.assertEqual(self.commands("ister du"), ["register dump"])
+        self.assertEqual(self.commands("REG"), [])
+
+    def test_literal_words_inside_and_at_either_end(self):
+        self.assertEqual(self.commands("eg 12 r"), ["reg 12 read"])
+        self.assertEqual(self.commands("2 write 0"), ["reg 12 write 0x0f"])
+        self.assertEqual(self.commands("1 w"), [])
+        self.assertEqual(self.commands("reg 1 "), [])
+        self.index.add(record("2026-01-04", "12:00:00", "reg 1 read"))
+        self.assertEqual(self.commands("reg 1 "), ["reg 1 read"])
+        self.assertEqual(
+            self.commands("g 1"), ["reg 12 read", "reg 12 write 0x0f", "reg 1 read"]
+        )
+
+    def test_regex_search(self):
+        self.assertEqual(
+            self.commands("^reg \\d+"), ["reg 12 read", "reg 12 write 0x0f"]
+        )
+        with self.assertRaises(AssertionError):
+            self.index.search("reg[")
+
+    def test_date_and_time_range(self):
+        self.assertEqual(
+            self.commands("reg", "2026-01-01 09:00"),
+            ["reg 12 write 0x0f", "register dump"],
+        )
+        self.assertEqual(
+            self.commands("reg", None, "2026-01-01"),
+            ["reg 12 read", "reg 12 write 0x0f"],
+        )
+        self.assertEqual(self.commands("", "2026-01-02", "2026-01-02"), ["history"])
+
+    def test_journal_keeps_index_current(self):
+        history = HistoryJournal(TinyDB(storage=MemoryStorage).table("history"))
+        history.insert(record("2026-01-01", "08:00:00", "reg 1 read"))
+        self.assertEqual(len(list(history.find("reg"))), 1)
+        history.insert(record("2026-01-01", "08:00:01", "reg 2 read"))
+        self.assertEqual(len(list(history.find("reg"))), 2)
+        history.truncate()
+        self.assertEqual(list(history.find("reg")), [])
+
+
+class HistoryTailTests(unittest.TestCase):
+    def test_newest_first_with_pending_records(self):
+        with tempfile.TemporaryDirectory() as folder:
+            db = open_database(Path(folder) / "project", "sqlite")
+            history = HistoryJournal(db.table("history"), "exit")
+            history.table.insert_multiple([{"Command": "a"}, {"Command": "b"}])
+            history.insert({"Command": "c"})
+            self.assertEqual([r["Command"] for r in reversed(history)], ["c", "b", "a"])
+            self.assertIsNone(history._index)
+            db.close()
+
+    def test_json_tables_are_read_once_without_indexing(self):
+        history = HistoryJournal(TinyDB(storage=MemoryStorage).table("history"))
+        history.insert({"Command": "a"})
+        history.insert({"Command": "b"})
+        self.assertEqual([r["Command"] for r in reversed(history)], ["b", "a"])
+        self.assertIsNone(history._index)
+        history.insert({"Command": "c"})
+        self.assertEqual(next(reversed(history))["Command"], "c")
+        self.assertEqual([r["Command"] for r in history.find("b|c")], ["b", "c"])
+        history.insert({"Command": "d"})
+        self.assertEqual(
+            [r["Command"] for r in reversed(history)], ["d", "c", "b", "a"]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,206 @@
+import asyncio
+import re
+import threading
+import unittest
+from unittest import mock
+
+from prompt_toolkit.document import Document
+from prompt_toolkit.layout.processors import TransformationInput
+
+from ctui.application import Ctui
+from ctui.layout import SearchHighlighter
+from ctui.output import LineIndex, OutputBuffer, OutputSearch
+
+
+class OutputBufferTests(unittest.TestCase):
+    def test_append_keeps_partial_lines(self):
+        output = OutputBuffer()
+        output.append("one\ntw")
+        output.append("o\nthree")
+        self.assertEqual(output.text, "one\ntwo\nthree")
+        self.assertEqual(list(output.lines), ["one", "two", "three"])
+
+    def test_scrollback_drops_oldest_lines(self):
+        output = OutputBuffer(scrollback=3)
+        for number in range(10):
+            output.append(f"line {number}\n")
+        self.assertEqual(output.text, "line 8\nline 9\n")
+        self.assertEqual(output.line_count, 3)
+
+    def test_length_is_kept_without_joining_the_text(self):
+        output = OutputBuffer(scrollback=2)
+        for number in range(5):
+            output.append(f"line {number}\nmore")
+            self.assertIsNone(output._text)  # joined only when read
+        self.assertEqual(len(output), len(output.text))
+        self.assertEqual(output.text, "moreline 4\nmore")
+        self.assertEqual(output.offset, len("line 0\nmore" * 5) - len(output))
+
+    def test_lowering_scrollback_trims(self):
+        output = OutputBuffer(scrollback=None)
+        output.append("a\nb\nc\nd")
+        output.scrollback = 2
+        self.assertEqual(output.text, "c\nd")
+
+    def test_replace_appends_when_text_extends_output(self):
+        output = OutputBuffer(scrollback=2)
+        output.append("a\nb\n")
+        output.replace(output.text + "c\n")
+        self.assertEqual(output.text, "c\n")
+        output.replace("new")
+        self.assertEqual(output.text, "new")
+
+
+class LineIndexTests(unittest.TestCase):
+    def test_lines_from_either_end(self):
+        index = LineIndex("\n".join(f"line {number}" for number in range(1000)))
+        self.assertEqual(len(index), 1000)
+        self.assertEqual(index.line(999), "line 999")
+        self.assertEqual(index.line(2), "line 2")
+        # only the lines near each end were looked at
+        self.assertEqual(len(index.starts) + len(index.tail), 5)
+        self.assertEqual(index.line(600), "line 600")
+        self.assertEqual(index.width, 8)
+        with self.assertRaises(IndexError):
+            index.line(1000)
+
+    def test_append_extends_last_line(self):
+        index = LineIndex("a\nb")
+        self.assertEqual(index.line(1), "b")
+        index.append("c\n\nlonger")
+        self.assertEqual(
+            [index.line(number) for number in range(len(index))],
+            ["a", "bc", "", "longer"],
+        )
+        self.assertEqual(index.width, 6)
+        self.assertEqual(LineIndex("").line(0), "")
+
+
+class OutputSearchTests(unittest.TestCase):
+    def test_steps_between_matches_and_wraps(self):
+        output = OutputBuffer()
+        output.append("reg 1 = 0x10\nreg 2 = 0x20\nreg 3 = 0x10\n")
+        search = OutputSearch(output, r"0x10$")
+        self.assertEqual(len(search), 2)
+        self.assertEqual(search.after(0), output.text.index("0x10"))
+        self.assertEqual(search.after(search.after(0)), output.text.rindex("0x10"))
+        self.assertEqual(search.after(len(output)), output.text.index("0x10"))
+        self.assertEqual(search.before(len(output)), output.text.rindex("0x10"))
+        self.assertEqual(search.before(0), output.text.rindex("0x10"))
+        self.assertIsNone(OutputSearch(output, "0x30").after(0))
+
+    def test_appended_output_is_searched(self):
+        output = OutputBuffer()
+        output.append("value 1\nval")
+        search = OutputSearch(output, "value")
+        self.assertEqual(list(search.hits), [0])
+        output.append("ue 2\nvalue 3")
+        search.update()
+        self.assertEqual(list(search.hits), [0, 8, 16])
+        output.append("\n")
+        search.update()
+        self.assertEqual(list(search.hits), [0, 8, 16])
+        self.assertEqual(len(OutputSearch(output, "x*")), 0)
+
+    def test_matches_across_appended_lines(self):
+        text = "a\na\nb\na\na\na\nb\n"
+        for pattern in ["a\nb", "a\na", "^a\n(a|b)$", "a$\n^a\n"]:
+            output = OutputBuffer()
+            search = OutputSearch(output, pattern)
+            for character in text:  # appended in pieces, searched after each
+                output.append(character)
+                search.update()
+            expected = [match.start() for match in re.finditer(pattern, text, re.M)]
+            self.assertEqual(list(search.hits), expected, pattern)
+
+    def test_dropped_lines_drop_their_matches(self):
+        output = OutputBuffer(scrollback=3)
+        output.append("hit 0\nhit 1\n")
+        search = OutputSearch(output, "hit")
+        output.append("hit 2\nmiss\n")
+        self.assertEqual(output.text, "hit 2\nmiss\n")
+        self.assertEqual(len(search), 1)
+        self.assertEqual(search.after(0), 0)
+        output.replace("other\nhit\n")
+        self.assertEqual(search.before(len(output)), 6)
+        self.assertEqual(len(search), 1)
+
+    def test_highlights_matches_on_drawn_line(self):
+        document = Document("a reg reg\nreg", cursor_position=6)
+        highlighter = SearchHighlighter(lambda: re.compile("reg"))
+        fragments = highlighter.apply_transformation(
+            TransformationInput(None, document, 0, int, [("", "a reg reg")], 80, 1)
+        ).fragments
+        self.assertEqual(
+            [style.strip() for style, _ in fragments],
+            ["", ""] + ["class:search"] * 3 + [""] + ["class:search.current"] * 3,
+        )
+        highlighter = SearchHighlighter(lambda: None)
+        fragments = highlighter.apply_transformation(
+            TransformationInput(None, document, 0, int, [("", "a reg reg")], 80, 1)
+        ).fragments
+        self.assertEqual(fragments, [("", "a reg reg")])
+
+
+class AppendOutputTests(unittest.TestCase):
+    def test_append_output_without_ui(self):
+        app = Ctui()
+        app.append_output("hello\n")
+        app.output_text += "world\n"
+        self.assertEqual(app.output_text, "hello\nworld\n")
+
+    def test_output_from_threads_changes_on_the_loop(self):
+        app = Ctui()
+        app._mode = "term_ui"
+        app._refresh_output = lambda: None
+        threads = []
+        append = app.output.append
+
+        def append_on_thread(text):
+            threads.append(threading.get_ident())
+            append(text)
+
+        app.output.append = append_on_thread
+
+        async def run():
+            loop = asyncio.get_running_loop()
+            app.app = mock.Mock(loop=loop)
+            await loop.run_in_executor(None, app.append_output, "from a thread\n")
+            await loop.run_in_executor(None, setattr, app, "output_text", "replaced")
+            app.append_output("!")
+
+        asyncio.run(run())
+        self.assertEqual(app.output_text, "replaced!")
+        self.assertEqual(set(threads), {threading.get_ident()})
+
+    def test_output_text_idiom_on_a_thread_keeps_queued_output(self):
+        app = Ctui()
+        app._mode = "term_ui"
+        app._refresh_output = lambda: None
+        seen = []
+
+        def command():
+            app.output_text += "a"
+            app.output_text += "b"
+            app.append_output("c")
+            seen.append(app.output_text)
+            app.output_text = "new "
+            app.output_text += "d"
+
+        async def run():
+            loop = asyncio.get_running_loop()
+            app.app = mock.Mock(loop=loop)
+            app.append_output("0")
+            thread = threading.Thread(target=command)
+            thread.start()
+            thread.join()  # the loop has applied none of it yet
+            self.assertEqual(app.output_text, "0")
+            await asyncio.sleep(0)
+
+        asyncio.run(run())
+        self.assertEqual(seen, ["0abc"])
+        self.assertEqual(app.output_text, "new d")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,143 @@
+import asyncio
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from ctui.application import Ctui
+from ctui.profiling import CommandTimings, LagMonitor
+
+
+class CommandTimingsTests(unittest.TestCase):
+    def test_measure_records_runs_and_errors(self):
+        timings = CommandTimings(window=3)
+        with timings.measure("read") as run:
+            run.returned("0x10")
+        with self.assertRaises(AssertionError):
+            with timings.measure("read"):
+                raise AssertionError("no device")
+        with timings.measure("write") as run:
+            run.counted(lambda text: None)("abc")
+        self.assertEqual(
+            [run.error for run in timings.runs], [None, "AssertionError", None]
+        )
+
+        rows = {row["Command"]: row for row in timings.summary()}
+        self.assertEqual(rows["read"]["Runs"], 2)
+        self.assertEqual(rows["read"]["Errors"], 1)
+        self.assertEqual(rows["read"]["Mean size"], 2)
+        self.assertEqual(rows["write"]["Mean size"], 3)
+
+        with timings.measure("dump"):
+            pass
+        self.assertEqual(len(timings.runs), 3)
+        timings.window = 1
+        self.assertEqual([run.command for run in timings.runs], ["dump"])
+
+
+class LagMonitorTests(unittest.TestCase):
+    def test_records_what_blocks_the_loop(self):
+        monitor = LagMonitor(threshold=0.05)
+
+        def blocking_callback():
+            threading.Event().wait(0.25)  # blocks inside the standard library
+
+        async def run():
+            task = asyncio.ensure_future(monitor.run())
+            await asyncio.sleep(0.1)
+            blocking_callback()
+            await asyncio.sleep(0.1)
+            task.cancel()
+            await asyncio.sleep(0)
+
+        asyncio.run(run())
+        self.assertFalse(monitor.running)
+        self.assertEqual(len(monitor.stalls), 1)
+        stall = monitor.stalls[0]
+        self.assertGreater(stall.lag, 0.2)
+        self.assertTrue(stall.where.startswith("blocking_callback (test_profiling.py"))
+        report = monitor.report()
+        self.assertIn("Not watching", report)
+        self.assertIn("threading.Event().wait(0.25)", report)
+
+
+class DebugCommandTests(unittest.TestCase):
+    def setUp(self):
+        self.home = tempfile.TemporaryDirectory()
+        patcher = mock.patch.dict(os.environ, {"HOME": self.home.name})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.home.cleanup)
+        self.app = Ctui()
+
+        @self.app.command
+        def do_square(number: int):
+            """Square a number"""
+            return str(number * number)
+
+        @self.app.command
+        async def do_wait():
+            """Wait for nothing"""
+            return "waited"
+
+    def tearDown(self):
+        if self.app._mode == "headless":
+            self.app._close_db()
+
+    def test_timings_of_each_command(self):
+        self.app.execute("square 3")
+        self.app.execute("square x")  # fails to convert, so never runs
+        self.app.execute("wait")
+        result = self.app.execute("debug timings")
+        lines = result.dialogs[0]["text"].splitlines()
+        self.assertEqual(lines[0].split()[:3], ["Command", "Runs", "Errors"])
+        self.assertEqual(
+            sorted(line.split()[0] for line in lines[2:]), ["square", "wait"]
+        )
+
+        self.app.execute("debug timings save")
+        self.app.execute("square 4")
+        text = self.app.execute("debug timings saved square").dialogs[0]["text"]
+        self.assertEqual(len(text.splitlines()), 3)
+        self.app.execute("debug timings clear")
+        text = self.app.execute("debug timings").dialogs[0]["text"]
+        self.assertEqual(
+            text.splitlines()[2].split()[:4], ["debug", "timings", "clear", "1"]
+        )
+
+    def test_profile_runs_command_once(self):
+        result = self.app.execute("debug profile square 12")
+        self.assertEqual(result.value, "144")
+        self.assertEqual(self.app.output_text, "144")
+        self.assertIn("do_square", result.dialogs[0]["text"])
+        result = self.app.execute("debug profile wait")
+        self.assertEqual(result.value, "waited")
+        self.assertFalse(self.app.execute("debug profile nothing").ok)
+
+    def test_profile_runs_command_on_its_own_thread(self):
+        threads = []
+
+        @self.app.command
+        def do_where():
+            """Note the thread"""
+            threads.append(threading.current_thread())
+
+        @self.app.command(thread=True)
+        def do_where_threaded():
+            """Note the thread"""
+            threads.append(threading.current_thread())
+
+        self.app.execute("debug profile where")
+        self.app.execute("debug profile where threaded")
+        self.assertIs(threads[0], threading.main_thread())
+        self.assertIsNot(threads[1], threading.main_thread())
+
+    def test_lag_report_without_user_interface(self):
+        self.assertFalse(self.app.execute("debug lag watch").ok)
+        report = self.app.execute("debug lag").dialogs[0]["text"]
+        self.assertTrue(report.startswith("Not watching"))
+
+
+if __name__ == "__main__":
+    unittest.main()
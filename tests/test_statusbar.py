@@ -0,0 +1,93 @@
+import asyncio
+import time
+import unittest
+
+from ctui.application import Ctui
+from ctui.statusbar import Statusbar
+
+
+class StatusbarTests(unittest.TestCase):
+    def run_for(self, statusbar, seconds, during=None):
+        changes = []
+
+        async def run():
+            task = asyncio.ensure_future(statusbar.run(lambda: changes.append(1)))
+            await asyncio.sleep(seconds)
+            if during is not None:
+                during()
+                await asyncio.sleep(seconds)
+            task.cancel()
+
+        asyncio.run(run())
+        return changes
+
+    def test_segments_are_cached_between_refreshes(self):
+        statusbar = Statusbar()
+        calls = []
+
+        def count():
+            calls.append(1)
+            return f"COUNT: {len(calls)}"
+
+        async def connection():
+            return "CONNECTED"
+
+        statusbar.add("count", count)
+        statusbar.add("empty", lambda: None)
+        statusbar.add("connection", connection)
+        self.assertEqual(statusbar.text(), "")
+        changes = self.run_for(statusbar, 0.1)
+        self.assertEqual(statusbar.text(), "COUNT: 1 | CONNECTED")
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(changes), 2)
+
+        self.run_for(statusbar, 0.1, during=lambda: statusbar.invalidate("count"))
+        self.assertEqual(statusbar.text(), "COUNT: 2 | CONNECTED")
+
+    def test_interval_and_errors(self):
+        statusbar = Statusbar()
+        calls = []
+        statusbar.add("poll", lambda: calls.append(1), interval=0.05)
+        statusbar.add("broken", lambda: 1 / 0)
+        self.run_for(statusbar, 0.3)
+        self.assertGreater(len(calls), 2)
+        self.assertLess(len(calls), 10)
+        self.assertIn("ERROR: ZeroDivisionError", statusbar.text())
+
+    def test_slow_segment_does_not_block_the_loop(self):
+        statusbar = Statusbar()
+        statusbar.add("slow", lambda: time.sleep(0.3) or "SLOW")
+        statusbar.add("fast", lambda: "FAST")
+        start = time.monotonic()
+        texts = []
+
+        async def run():
+            task = asyncio.ensure_future(statusbar.run(lambda: None))
+            for _ in range(5):
+                await asyncio.sleep(0.02)
+                texts.append(statusbar.text())
+            task.cancel()
+
+        asyncio.run(run())
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertEqual(texts[-1], "FAST")
+
+    def test_ctui_segments_follow_statusbar_callable(self):
+        app = Ctui()
+        app.segment(lambda: "CWD: /tmp", name="cwd")
+        app.statusbar = lambda: f"PROJECT: {app.project_name}"
+        self.run_for(app.segments, 0.05)
+        self.assertEqual(app._statusbar(), "PROJECT: default | CWD: /tmp")
+        app.project_name = "other"
+        self.assertEqual(app._statusbar(), "PROJECT: default | CWD: /tmp")
+        self.run_for(app.segments, 0.05, during=app.invalidate_statusbar)
+        self.assertEqual(app._statusbar(), "PROJECT: other | CWD: /tmp")
+        app._running_command = "sleep 5"
+        self.assertEqual(
+            app._statusbar(),
+            "PROJECT: other | CWD: /tmp | RUNNING: sleep 5 (Ctrl-C to cancel)",
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+from array import array
+
+from ctui.types import (
+    BitArray,
+    GreedyBin,
+    GreedyBitArray,
+    GreedyFloatArray,
+    GreedyIntArray,
+    converter,
+    is_greedy,
+)
+
+
+class ArrayTypeTests(unittest.TestCase):
+    def test_numeric_arrays(self):
+        values = converter(GreedyIntArray, "values")("1 -2  300")
+        self.assertEqual(values, array("q", [1, -2, 300]))
+        values = converter(GreedyFloatArray, "values")("1.5 -2")
+        self.assertEqual(values, array("d", [1.5, -2.0]))
+        self.assertTrue(is_greedy(GreedyIntArray))
+
+    def test_bit_array_matches_bin_list(self):
+        text = "0b1 0 1 1 0 0 1 0 1 1"
+        bits = converter(GreedyBitArray, "bits")(text)
+        self.assertEqual(list(bits), converter(GreedyBin, "bits")(text))
+        self.assertEqual(len(bits), 10)
+        self.assertEqual(bits.tobytes(), b"\xb2\xc0")
+        self.assertEqual(bits.to01(), "1011001011")
+        with self.assertRaisesRegex(AssertionError, "bits must be sequence"):
+            converter(GreedyBitArray, "bits")("102")
+
+
+class BitArrayTests(unittest.TestCase):
+    def setUp(self):
+        self.bits = BitArray.from01("1011001011")
+
+    def test_indexing(self):
+        self.assertEqual([self.bits[i] for i in range(4)], [True, False, True, True])
+        self.assertIs(self.bits[-1], True)
+        self.assertEqual(self.bits[2:5], BitArray.from01("110"))
+        with self.assertRaises(IndexError):
+            self.bits[10]
+
+    def test_count_and_equality(self):
+        self.assertEqual(self.bits.count(), 6)
+        self.assertEqual(self.bits.count(False), 4)
+        # bits past length are ignored
+        self.assertEqual(BitArray(b"\xff", 3), BitArray.from01("111"))
+        self.assertNotEqual(BitArray(b"\xff", 3), BitArray.from01("1110"))
+        self.assertEqual(len(BitArray()), 0)
+        self.assertEqual(BitArray.from01("").to01(), "")
+
+
+if __name__ == "__main__":
+    unittest.main()